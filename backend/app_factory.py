@@ -2,13 +2,18 @@ from flask import Flask
 from flask_socketio import SocketIO
 from flask_cors import CORS
 from config.settings import Config
+from config.logging_config import configure_logging
 from routes.api_routes import api_bp
 from handlers.socket_handlers import SocketHandlers
+from services.medical_scribe_service import MedicalScribeService
+from services.service_container import get_service_container
+from services.session_registry import get_session_registry
 
 def create_app(config_class=Config):
     """Application factory pattern"""
     # Validate configuration
     config_class.validate_config()
+    configure_logging(config_class)
     
     # Create Flask app
     app = Flask(__name__)
@@ -17,13 +22,28 @@ def create_app(config_class=Config):
     # Setup CORS
     CORS(app, origins=config_class.CORS_ORIGINS)
     
-    # Setup SocketIO
-    socketio = SocketIO(app, cors_allowed_origins=config_class.CORS_ORIGINS)
+    # Setup SocketIO; the message queue lets every server process emit to
+    # clients connected to the others
+    socketio = SocketIO(
+        app,
+        cors_allowed_origins=config_class.CORS_ORIGINS,
+        async_mode=config_class.ASYNC_MODE,
+        message_queue=config_class.SOCKETIO_MESSAGE_QUEUE or None,
+        channel=config_class.SOCKETIO_CHANNEL
+    )
+    
+    # One scribe service (and session registry) shared by routes and socket handlers
+    scribe_service = MedicalScribeService(socketio, get_session_registry())
+    app.extensions['scribe_service'] = scribe_service
+    scribe_service.recover_sessions()
+    scribe_service.health.start()
+    # SDK clients are built on first use; get them ready before the first visit
+    get_service_container().warm_up()
     
     # Register blueprints
     app.register_blueprint(api_bp)
     
     # Initialize socket handlers
-    SocketHandlers(socketio)
+    SocketHandlers(socketio, scribe_service)
     
     return app, socketio 
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""Per-chunk audio_chunk ingest cost: binary attachments vs base64 strings
+
+Feeds identical PCM chunks through MedicalScribeService.add_audio_chunk
+with the Deepgram send stubbed out, and reports latency and allocations.
+
+    python -m benchmarks.audio_ingest_benchmark [chunks]
+"""
+import base64
+import contextlib
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import RecordingSocketIO, print_table
+from services.medical_scribe_service import MedicalScribeService
+
+CHUNK_BYTES = 9600  # what pcm-processor.js posts per message
+
+
+def measure(service, payload, chunks):
+    latencies = []
+    for _ in range(chunks):
+        started = time.perf_counter_ns()
+        service.add_audio_chunk('bench', payload)
+        latencies.append(time.perf_counter_ns() - started)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    service.add_audio_chunk('bench', payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return (
+        len(payload),
+        f"{statistics.median(latencies) / 1000:.1f}",
+        f"{latencies[int(len(latencies) * 0.99) - 1] / 1000:.1f}",
+        peak - before,
+    )
+
+
+def run(chunks: int):
+    service = MedicalScribeService(RecordingSocketIO())
+    service.create_session('bench')
+
+    sent = []
+    service.deepgram_service.start_streaming_session = lambda sid, cb, *args: True
+    service.deepgram_service.send_audio_chunk_to_stream = lambda sid, data, *args: sent.append(len(data)) or True
+
+    pcm = os.urandom(CHUNK_BYTES)
+    data_url = "data:audio/pcm;base64," + base64.b64encode(pcm).decode('ascii')
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        service.start_recording('bench')
+        rows = [
+            ("binary",) + measure(service, pcm, chunks),
+            ("base64",) + measure(service, data_url, chunks),
+        ]
+
+    print(f"{chunks} chunks of {CHUNK_BYTES} bytes PCM\n")
+    print_table(("path", "wire bytes", "p50 us", "p99 us", "peak alloc bytes"), rows)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,39 @@
+"""Shared helpers for the offline benchmark scripts
+
+Run benchmarks from the backend directory, e.g.:
+
+    python -m benchmarks.transcript_delta_benchmark
+"""
+import os
+import sys
+
+# Benchmarks never talk to the real APIs, but Config still expects keys
+os.environ.setdefault('DEEPGRAM_API_KEY', 'benchmark')
+os.environ.setdefault('GOOGLE_API_KEY', 'benchmark')
+# ...and should not leave a session database behind unless they ask for one
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+class RecordingSocketIO:
+    """Stand-in for flask_socketio.SocketIO that records emitted events"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data=None, **kwargs):
+        self.events.append((event, data))
+
+    def start_background_task(self, target, *args, **kwargs):
+        return target(*args, **kwargs)
+
+
+def print_table(headers, rows):
+    """Print rows as a fixed-width table"""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
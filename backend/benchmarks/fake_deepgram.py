@@ -0,0 +1,191 @@
+"""Local stand-in for Deepgram's live transcription WebSocket
+
+Speaks enough of /v1/listen for the SDK's LiveClient: it accepts linear16
+audio and answers with final Results messages. Each word_ms block of audio
+becomes one word named after the block's first sample ("w<value>"), so a
+client that writes a counter into its PCM can check exactly which audio
+was transcribed, and how often.
+
+Latency and failure injection:
+
+- latency_ms: delay between a word's audio arriving and its result
+- refuse: reject the first N handshakes with HTTP 503
+- refuse_rate: fraction of later handshakes rejected the same way
+- drops / drop_after_seconds: abort the first N connections (no close
+  frame) once they have received that much audio
+- drop_rate: fraction of later connections aborted the same way
+- refuse_after_drop: reject the next N handshakes after each abort
+
+Plain GET /v1/projects (DeepgramService.check_connection) is answered
+with an empty project list.
+
+Point the service at it with DEEPGRAM_URL=http://127.0.0.1:<port>.
+"""
+import json
+import queue
+import random
+import socket
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from websockets.sync.server import serve
+
+
+class FakeDeepgramServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, word_ms: int = 100,
+                 utterance_words: int = 10, latency_ms: float = 0, refuse: int = 0,
+                 refuse_rate: float = 0.0, drops: int = 0, drop_after_seconds: float = 5.0,
+                 drop_rate: float = 0.0, refuse_after_drop: int = 0):
+        self.word_ms = word_ms
+        self.latency_ms = latency_ms
+        self.refuse_rate = refuse_rate
+        self.drop_rate = drop_rate
+        self.utterance_words = utterance_words
+        self.drops = drops
+        self.drop_after_seconds = drop_after_seconds
+        self.refuse_after_drop = refuse_after_drop
+        self._refusals_left = refuse
+
+        self.stats = {'handshakes': 0, 'refused': 0, 'connections': 0, 'dropped': 0,
+                      'audio_bytes': 0, 'results': 0}
+        self._lock = threading.Lock()
+        self._server = serve(self._handle, host, port, process_request=self._process_request)
+        self.port = self._server.socket.getsockname()[1]
+        self.url = f"http://{host}:{self.port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-deepgram", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+
+    def _count(self, key: str) -> int:
+        with self._lock:
+            self.stats[key] += 1
+            return self.stats[key]
+
+    def _process_request(self, connection, request):
+        if request.path.startswith("/v1/projects"):
+            return connection.respond(HTTPStatus.OK, '{"projects": []}\n')
+        self._count('handshakes')
+        with self._lock:
+            refuse = self._refusals_left > 0
+            if refuse:
+                self._refusals_left -= 1
+            else:
+                refuse = random.random() < self.refuse_rate
+            self.stats['refused'] += refuse
+        if refuse:
+            return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "simulated outage\n")
+        return None
+
+    def _handle(self, connection):
+        number = self._count('connections')
+        params = parse_qs(urlparse(connection.request.path).query)
+        sample_rate = int(params.get('sample_rate', ['16000'])[0])
+        session = _FakeTranscriber(sample_rate, self.word_ms, self.utterance_words)
+        dropping = number <= self.drops or random.random() < self.drop_rate
+        drop_at = self.drop_after_seconds * sample_rate * 2 if dropping else None
+
+        # Results go out from their own thread so latency does not hold up reads
+        outbox = queue.Queue()
+        sender = threading.Thread(target=self._send_results, args=(connection, outbox),
+                                  name=f"fake-deepgram-results-{number}", daemon=True)
+        sender.start()
+
+        for message in connection:
+            if isinstance(message, str):
+                if json.loads(message).get('type') == 'CloseStream':
+                    self._queue_results(outbox, session.flush())
+                    outbox.put(None)
+                    sender.join()
+                    connection.close()
+                    return
+                continue
+            with self._lock:
+                self.stats['audio_bytes'] += len(message)
+            self._queue_results(outbox, session.feed(message))
+            if drop_at is not None and session.received_bytes >= drop_at:
+                with self._lock:
+                    self.stats['dropped'] += 1
+                    self._refusals_left += self.refuse_after_drop
+                # Abort the TCP connection like a network blip would
+                connection.socket.shutdown(socket.SHUT_RDWR)
+                break
+        outbox.put(None)
+
+    def _queue_results(self, outbox, results):
+        due = time.monotonic() + self.latency_ms / 1000
+        for result in results:
+            outbox.put((due, result))
+
+    def _send_results(self, connection, outbox):
+        while True:
+            item = outbox.get()
+            if item is None:
+                return
+            due, result = item
+            time.sleep(max(0.0, due - time.monotonic()))
+            try:
+                connection.send(json.dumps(result))
+            except Exception:
+                return
+            self._count('results')
+
+
+class _FakeTranscriber:
+    """Turns one connection's PCM into Results messages"""
+
+    def __init__(self, sample_rate: int, word_ms: int, utterance_words: int):
+        self.word_samples = sample_rate * word_ms // 1000
+        self.word_seconds = word_ms / 1000
+        self.utterance_words = utterance_words
+        self.request_id = str(uuid.uuid4())
+        self.received_bytes = 0
+        self._pending = b""
+        self._words = []
+        self._next_word = 0
+
+    def feed(self, audio: bytes) -> list:
+        self.received_bytes += len(audio)
+        self._pending += audio
+        word_bytes = self.word_samples * 2
+        results = []
+        while len(self._pending) >= word_bytes:
+            block, self._pending = self._pending[:word_bytes], self._pending[word_bytes:]
+            start = self._next_word * self.word_seconds
+            label = f"w{int(np.frombuffer(block[:2], dtype='<i2')[0])}"
+            self._words.append({'word': label, 'punctuated_word': label, 'start': start,
+                                'end': start + self.word_seconds, 'confidence': 0.99})
+            self._next_word += 1
+            if len(self._words) >= self.utterance_words:
+                results.append(self._result())
+        return results
+
+    def flush(self) -> list:
+        return [self._result()] if self._words else []
+
+    def _result(self) -> dict:
+        words, self._words = self._words, []
+        start = words[0]['start']
+        return {
+            'type': 'Results',
+            'channel_index': [0, 1],
+            'duration': words[-1]['end'] - start,
+            'start': start,
+            'is_final': True,
+            'speech_final': True,
+            'channel': {'alternatives': [{
+                'transcript': " ".join(word['word'] for word in words),
+                'confidence': 0.99,
+                'words': words
+            }]},
+            'metadata': {'request_id': self.request_id, 'model_uuid': 'fake',
+                         'model_info': {'name': 'fake', 'version': '0', 'arch': 'fake'}}
+        }
@@ -0,0 +1,165 @@
+"""Local stand-in for the Gemini generateContent REST API
+
+Serves POST /v1beta/models/<model>:generateContent and
+:streamGenerateContent the way google-generativeai's REST transport
+expects, returning a canned SOAP note sized to the prompt. Streamed
+responses arrive in `chunks` pieces. GET /v1beta/models/<model> returns
+model metadata, as used by GeminiService.test_api_connection.
+
+Latency and error injection:
+
+- first_token_ms: delay before the first byte of a response
+- prefill_ms_per_1k_tokens: extra first-byte delay per 1000 prompt tokens
+  (estimated at 4 characters each), as real models take longer to start
+  on longer prompts
+- chunk_ms: delay between streamed chunks
+- tail_rate: fraction of requests held back a further tail_ms before the
+  first byte, to model a slow tail for request hedging
+- error_rate: fraction of requests answered with error_status (429 by
+  default, which GeminiService treats as a quota error and retries)
+
+Point the service at it with GEMINI_API_URL=http://127.0.0.1:<port>.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ERROR_BODIES = {
+    429: ("RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."),
+    500: ("INTERNAL", "An internal error has occurred."),
+    503: ("UNAVAILABLE", "The service is currently unavailable."),
+}
+
+SOAP_TEMPLATE = """SUBJECTIVE:
+Patient reports symptoms discussed over {words} transcribed words.
+
+OBJECTIVE:
+Vital signs not recorded in transcript.
+
+ASSESSMENT:
+Findings consistent with the history given.
+
+PLAN:
+Follow up as discussed. Generated by the fake Gemini server ({prompt_chars} prompt characters)."""
+
+
+class FakeGeminiServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_token_ms: float = 0,
+                 chunk_ms: float = 0, chunks: int = 8, error_rate: float = 0.0, error_status: int = 429,
+                 prefill_ms_per_1k_tokens: float = 0, tail_rate: float = 0.0, tail_ms: float = 0):
+        self.first_token_ms = first_token_ms
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.chunk_ms = chunk_ms
+        self.chunks = chunks
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+        self.stats = {'requests': 0, 'streamed': 0, 'errors': 0, 'prompt_chars': 0, 'metadata_requests': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f"http://{host}:{self.port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-gemini", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                server._respond(self, self.path, json.loads(body or b"{}"))
+
+            def do_GET(self):
+                server._describe_model(self, self.path)
+
+        return Handler
+
+    def _respond(self, handler, path: str, request: dict):
+        streamed = ":streamGenerateContent" in path
+        if not streamed and ":generateContent" not in path:
+            handler.send_error(404)
+            return
+
+        prompt = "".join(part.get('text', '') for content in request.get('contents', [])
+                         for part in content.get('parts', []))
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['streamed'] += streamed
+            self.stats['prompt_chars'] += len(prompt)
+            failed = random.random() < self.error_rate
+            self.stats['errors'] += failed
+            slow = random.random() < self.tail_rate
+
+        delay_ms = self.first_token_ms + self.prefill_ms_per_1k_tokens * len(prompt) / 4000
+        time.sleep((delay_ms + (self.tail_ms if slow else 0)) / 1000)
+        if failed:
+            status, message = ERROR_BODIES.get(self.error_status, ("UNKNOWN", "Injected error"))
+            self._send_json(handler, self.error_status,
+                            {'error': {'code': self.error_status, 'message': message, 'status': status}})
+            return
+
+        note = SOAP_TEMPLATE.format(words=len(prompt.split()), prompt_chars=len(prompt))
+        if not streamed:
+            self._send_json(handler, 200, _candidate(note, "STOP"))
+            return
+
+        # A JSON array written element by element, as the REST transport parses it
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.end_headers()
+        step = -(-len(note) // self.chunks)
+        pieces = [note[i:i + step] for i in range(0, len(note), step)]
+        handler.wfile.write(b"[")
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(self.chunk_ms / 1000)
+                handler.wfile.write(b",\r\n")
+            finish = "STOP" if index == len(pieces) - 1 else None
+            handler.wfile.write(json.dumps(_candidate(piece, finish)).encode())
+            handler.wfile.flush()
+        handler.wfile.write(b"]")
+
+    def _describe_model(self, handler, path: str):
+        name = path.split("?")[0].rpartition("/v1beta/")[2]
+        if not name.startswith("models/"):
+            handler.send_error(404)
+            return
+        with self._lock:
+            self.stats['metadata_requests'] += 1
+        self._send_json(handler, 200, {
+            'name': name, 'version': '001', 'displayName': name.split("/")[1],
+            'inputTokenLimit': 1048576, 'outputTokenLimit': 8192,
+            'supportedGenerationMethods': ['generateContent', 'countTokens'],
+        })
+
+    @staticmethod
+    def _send_json(handler, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def _candidate(text: str, finish_reason) -> dict:
+    candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+    if finish_reason:
+        candidate['finishReason'] = finish_reason
+    return {'candidates': [candidate]}
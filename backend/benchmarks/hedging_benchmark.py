@@ -0,0 +1,91 @@
+"""SOAP request latency with and without hedging against a slow tail
+
+Two fake Gemini endpoints: the primary holds back --tail-rate of its
+requests by a further --tail-ms, the alternate answers normally. Streams
+--requests SOAP notes through GeminiService, first without hedging and then
+with GEMINI_HEDGE_URL pointing at the alternate, and reports latency
+percentiles, how many hedges were sent and won, and the extra load they put
+on the API.
+
+    python -m benchmarks.hedging_benchmark [--requests 200] [--tail-rate 0.05] [--tail-ms 3000]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import print_table
+from benchmarks.fake_gemini import FakeGeminiServer
+from config.settings import Config
+from models.transcript import TranscriptStore
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def run(service, transcripts):
+    latencies = []
+    for transcript in transcripts:
+        started = time.perf_counter()
+        result = service.generate_soap_note(transcript, on_chunk=lambda text: None)
+        if not result.success:
+            raise SystemExit(f"SOAP generation failed: {result.error}")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--first-token-ms', type=float, default=50)
+    parser.add_argument('--tail-rate', type=float, default=0.05)
+    parser.add_argument('--tail-ms', type=float, default=3000)
+    parser.add_argument('--percentile', type=float, default=95)
+    args = parser.parse_args()
+
+    random.seed(7)
+    transcripts = []
+    for index in range(args.requests):
+        transcript = TranscriptStore()
+        transcript.append(f"Visit {index}: chest pain for {index % 10 + 1} days, worse on exertion.", 1)
+        transcripts.append(transcript)
+
+    primary = FakeGeminiServer(first_token_ms=args.first_token_ms, chunk_ms=5,
+                               tail_rate=args.tail_rate, tail_ms=args.tail_ms)
+    alternate = FakeGeminiServer(first_token_ms=args.first_token_ms, chunk_ms=5)
+    with primary, alternate:
+        Config.GEMINI_API_URL = primary.url
+        Config.SOAP_CACHE_ENABLED = False
+        Config.GEMINI_HEDGE_PERCENTILE = args.percentile
+        Config.GEMINI_HEDGE_MIN_SAMPLES = 20
+        # Until 20 requests have been timed; short enough not to hide the tail
+        Config.GEMINI_HEDGE_INITIAL_SECONDS = 0.5
+        from services.gemini_service import GeminiService
+
+        rows = []
+        for label, hedge_url in (("no hedging", ""), ("hedged", alternate.url)):
+            Config.GEMINI_HEDGE_URL = hedge_url
+            service = GeminiService()
+            sent_before = primary.stats['requests'] + alternate.stats['requests']
+            latencies = run(service, transcripts)
+            sent = primary.stats['requests'] + alternate.stats['requests'] - sent_before
+            hedges = service.router.stats()['models'].get(f"{Config.GEMINI_MODEL}@{alternate.url}", {})
+            rows.append((
+                label,
+                f"{percentile(latencies, 50) * 1000:.0f}",
+                f"{percentile(latencies, 95) * 1000:.0f}",
+                f"{percentile(latencies, 99) * 1000:.0f}",
+                f"{max(latencies) * 1000:.0f}",
+                hedges.get('hedges_launched', 0),
+                hedges.get('hedges_won', 0),
+                f"{100 * (sent / len(transcripts) - 1):.1f}%",
+            ))
+
+    print(f"{args.requests} streamed SOAP requests, {args.tail_rate:.0%} of primary requests "
+          f"delayed {args.tail_ms:g} ms, hedge after p{args.percentile:g} time to first chunk")
+    print_table(["", "p50 ms", "p95 ms", "p99 ms", "max ms", "hedges", "hedges won", "extra requests"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+"""End-to-end load test against local fake Deepgram and Gemini servers
+
+Starts benchmarks.fake_deepgram and benchmarks.fake_gemini, launches the
+backend (app.py) pointed at them, then runs N concurrent Socket.IO clients
+through start_recording -> audio_chunk* -> stop_recording, each waiting
+for its SOAP note. Every 100 ms chunk carries its index (see
+fake_deepgram) so transcript latency is measured per chunk. Reports:
+
+- throughput: visits completed, audio seconds and chunks streamed per second
+- p50/p99 latency: start_recording ack, audio chunk -> live transcript,
+  stop_recording -> SOAP note
+- server RSS (baseline, peak, end) and CPU seconds per audio second
+
+    python -m benchmarks.load_test --clients 20 --seconds 30
+    python -m benchmarks.load_test --clients 50 --speed 4 --gemini-error-rate 0.1 --json
+
+Clients fall back to long-polling unless websocket-client is installed.
+--server gevent launches the production entry point (wsgi.py under
+gunicorn's gevent worker) instead of the Werkzeug development server.
+--server-url targets a backend that is already running; start it with
+DEEPGRAM_URL and GEMINI_API_URL pointing at --deepgram-port/--gemini-port,
+and pass --server-pid to also sample its memory.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+import engineio.payload
+import numpy as np
+import socketio
+
+from benchmarks.common import BACKEND_DIR, print_table
+from benchmarks.fake_deepgram import FakeDeepgramServer
+from benchmarks.fake_gemini import FakeGeminiServer
+from config.settings import Config
+
+SAMPLE_RATE = 16000
+CHUNK_MS = 100
+MAX_TAG = 32767  # chunk tags are int16 samples
+
+# Server events are broadcast to every client, so one long-poll response can
+# carry far more than python-engineio's default cap of 16 packets, at which
+# point the client drops the connection. The browser client has no such cap.
+engineio.payload.Payload.max_decode_packets = 1_000_000
+
+try:
+    import websocket  # noqa: F401  (websocket-client, needed for the WebSocket transport)
+    TRANSPORTS = ["polling", "websocket"]
+except ImportError:
+    TRANSPORTS = ["polling"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class VisitClient:
+    """One simulated clinician: a Socket.IO client recording a single visit"""
+
+    def __init__(self, url: str, session_id: str, chunks: int, speed: float, timeout: float):
+        self.url = url
+        self.session_id = session_id
+        self.chunks = chunks
+        self.speed = speed
+        self.timeout = timeout
+
+        self.start_latency = None
+        self.soap_latency = None
+        self.transcript_latencies = []
+        self.segments = 0
+        self.errors = []
+        self.completed = False
+        self.transport = None
+
+        self._sent_at = {}
+        self._started = threading.Event()
+        self._done = threading.Event()
+        self._start_sent = self._stop_sent = None
+
+    def _mine(self, data) -> bool:
+        return isinstance(data, dict) and data.get('session_id') == self.session_id
+
+    def _register(self, sio):
+        @sio.on('recording_started')
+        def on_started(data):
+            if self._mine(data):
+                self.start_latency = time.monotonic() - self._start_sent
+                self._started.set()
+
+        @sio.on('live_transcription')
+        def on_transcript(data):
+            if not self._mine(data):
+                return
+            now = time.monotonic()
+            self.segments += 1
+            tags = [word[1:] for word in data.get('raw_text', '').split() if word[1:].isdigit()]
+            if tags and int(tags[-1]) in self._sent_at:
+                self.transcript_latencies.append(now - self._sent_at[int(tags[-1])])
+
+        @sio.on('soap_note_complete')
+        def on_soap(data):
+            if self._mine(data) and not self._done.is_set():
+                self.soap_latency = time.monotonic() - self._stop_sent
+                self.completed = True
+                self._done.set()
+
+        @sio.on('soap_generation_error')
+        def on_soap_error(data):
+            if self._mine(data):
+                self.errors.append(f"soap: {data.get('error')}")
+                self._done.set()
+
+        @sio.on('transcription_error')
+        def on_transcription_error(data):
+            if self._mine(data):
+                self.errors.append(f"audio: {data.get('error')}")
+
+        @sio.on('disconnect')
+        def on_disconnect():
+            if not self._done.is_set():
+                self.errors.append("disconnected before the SOAP note")
+
+        @sio.on('error')
+        def on_error(data):
+            self.errors.append(f"server: {data.get('message') if isinstance(data, dict) else data}")
+            self._started.set()
+
+    def run(self) -> None:
+        # Present the frontend's origin, or the server refuses the WebSocket upgrade
+        sio = socketio.Client(reconnection=False, websocket_extra_options={'origin': Config.CORS_ORIGINS[0]})
+        self._register(sio)
+        try:
+            sio.connect(self.url, transports=TRANSPORTS, wait_timeout=self.timeout)
+            self.transport = sio.transport()
+            self._start_sent = time.monotonic()
+            sio.emit('start_recording', {
+                'session_id': self.session_id,
+                'audio_format': {'sample_rate': SAMPLE_RATE, 'encoding': 'linear16'}
+            })
+            if not self._started.wait(self.timeout) or self.start_latency is None:
+                self.errors.append("start_recording not acknowledged")
+                return
+
+            interval = CHUNK_MS / 1000 / self.speed
+            started = time.monotonic()
+            for index in range(self.chunks):
+                time.sleep(max(0.0, started + index * interval - time.monotonic()))
+                chunk = np.full(SAMPLE_RATE * CHUNK_MS // 1000, index, dtype="<i2").tobytes()
+                self._sent_at[index] = time.monotonic()
+                sio.emit('audio_chunk', {'session_id': self.session_id, 'audio_data': chunk})
+
+            self._stop_sent = time.monotonic()
+            sio.emit('stop_recording', {'session_id': self.session_id})
+            if not self._done.wait(self.timeout):
+                self.errors.append("no SOAP note before timeout")
+        except Exception as e:
+            self.errors.append(f"client: {e}")
+        finally:
+            try:
+                sio.disconnect()
+            except Exception:
+                pass
+
+
+class ProcessSampler:
+    """Samples the RSS and CPU time of a process and its children from /proc
+
+    Children are included so a gunicorn master's workers are counted.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def pids(self) -> list:
+        try:
+            with open(f"/proc/{self.pid}/task/{self.pid}/children") as f:
+                return [self.pid] + [int(child) for child in f.read().split()]
+        except OSError:
+            return [self.pid]
+
+    def rss_bytes(self):
+        total = None
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total = (total or 0) + int(line.split()[1]) * 1024
+            except OSError:
+                pass
+        return total
+
+    def cpu_seconds(self):
+        total = None
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                total = (total or 0) + (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+            except OSError:
+                pass
+        return total
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self.rss_bytes()
+            if rss is not None:
+                self.samples.append(rss)
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def backend_command(server: str, port: int) -> list:
+    if server == "gevent":
+        return [sys.executable, "-m", "gunicorn", "--worker-class", "gevent", "--workers", "1",
+                "--bind", f"127.0.0.1:{port}", "wsgi:app"]
+    return [sys.executable, "app.py"]
+
+
+def start_backend(deepgram_url: str, gemini_url: str, log_file, server: str = "threading"):
+    port = free_port()
+    env = dict(os.environ,
+               HOST="127.0.0.1", PORT=str(port), DEBUG="False",
+               DEEPGRAM_URL=deepgram_url, GEMINI_API_URL=gemini_url,
+               # Every simulated visit has the same transcript; don't let the cache hide Gemini
+               SOAP_CACHE_ENABLED="False",
+               AUDIO_ARCHIVE_ENABLED="False")
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    process = subprocess.Popen(backend_command(server, port), cwd=BACKEND_DIR, env=env,
+                               stdout=log_file, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Backend exited during startup; see {log_file.name}")
+        try:
+            urllib.request.urlopen(url + "/health", timeout=1).read()
+            return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"Backend did not become healthy; see {log_file.name}")
+
+
+def run_load(url: str, args, sampler=None) -> dict:
+    chunks = min(MAX_TAG, int(args.seconds * 1000 / CHUNK_MS))
+    run_id = uuid.uuid4().hex[:8]
+    clients = [VisitClient(url, f"load-{run_id}-{i}", chunks, args.speed, args.timeout)
+               for i in range(args.clients)]
+
+    baseline_rss = sampler.rss_bytes() if sampler else None
+    baseline_cpu = sampler.cpu_seconds() if sampler else None
+    if sampler:
+        sampler.start()
+
+    started = time.monotonic()
+    threads = []
+    for i, client in enumerate(clients):
+        thread = threading.Thread(target=client.run, name=f"visit-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+        if args.ramp and i < len(clients) - 1:
+            time.sleep(args.ramp / len(clients))
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    server = {}
+    if sampler:
+        sampler.stop()
+        cpu = sampler.cpu_seconds()
+        server = {
+            'rss_baseline_mb': baseline_rss / 2**20 if baseline_rss else None,
+            'rss_peak_mb': max(sampler.samples) / 2**20 if sampler.samples else None,
+            'rss_end_mb': (sampler.rss_bytes() or 0) / 2**20,
+            'cpu_seconds': cpu - baseline_cpu if cpu is not None and baseline_cpu is not None else None,
+        }
+
+    completed = [client for client in clients if client.completed]
+    audio_seconds = len(clients) * chunks * CHUNK_MS / 1000
+    latencies = {
+        'start_recording': [c.start_latency for c in clients if c.start_latency is not None],
+        'chunk_to_transcript': [l for c in clients for l in c.transcript_latencies],
+        'stop_to_soap_note': [c.soap_latency for c in completed],
+    }
+    errors = [error for client in clients for error in client.errors]
+    if server.get('cpu_seconds') is not None:
+        server['cpu_per_audio_second'] = server['cpu_seconds'] / audio_seconds
+
+    return {
+        'clients': len(clients),
+        'visit_seconds': chunks * CHUNK_MS / 1000,
+        'speed': args.speed,
+        'backend': args.server_url or args.server,
+        'transports': {name: sum(client.transport == name for client in clients)
+                       for name in TRANSPORTS},
+        'wall_seconds': elapsed,
+        'visits_completed': len(completed),
+        'visits_failed': len(clients) - len(completed),
+        'visits_per_second': len(completed) / elapsed,
+        'audio_seconds_per_second': audio_seconds / elapsed,
+        'chunks_per_second': len(clients) * chunks / elapsed,
+        'transcript_segments': sum(client.segments for client in clients),
+        'latency_ms': {
+            name: {'count': len(values),
+                   'p50': percentile(values, 0.5) * 1000 if values else None,
+                   'p99': percentile(values, 0.99) * 1000 if values else None,
+                   'max': max(values) * 1000 if values else None}
+            for name, values in latencies.items()
+        },
+        'server': server,
+        'errors': errors[:20],
+        'error_count': len(errors),
+    }
+
+
+def print_report(report: dict, args):
+    transports = ", ".join(f"{count} over {name}" for name, count in report['transports'].items() if count)
+    print(f"{report['backend']} backend; clients connected {transports or 'over nothing'}")
+    print(f"{report['clients']} clients x {report['visit_seconds']:.0f}s visits at {args.speed}x real time; "
+          f"deepgram latency {args.deepgram_latency_ms:.0f} ms, drop rate {args.deepgram_drop_rate}; "
+          f"gemini first token {args.gemini_latency_ms:.0f} ms, error rate {args.gemini_error_rate}\n")
+    print_table(("wall s", "visits ok", "failed", "visits/s", "audio s/s", "chunks/s", "segments"), [(
+        f"{report['wall_seconds']:.1f}", report['visits_completed'], report['visits_failed'],
+        f"{report['visits_per_second']:.2f}", f"{report['audio_seconds_per_second']:.1f}",
+        f"{report['chunks_per_second']:.0f}", report['transcript_segments'])])
+    print()
+
+    def ms(value):
+        return "-" if value is None else f"{value:.0f}"
+    print_table(("latency", "count", "p50 ms", "p99 ms", "max ms"), [
+        (name, stats['count'], ms(stats['p50']), ms(stats['p99']), ms(stats['max']))
+        for name, stats in report['latency_ms'].items()])
+
+    server = report['server']
+    if server:
+        print()
+        print_table(("rss baseline MB", "rss peak MB", "rss end MB", "cpu s", "cpu s / audio s"), [(
+            ms(server['rss_baseline_mb']), ms(server['rss_peak_mb']), ms(server['rss_end_mb']),
+            f"{server['cpu_seconds']:.1f}" if server['cpu_seconds'] is not None else "-",
+            f"{server['cpu_per_audio_second']:.4f}" if 'cpu_per_audio_second' in server else "-")])
+    if report['errors']:
+        print(f"\n{report['error_count']} errors, first ones:")
+        for error in report['errors']:
+            print(f"  {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the scribe backend against fake upstream APIs")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=20, help="audio per visit")
+    parser.add_argument("--speed", type=float, default=1.0, help="audio sent at this multiple of real time")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which clients start")
+    parser.add_argument("--timeout", type=float, default=120, help="per-step client timeout")
+    parser.add_argument("--deepgram-latency-ms", type=float, default=150)
+    parser.add_argument("--deepgram-drop-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800, help="time to first token")
+    parser.add_argument("--gemini-chunk-ms", type=float, default=50)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--deepgram-port", type=int, default=0, help="fake Deepgram port (default: any)")
+    parser.add_argument("--gemini-port", type=int, default=0, help="fake Gemini port (default: any)")
+    parser.add_argument("--server", choices=("threading", "gevent"), default="threading",
+                        help="backend to launch: app.py (Werkzeug) or wsgi.py under gunicorn's gevent worker")
+    parser.add_argument("--server-url", help="use an already running backend")
+    parser.add_argument("--server-pid", type=int, help="sample this process's memory with --server-url")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    deepgram = FakeDeepgramServer(port=args.deepgram_port, latency_ms=args.deepgram_latency_ms, drop_rate=args.deepgram_drop_rate)
+    gemini = FakeGeminiServer(port=args.gemini_port, first_token_ms=args.gemini_latency_ms, chunk_ms=args.gemini_chunk_ms,
+                              error_rate=args.gemini_error_rate)
+    with deepgram, gemini, tempfile.NamedTemporaryFile("w+", prefix="scribe-load-", suffix=".log",
+                                                       delete=False) as log_file:
+        process = None
+        if args.server_url:
+            url = args.server_url
+            sampler = ProcessSampler(args.server_pid) if args.server_pid else None
+            if not args.json:
+                print(f"Fake Deepgram at {deepgram.url}, fake Gemini at {gemini.url}")
+        else:
+            process, url = start_backend(deepgram.url, gemini.url, log_file, args.server)
+            sampler = ProcessSampler(process.pid)
+        try:
+            report = run_load(url, args, sampler)
+        finally:
+            if process:
+                process.terminate()
+                process.wait(10)
+        report['upstream'] = {'deepgram': deepgram.stats, 'gemini': gemini.stats}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args)
+        print(f"\nBackend log: {log_file.name}" if process else "")
+
+
+if __name__ == '__main__':
+    main()
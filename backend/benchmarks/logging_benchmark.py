@@ -0,0 +1,125 @@
+"""Hot-path handler throughput under different logging setups
+
+Drives Deepgram transcript events (through the real on_message handler,
+with a fake live connection) and audio_chunk calls through
+MedicalScribeService, writing logs to a temporary file, and reports events
+per second on the calling thread:
+
+- sync/DEBUG/every event: a StreamHandler written on the caller's thread
+  for every chunk and utterance, which is what the old print() tracing did
+- queued/DEBUG/sampled: the queue handler with per-chunk sampling
+- queued/INFO: the default configuration
+
+    python -m benchmarks.logging_benchmark [events]
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import RecordingSocketIO, print_table
+from config.logging_config import (KeyValueFormatter, LogSampler, NonBlockingQueueHandler,
+                                   PhiRedactionFilter)
+from deepgram import LiveTranscriptionEvents
+from services import medical_scribe_service
+from services.medical_scribe_service import MedicalScribeService
+
+CHUNK_BYTES = 9600
+CHUNKS_PER_UTTERANCE = 10
+SAMPLE_SENTENCE = "I've been having a sharp pain in my lower back for about two weeks."
+
+
+class FakeLiveConnection:
+    """Just enough of the Deepgram live client to register and call handlers"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def start(self, options):
+        return True
+
+    def send(self, data):
+        pass
+
+    def finish(self):
+        pass
+
+
+def transcript_result(index):
+    words = [SimpleNamespace(word=w) for w in SAMPLE_SENTENCE.split()]
+    alternative = SimpleNamespace(transcript=SAMPLE_SENTENCE, words=words, confidence=0.98)
+    return SimpleNamespace(channel=SimpleNamespace(alternatives=[alternative]),
+                           start=index * 4.0, duration=4.0)
+
+
+def install_handlers(mode, log_file):
+    """Point the root logger at log_file using one of the benchmarked setups"""
+    root = logging.getLogger()
+    stream_handler = logging.StreamHandler(log_file)
+    stream_handler.setFormatter(KeyValueFormatter())
+    stream_handler.addFilter(PhiRedactionFilter())
+
+    if mode == "sync":
+        root.handlers = [stream_handler]
+        return None
+    log_queue = queue.Queue(maxsize=10000)
+    root.handlers = [NonBlockingQueueHandler(log_queue)]
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
+def measure(mode, level, sample_every, events):
+    service = MedicalScribeService(RecordingSocketIO())
+    connection = FakeLiveConnection()
+    service.deepgram_service.client = SimpleNamespace(
+        listen=SimpleNamespace(live=SimpleNamespace(v=lambda version: connection)))
+    service.deepgram_service.send_audio_chunk_to_stream = lambda sid, data, *args: True
+    medical_scribe_service._audio_chunk_log_sampler = LogSampler(sample_every)
+
+    with tempfile.TemporaryFile('w') as log_file:
+        logging.getLogger().setLevel(level)
+        listener = install_handlers(mode, log_file)
+
+        service.create_session('bench')
+        service.start_recording('bench')
+        on_message = connection.handlers[LiveTranscriptionEvents.Transcript]
+        pcm = os.urandom(CHUNK_BYTES)
+
+        started = time.perf_counter()
+        for i in range(events):
+            service.add_audio_chunk('bench', pcm)
+            if i % CHUNKS_PER_UTTERANCE == 0:
+                on_message(connection, transcript_result(i))
+        elapsed = time.perf_counter() - started
+
+        dropped = logging.getLogger().handlers[0].dropped if listener else 0
+        if listener:
+            listener.stop()
+        log_bytes = log_file.tell()
+
+    return (f"{events / elapsed:,.0f}", f"{elapsed / events * 1e6:.1f}", log_bytes, dropped)
+
+
+def run(events: int):
+    configurations = [
+        ("sync", logging.DEBUG, 1, "sync/DEBUG/every event"),
+        ("queued", logging.DEBUG, 100, "queued/DEBUG/sampled 1:100"),
+        ("queued", logging.INFO, 100, "queued/INFO"),
+    ]
+    rows = [(label,) + measure(mode, level, sample_every, events)
+            for mode, level, sample_every, label in configurations]
+
+    print(f"{events} audio chunks, one transcript per {CHUNKS_PER_UTTERANCE} chunks\n")
+    print_table(("setup", "events/s", "us/event", "log bytes", "dropped"), rows)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
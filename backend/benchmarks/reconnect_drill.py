@@ -0,0 +1,101 @@
+"""Deepgram reconnect drill against a local fake server
+
+Streams a tagged visit (every 100 ms block of PCM carries its index, see
+benchmarks.fake_deepgram) through DeepgramService while the fake server
+refuses handshakes and aborts connections mid-stream, then checks the
+transcript for missing and repeated audio:
+
+- no reconnect: DEEPGRAM_RECONNECT_ATTEMPTS=0, the old behaviour
+- reconnect: backoff, replay buffer and timestamp de-duplication
+
+    python -m benchmarks.reconnect_drill [seconds] [drops]
+
+tests/test_deepgram_reconnect.py runs the same checks under pytest.
+"""
+import sys
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.common import print_table
+from benchmarks.fake_deepgram import FakeDeepgramServer
+from config.settings import Config
+from services.audio_pipeline import AudioFormat
+from services.deepgram_service import DeepgramService
+from services.service_container import create_deepgram_client
+
+SAMPLE_RATE = 16000
+BLOCK_MS = 100
+SPEED = 4  # send audio at 4x real time
+DROP_AFTER_SECONDS = 4.0
+
+
+def tagged_block(index: int) -> bytes:
+    return np.full(SAMPLE_RATE * BLOCK_MS // 1000, index, dtype="<i2").tobytes()
+
+
+def drill(seconds: int, drops: int, attempts: int):
+    Config.DEEPGRAM_RECONNECT_ATTEMPTS = attempts
+    Config.DEEPGRAM_RECONNECT_BASE_MS = 100
+    Config.DEEPGRAM_RECONNECT_MAX_MS = 1000
+    blocks = seconds * 1000 // BLOCK_MS
+
+    # The first reconnect attempt after each drop is refused as well
+    with FakeDeepgramServer(drops=drops, drop_after_seconds=DROP_AFTER_SECONDS, refuse_after_drop=1) as server:
+        Config.DEEPGRAM_URL = server.url
+        # Not the shared client: each drill talks to a new fake server
+        deepgram = DeepgramService(create_deepgram_client())
+
+        words = []
+        outages = []
+        outage_started = {}
+        lock = threading.Lock()
+
+        def on_transcript(data):
+            with lock:
+                words.extend(data['text'].split())
+
+        def on_state(state):
+            now = time.monotonic()
+            if state == "reconnecting":
+                outage_started['at'] = now
+            elif state == "connected" and 'at' in outage_started:
+                outages.append(now - outage_started.pop('at'))
+
+        audio_format = AudioFormat(encoding="linear16", sample_rate=SAMPLE_RATE, input_sample_rate=SAMPLE_RATE)
+        deepgram.start_streaming_session("drill", on_transcript, audio_format, on_connection_state=on_state)
+
+        started = time.monotonic()
+        for index in range(blocks):
+            due = started + index * BLOCK_MS / 1000 / SPEED
+            time.sleep(max(0.0, due - time.monotonic()))
+            deepgram.send_audio_chunk_to_stream("drill", tagged_block(index))
+        connection_stats = deepgram.get_send_queue_stats("drill")['connection']
+        deepgram.stop_streaming_session("drill")
+
+    heard = [int(word[1:]) for word in words]
+    unique = set(heard)
+    missing = blocks - len(unique & set(range(blocks)))
+    repeated = len(heard) - len(unique)
+    in_order = heard == sorted(heard)
+    return (blocks, missing, repeated, "yes" if in_order else "no", server.stats['dropped'],
+            connection_stats['reconnects'], f"{max(outages) * 1000:.0f}" if outages else "-",
+            connection_stats['duplicate_segments_dropped'], connection_stats['duplicate_words_trimmed'])
+
+
+def run(seconds: int, drops: int):
+    attempts = Config.DEEPGRAM_RECONNECT_ATTEMPTS
+    rows = [
+        ("no reconnect",) + drill(seconds, drops, attempts=0),
+        ("reconnect",) + drill(seconds, drops, attempts=attempts),
+    ]
+    print(f"{seconds}s visit at {SPEED}x real time, connection aborted every "
+          f"{DROP_AFTER_SECONDS:.0f}s of audio, {drops} times\n")
+    print_table(("mode", "words sent", "missing", "repeated", "in order", "drops", "reconnects",
+                 "worst outage ms", "dup segments dropped", "dup words trimmed"), rows)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 30,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3)
@@ -0,0 +1,113 @@
+"""Replay an archived visit through DeepgramService without a live mic
+
+Memory-maps the visit's WAV segments (see AUDIO_ARCHIVE_ENABLED) and feeds
+the PCM to a streaming session in chunk_ms pieces, paced at --speed times
+real time. --speed 0 sends as fast as the session's send queue drains.
+Transcript segments are printed as JSON lines with --json, otherwise a
+summary with the realtime factor is printed at the end.
+
+    python -m benchmarks.replay_visit audio_archive/<session_id> [--speed 4]
+
+Replays go to the Deepgram API configured in the environment; --offline
+swaps in a connection that discards the audio, to time just the resampling,
+encoding and send queue.
+"""
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import print_table
+from benchmarks.logging_benchmark import FakeLiveConnection
+from config.settings import Config
+from services.audio_archive import ArchivedVisit
+from services.audio_pipeline import negotiate_audio_format
+from services.deepgram_service import DeepgramService
+
+QUEUE_HEADROOM = 0.5  # at --speed 0, keep the send queue at most half full
+
+
+def replay(visit: ArchivedVisit, speed: float, chunk_ms: int, encoding: str, offline: bool, as_json: bool):
+    deepgram = DeepgramService()
+    if offline:
+        connection = FakeLiveConnection()
+        deepgram.client = SimpleNamespace(listen=SimpleNamespace(live=SimpleNamespace(v=lambda version: connection)))
+
+    segments = []
+
+    def on_transcript(data):
+        segments.append(data)
+        if as_json:
+            print(json.dumps({key: data.get(key) for key in ('speaker', 'start', 'end', 'confidence', 'text')}))
+
+    session_id = f"replay-{visit.session_id or 'visit'}"
+    audio_format = negotiate_audio_format(
+        encoding, visit.sample_rate,
+        default_encoding=Config.AUDIO_ENCODING,
+        target_sample_rate=Config.AUDIO_TARGET_SAMPLE_RATE,
+        default_input_sample_rate=visit.sample_rate
+    )
+    if not deepgram.start_streaming_session(session_id, on_transcript, audio_format):
+        raise SystemExit("Could not start a Deepgram streaming session")
+
+    max_depth_ms = Config.AUDIO_SEND_QUEUE_MAX_MS * QUEUE_HEADROOM
+    sent_bytes = 0
+    chunks = 0
+    started = time.monotonic()
+    try:
+        for chunk in visit.chunks(chunk_ms):
+            if speed > 0:
+                due = started + sent_bytes / visit.bytes_per_second / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                while deepgram.get_send_queue_stats(session_id)['depth_ms'] > max_depth_ms:
+                    time.sleep(chunk_ms / 4000)
+            deepgram.send_audio_chunk_to_stream(session_id, chunk, time.monotonic())
+            sent_bytes += len(chunk)
+            chunks += 1
+        queue_stats = deepgram.get_send_queue_stats(session_id)
+    finally:
+        deepgram.stop_streaming_session(session_id)
+        visit.close()
+    elapsed = time.monotonic() - started
+
+    return {
+        'audio_seconds': sent_bytes / visit.bytes_per_second,
+        'wall_seconds': elapsed,
+        'chunks': chunks,
+        'segments': len(segments),
+        'dropped_frames': queue_stats.get('dropped_frames', 0),
+        'audio_format': audio_format
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay an archived visit through Deepgram streaming")
+    parser.add_argument("directory", help="archived visit directory (holds manifest.json)")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of real time; 0 = as fast as possible")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="audio per send, in milliseconds")
+    parser.add_argument("--encoding", default=None, help="stream encoding (default AUDIO_ENCODING)")
+    parser.add_argument("--offline", action="store_true", help="discard audio instead of calling Deepgram")
+    parser.add_argument("--json", action="store_true", help="print transcript segments as JSON lines")
+    args = parser.parse_args(argv)
+
+    visit = ArchivedVisit(args.directory)
+    result = replay(visit, args.speed, args.chunk_ms, args.encoding, args.offline, args.json)
+    if args.json:
+        return
+
+    audio_format = result['audio_format']
+    print(f"{len(visit.segments)} archived segments, {visit.sample_rate} Hz input, "
+          f"streamed as {audio_format.encoding} at {audio_format.sample_rate} Hz\n")
+    realtime = result['audio_seconds'] / result['wall_seconds'] if result['wall_seconds'] else float("inf")
+    print_table(
+        ("audio s", "wall s", "x realtime", "chunks", "segments", "dropped frames"),
+        [(f"{result['audio_seconds']:.1f}", f"{result['wall_seconds']:.2f}", f"{realtime:.1f}",
+          result['chunks'], result['segments'], result['dropped_frames'])]
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Run the standing benchmark suite
+
+Each benchmark runs in its own interpreter (several of them adjust Config
+or logging for their own process) with sizes small enough for a quick
+before/after comparison. The suite needs no API keys or network access:
+upstream APIs are the local fakes in benchmarks.fake_deepgram and
+benchmarks.fake_gemini.
+
+    python -m benchmarks.run_all [name ...]
+"""
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR
+
+SUITE = [
+    ("transcript_delta_benchmark", []),
+    ("audio_ingest_benchmark", []),
+    ("speaker_attribution_benchmark", []),
+    ("logging_benchmark", []),
+    ("session_store_benchmark", []),
+    ("transcript_preprocess_benchmark", []),
+    ("hedging_benchmark", ["--requests", "100"]),
+    ("startup_benchmark", ["--runs", "3"]),
+    ("reconnect_drill", ["12", "2"]),
+    ("load_test", ["--clients", "10", "--seconds", "10", "--speed", "2"]),
+]
+
+
+def main(names):
+    selected = [(name, args) for name, args in SUITE if not names or name in names]
+    failures = []
+    for name, args in selected:
+        print(f"== {name} {' '.join(args)}".rstrip(), flush=True)
+        started = time.monotonic()
+        result = subprocess.run([sys.executable, "-m", f"benchmarks.{name}", *args], cwd=BACKEND_DIR)
+        print(f"-- {name}: {'ok' if result.returncode == 0 else 'FAILED'} in {time.monotonic() - started:.1f}s\n",
+              flush=True)
+        if result.returncode:
+            failures.append(name)
+    if failures:
+        print(f"Failed: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
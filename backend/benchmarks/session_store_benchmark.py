@@ -0,0 +1,72 @@
+"""Cost of persisting a transcript segment on the caller's thread
+
+Appends segments to a set of recording sessions and saves each one the way
+the transcript callback does, reporting per-save latency for:
+
+- memory: InMemorySessionBackend (nothing persisted)
+- sqlite write-through: SqliteSessionBackend, waiting for each save to commit
+- sqlite write-behind: SqliteSessionBackend as configured by default
+
+    python -m benchmarks.session_store_benchmark [segments]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.common import print_table
+from models.session import RecordingSession
+from services.session_registry import InMemorySessionBackend, SessionRegistry, SqliteSessionBackend
+
+SESSIONS = 20
+SAMPLE_SENTENCE = "I've been having a sharp pain in my lower back for about two weeks."
+
+
+def measure(backend, segments, write_through=False):
+    registry = SessionRegistry(backend)
+    sessions = [RecordingSession(session_id=f"bench-{i}") for i in range(SESSIONS)]
+    for session in sessions:
+        registry.save(session)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(segments):
+        session = sessions[i % SESSIONS]
+        t0 = time.perf_counter_ns()
+        session.segments.append(SAMPLE_SENTENCE, 1 + i % 2, i * 4.0, i * 4.0 + 4.0, 0.98)
+        registry.save(session)
+        if write_through:
+            backend.flush()
+        latencies.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - started
+
+    drain_started = time.perf_counter()
+    if hasattr(backend, 'flush'):
+        backend.flush()
+    drain_ms = (time.perf_counter() - drain_started) * 1000
+    batches = backend.stats()['batches'] if hasattr(backend, 'stats') else "-"
+
+    latencies.sort()
+    return (f"{statistics.mean(latencies) / 1000:.1f}", f"{latencies[len(latencies) * 99 // 100] / 1000:.1f}",
+            f"{segments / elapsed:,.0f}", batches, f"{drain_ms:.1f}")
+
+
+def run(segments: int):
+    with tempfile.TemporaryDirectory() as directory:
+        rows = [("memory",) + measure(InMemorySessionBackend(), segments)]
+
+        backend = SqliteSessionBackend(os.path.join(directory, "through.db"))
+        rows.append(("sqlite write-through",) + measure(backend, segments, write_through=True))
+        backend.close()
+
+        backend = SqliteSessionBackend(os.path.join(directory, "behind.db"))
+        rows.append(("sqlite write-behind",) + measure(backend, segments))
+        backend.close()
+
+    print(f"{segments} segments across {SESSIONS} recording sessions\n")
+    print_table(("store", "mean us/save", "p99 us/save", "saves/s", "batches", "final flush ms"), rows)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,162 @@
+"""Speaker attribution accuracy and throughput on a labeled visit
+
+Replays a hand-labeled doctor/patient conversation (speaker 1 is the
+doctor) through:
+
+- legacy: the per-utterance heuristic that used to live inline in
+  DeepgramService.on_message (substring phrase checks, arrival-time gaps)
+- attributor: services.speaker_attribution.SpeakerAttributor
+
+and, for diarized results, compares first-word labels against the
+majority vote when the first words of a turn still carry the previous
+speaker's label, as Deepgram often does at turn boundaries.
+
+    python -m benchmarks.speaker_attribution_benchmark [repeats]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import print_table
+from services.speaker_attribution import SpeakerAttributor, majority_speaker
+
+# (speaker, start, end, text)
+VISIT = [
+    (1, 0.0, 2.1, "Good morning, what brings you in today?"),
+    (2, 2.9, 7.4, "I've been having a sharp pain in my lower back for about two weeks."),
+    (1, 8.0, 10.2, "Can you point to where it hurts the most?"),
+    (2, 10.9, 12.6, "Right here, on the left side."),
+    (1, 13.1, 16.0, "Does the pain travel down your leg at all?"),
+    (2, 16.8, 17.4, "Sometimes, yes."),
+    (1, 18.0, 18.9, "Which leg?"),
+    (2, 19.5, 20.1, "The left one."),
+    (1, 21.0, 25.8, "Tell me about anything that makes it better or worse, like sitting or walking."),
+    (2, 26.5, 32.0, "Sitting for a long time makes it worse and I feel better when I walk around a bit."),
+    (1, 32.6, 35.0, "Have you taken anything for it so far?"),
+    (2, 35.9, 39.8, "Just ibuprofen, about four hundred milligrams twice a day."),
+    (2, 40.1, 43.0, "It helps a little but it wears off by the afternoon."),
+    (1, 43.9, 47.5, "Any numbness, tingling, or trouble controlling your bladder?"),
+    (2, 48.4, 49.0, "No, nothing like that."),
+    (1, 49.8, 55.2, "Okay, I'm going to examine your back and check the strength in your legs."),
+    (1, 60.5, 63.0, "Please lie back on the table for me."),
+    (2, 63.6, 64.1, "Like this?"),
+    (1, 64.8, 65.6, "Perfect."),
+    (1, 66.0, 69.8, "Let's raise your left leg slowly and tell me when you feel the pain."),
+    (2, 70.9, 72.0, "There, that hurts."),
+    (1, 73.0, 79.5, "That suggests some irritation of the sciatic nerve, which is common with a disc problem."),
+    (2, 80.2, 82.0, "Is it something serious?"),
+    (1, 82.7, 89.9, "Most cases get better on their own within six weeks with activity and anti-inflammatories."),
+    (1, 90.3, 95.0, "We should start physical therapy and I'd like to see you again in four weeks."),
+    (2, 95.8, 99.1, "I'm worried about missing work for the appointments."),
+    (1, 99.9, 104.0, "We can schedule them early in the morning before work."),
+    (2, 104.6, 105.4, "Okay, thank you."),
+]
+
+DOCTOR_PHRASES = ["let's", "i'm going to", "can you", "how are", "what brings",
+                  "i need to", "we should", "i'd like to", "tell me about"]
+PATIENT_PHRASES = ["i have", "it hurts", "i feel", "my", "i can't",
+                   "i've been", "i think", "i'm worried", "i'm having"]
+
+
+def legacy_attribute(state, sentence, now):
+    """The old on_message fallback, with the clock passed in"""
+    time_gap = now - state['last_time'] if state['last_time'] is not None else 0
+    sentence_lower = sentence.lower()
+    word_count = len(sentence.split())
+    is_likely_doctor = any(phrase in sentence_lower for phrase in DOCTOR_PHRASES)
+    is_likely_patient = any(phrase in sentence_lower for phrase in PATIENT_PHRASES)
+
+    should_switch_speaker = False
+    if time_gap > 2.0:
+        should_switch_speaker = True
+    elif word_count < 5 and state['utterance_count'] > 0:
+        should_switch_speaker = True
+    elif is_likely_doctor and state['last_speaker'] == 2:
+        should_switch_speaker = True
+    elif is_likely_patient and state['last_speaker'] == 1:
+        should_switch_speaker = True
+    elif state['speaker_1_words'] > state['speaker_2_words'] + 50 and state['last_speaker'] == 1:
+        should_switch_speaker = True
+    elif state['speaker_2_words'] > state['speaker_1_words'] + 50 and state['last_speaker'] == 2:
+        should_switch_speaker = True
+
+    if should_switch_speaker:
+        state['last_speaker'] = 2 if state['last_speaker'] == 1 else 1
+    state['utterance_count'] += 1
+    state['speaker_%d_words' % state['last_speaker']] += word_count
+    state['last_time'] = now
+    return state['last_speaker']
+
+
+def run_legacy(repeats):
+    correct = 0
+    started = time.perf_counter()
+    for _ in range(repeats):
+        state = {'last_speaker': 1, 'utterance_count': 0, 'speaker_1_words': 0,
+                 'speaker_2_words': 0, 'last_time': None}
+        for speaker, start, end, text in VISIT:
+            # Final results arrive when the utterance ends
+            correct += legacy_attribute(state, text, end) == speaker
+    return correct, time.perf_counter() - started
+
+
+def run_attributor(repeats):
+    attributor = SpeakerAttributor()
+    correct = 0
+    started = time.perf_counter()
+    for i in range(repeats):
+        session_id = f"bench-{i}"
+        for speaker, start, end, text in VISIT:
+            correct += attributor.attribute(session_id, text, None, end) == speaker
+        attributor.forget(session_id)
+    return correct, time.perf_counter() - started
+
+
+def diarized_words(rng, carryover_words):
+    """Word lists labeled 0/1 whose first words may keep the previous speaker"""
+    results = []
+    previous = None
+    for speaker, _, _, text in VISIT:
+        label = speaker - 1
+        words = []
+        carry = rng.randint(0, carryover_words) if previous is not None and previous != label else 0
+        for index, word in enumerate(text.split()):
+            words.append(SimpleNamespace(word=word, speaker=previous if index < carry else label))
+        results.append((speaker, words))
+        previous = label
+    return results
+
+
+def run_diarized(repeats, carryover_words):
+    rng = random.Random(7)
+    first_word = majority = total = 0
+    for _ in range(repeats):
+        for speaker, words in diarized_words(rng, carryover_words):
+            first_word += words[0].speaker + 1 == speaker
+            majority += majority_speaker(words) + 1 == speaker
+            total += 1
+    return first_word / total, majority / total
+
+
+def run(repeats: int):
+    utterances = repeats * len(VISIT)
+    rows = []
+    for label, runner in (("legacy heuristic", run_legacy), ("SpeakerAttributor", run_attributor)):
+        correct, elapsed = runner(repeats)
+        rows.append((label, f"{correct / utterances:.1%}", f"{utterances / elapsed:,.0f}",
+                     f"{elapsed / utterances * 1e6:.2f}"))
+
+    print(f"{len(VISIT)} labeled utterances x {repeats} visits, no diarization\n")
+    print_table(("engine", "accuracy", "utterances/s", "us/utterance"), rows)
+
+    print("\nDiarized results with label carry-over at turn boundaries\n")
+    rows = []
+    for carryover in (0, 1, 2, 3):
+        first_word, majority = run_diarized(max(repeats // 10, 1), carryover)
+        rows.append((carryover, f"{first_word:.1%}", f"{majority:.1%}"))
+    print_table(("max carry-over words", "first word", "majority vote"), rows)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,81 @@
+"""Cold start: how long a fresh backend process takes to become ready
+
+Starts --runs fresh interpreters against local Deepgram and Gemini fakes
+and reports medians of:
+
+- import: importing app_factory (everything app.py and wsgi.py import)
+- create_app: building the app, its services and socket handlers
+- ready: process start until /health first answers 200
+- warm: process start until the shared SDK clients have been built in
+  the background (services.service_container)
+
+    python -m benchmarks.startup_benchmark [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import BACKEND_DIR, print_table
+from benchmarks.fake_deepgram import FakeDeepgramServer
+from benchmarks.fake_gemini import FakeGeminiServer
+
+CHILD = """
+import time
+started = time.perf_counter()
+import benchmarks.common
+import app_factory
+imported = time.perf_counter()
+from config.settings import Config
+app, socketio = app_factory.create_app(Config)
+created = time.perf_counter()
+
+client = app.test_client()
+while client.get('/health').status_code != 200:
+    time.sleep(0.005)
+ready = time.perf_counter()
+
+from services.service_container import get_service_container
+container = get_service_container()
+while not all(entry['built'] for entry in container.stats().values()):
+    time.sleep(0.005)
+warm = time.perf_counter()
+
+print(json.dumps({
+    'import': imported - started, 'create_app': created - imported,
+    'ready': ready - started, 'warm': warm - started, 'sdk_build_ms': container.stats(),
+}))
+import os
+os._exit(0)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = []
+    with FakeDeepgramServer() as deepgram, FakeGeminiServer() as gemini:
+        env = dict(os.environ, DEEPGRAM_URL=deepgram.url, GEMINI_API_URL=gemini.url,
+                   SESSION_BACKEND='memory', LOG_LEVEL='WARNING')
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, "-c", "import json\n" + CHILD], cwd=BACKEND_DIR, env=env,
+                                    capture_output=True, text=True, timeout=120)
+            if output.returncode:
+                raise SystemExit(f"startup run failed:\n{output.stderr}")
+            runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    rows = [(phase, f"{statistics.median(run[phase] for run in runs) * 1000:.0f}",
+             f"{min(run[phase] for run in runs) * 1000:.0f}", f"{max(run[phase] for run in runs) * 1000:.0f}")
+            for phase in ('import', 'create_app', 'ready', 'warm')]
+    print(f"{args.runs} cold starts, times from interpreter start (ms)")
+    print_table(["phase", "median", "min", "max"], rows)
+    print("background SDK builds (last run):",
+          ", ".join(f"{name} {entry['build_ms']} ms" for name, entry in runs[-1]['sdk_build_ms'].items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Per-event live_transcription payload size as a visit grows
+
+Compares the delta protocol (one numbered segment per event) against the
+legacy payload that re-sent full_transcript with every utterance.
+
+    python -m benchmarks.transcript_delta_benchmark [utterances]
+"""
+import contextlib
+import io
+import json
+import sys
+import time
+
+from benchmarks.common import RecordingSocketIO, print_table
+from services.medical_scribe_service import MedicalScribeService
+
+SAMPLE_UTTERANCES = [
+    "Good morning, what brings you in today?",
+    "I've been having a sharp pain in my lower back for about two weeks.",
+    "Does the pain radiate down either leg?",
+    "Sometimes down the left leg, mostly when I sit for a long time.",
+    "Any numbness, tingling or weakness?",
+    "A little tingling in my toes at night.",
+]
+
+
+def run(utterances: int):
+    socketio = RecordingSocketIO()
+    service = MedicalScribeService(socketio)
+    service.create_session('bench')
+
+    callbacks = []
+    service.deepgram_service.start_streaming_session = lambda sid, cb, *args: callbacks.append(cb) or True
+
+    checkpoints = sorted({1, 10, 100, 500, 1000, utterances} & set(range(1, utterances + 1)))
+    rows = []
+    started = time.perf_counter()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        service.start_recording('bench')
+        on_transcript = callbacks[0]
+
+        for i in range(1, utterances + 1):
+            sentence = SAMPLE_UTTERANCES[i % len(SAMPLE_UTTERANCES)]
+            speaker = 1 + i % 2
+            on_transcript({
+                'text': sentence,
+                'speaker': speaker,
+                'formatted_text': f"Speaker {speaker}: {sentence}",
+                'start': i * 4.0,
+                'end': i * 4.0 + 3.5,
+                'confidence': 0.98
+            })
+
+            if i in checkpoints:
+                _, delta_payload = socketio.events[-1]
+                legacy_payload = dict(delta_payload, full_transcript=service.get_session('bench').transcript)
+                legacy_payload.pop('seq')
+                rows.append((
+                    i,
+                    len(json.dumps(delta_payload)),
+                    len(json.dumps(legacy_payload)),
+                ))
+
+    elapsed = time.perf_counter() - started
+    print(f"Simulated {utterances} utterances in {elapsed * 1000:.1f} ms\n")
+    print_table(("utterance", "delta bytes/event", "legacy bytes/event"), rows)
+
+    resync = service.get_transcript_delta('bench', utterances - 5)
+    print(f"\nResync after seq {utterances - 5}: {len(resync['segments'])} segments, "
+          f"{len(json.dumps(resync))} bytes")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,103 @@
+"""Prompt size and SOAP latency with and without transcript preprocessing
+
+Builds visits of increasing length from a disfluent doctor/patient
+conversation, split into short segments the way Deepgram finalizes them,
+and reports for each:
+
+- the estimated transcript tokens before and after
+  services.transcript_preprocessor.preprocess_transcript, and its run time
+- SOAP note latency through GeminiService against benchmarks.fake_gemini,
+  whose first-token delay grows with prompt size (--prefill-ms per 1000
+  prompt tokens)
+
+    python -m benchmarks.transcript_preprocess_benchmark [--visits 5,20,60] [--prefill-ms 40]
+"""
+import argparse
+import time
+
+from benchmarks.common import print_table
+from benchmarks.fake_gemini import FakeGeminiServer
+from config.settings import Config
+from models.transcript import TranscriptStore
+from services.soap_drafter import estimate_tokens
+from services.transcript_preprocessor import preprocess_transcript
+
+# (speaker, utterance); speaker 1 is the doctor. Sentences become separate segments
+CONVERSATION = [
+    (1, "Good morning. Um, so what, what brings you in today?"),
+    (2, "Uh, well, I've been having this, um, this pain in my lower back. It's been, uh, about two weeks now."),
+    (1, "Okay. And does the pain, uh, does it go down either leg?"),
+    (2, "Sometimes. Um, sometimes the left leg, you know, when I sit for a long long time."),
+    (1, "Mhm. Any numbness or, uh, tingling? Any weakness?"),
+    (2, "A little, um, tingling in my toes. Mostly at night. Uh, no weakness I think."),
+    (1, "Have you, have you taken anything for it?"),
+    (2, "Just ibuprofen, uh, four hundred milligrams, um, twice a day. It helps a, a little."),
+    (1, "Okay. Your blood pressure today is one hundred and thirty-two over eighty-four. Temperature ninety eight point six."),
+    (2, "Is that, um, is that high?"),
+    (1, "It's a little elevated. Uh, we'll recheck it in, in two weeks. I'm going to, um, order an X-ray of the lumbar spine."),
+    (1, "And I'd like you to, uh, start physical therapy, three times a week, um, for six weeks."),
+    (2, "Okay. Um, should I, should I keep taking the ibuprofen?"),
+    (1, "Yes, uh, with food. No more than twelve hundred milligrams a day. Uh, come back if the tingling gets worse."),
+]
+
+
+def build_visit(rounds: int) -> TranscriptStore:
+    visit = TranscriptStore()
+    clock = 0.0
+    for _ in range(rounds):
+        for speaker, utterance in CONVERSATION:
+            for sentence in utterance.replace("? ", "?|").replace(". ", ".|").split("|"):
+                duration = len(sentence.split()) * 0.35
+                visit.append(sentence, speaker, clock, clock + duration, 0.95)
+                clock += duration + 0.3
+    return visit
+
+
+def soap_latency(service, transcript, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = service.generate_soap_note(transcript)
+        if not result.success:
+            raise SystemExit(f"SOAP generation failed: {result.error}")
+    return (time.perf_counter() - started) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--visits', default="5,20,60",
+                        help="comma-separated visit lengths, in repetitions of the sample conversation")
+    parser.add_argument('--prefill-ms', type=float, default=40.0,
+                        help="fake Gemini first-token delay per 1000 prompt tokens")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with FakeGeminiServer(first_token_ms=100, prefill_ms_per_1k_tokens=args.prefill_ms) as fake:
+        Config.GEMINI_API_URL = fake.url
+        Config.SOAP_CACHE_ENABLED = False
+        # Compare one prompt against one prompt, without map-reduce
+        Config.SOAP_CHUNK_TOKENS = 10 ** 9
+        from services.gemini_service import GeminiService
+        service = GeminiService()
+
+        rows = []
+        for rounds in (int(value) for value in args.visits.split(",")):
+            visit = build_visit(rounds)
+            started = time.perf_counter()
+            cleaned = preprocess_transcript(visit)
+            preprocess_ms = (time.perf_counter() - started) * 1000
+            raw_tokens, tokens = estimate_tokens(visit), estimate_tokens(cleaned)
+            raw_s = soap_latency(service, visit, args.repeats)
+            cleaned_s = soap_latency(service, cleaned, args.repeats)
+            rows.append((
+                len(visit), len(cleaned), raw_tokens, tokens,
+                f"{100 * (1 - tokens / raw_tokens):.1f}%", f"{preprocess_ms:.2f}",
+                f"{raw_s * 1000:.0f}", f"{cleaned_s * 1000:.0f}",
+            ))
+
+    print(f"fake Gemini: 100 ms + {args.prefill_ms:g} ms per 1000 prompt tokens to first token")
+    print_table(["segments", "turns", "raw tokens", "tokens", "saved", "preprocess ms",
+                 "raw soap ms", "preprocessed soap ms"], rows)
+
+
+if __name__ == '__main__':
+    main()
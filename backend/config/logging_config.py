@@ -0,0 +1,154 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+from typing import Dict, Optional
+
+# Record attributes that hold transcript or note content; their values are
+# replaced before anything reaches a log sink unless LOG_PHI is enabled
+PHI_FIELDS = frozenset({'text', 'raw_text', 'transcript', 'sentence', 'soap_note', 'soap_draft', 'prompt', 'words'})
+
+# Identifiers that can turn up in free-text messages (exception text, API errors)
+PHI_PATTERNS = (
+    (re.compile(r"\b\d{3}-\d{2}-\d{4}\b"), "[ssn]"),
+    (re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b"), "[email]"),
+    (re.compile(r"(?<!\w)\+?\d[\d ().-]{8,}\d\b"), "[phone]"),
+    (re.compile(r"\b\d{1,2}/\d{1,2}/\d{2,4}\b"), "[date]"),
+)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+def record_fields(record: logging.LogRecord) -> Dict[str, object]:
+    """Structured fields passed to a log call with extra="""
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+def redact_text(text: str) -> str:
+    for pattern, replacement in PHI_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class PhiRedactionFilter(logging.Filter):
+    """Masks transcript content and identifiers before records are written"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key in PHI_FIELDS.intersection(record.__dict__):
+            value = record.__dict__[key]
+            record.__dict__[key] = f"[redacted {len(value)}]" if hasattr(value, '__len__') else "[redacted]"
+        record.msg = redact_text(record.getMessage())
+        record.args = None
+        if record.exc_text:
+            record.exc_text = redact_text(record.exc_text)
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable lines with extra fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller and defers formatting
+
+    Records are handed to the listener thread as-is (only the message args
+    are merged), so formatting, redaction and stream I/O all happen off the
+    request path. When the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Args may be mutated by the caller before the listener gets to them
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogSampler:
+    """Lets one in every `every` calls through, for per-chunk events
+
+        if logger.isEnabledFor(logging.DEBUG) and audio_log_sampler():
+            logger.debug(...)
+    """
+
+    def __init__(self, every: int):
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def __call__(self) -> bool:
+        return next(self._counter) % self.every == 0
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """'services.deepgram_service=DEBUG,werkzeug=WARNING' -> {name: level}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(config) -> logging.handlers.QueueListener:
+    """Route all logging through a bounded queue to a single writer thread
+
+    Safe to call more than once; later calls only re-apply levels.
+    """
+    global _listener
+
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL.upper())
+    for name, level in parse_module_levels(config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if config.LOG_FORMAT == 'json' else KeyValueFormatter())
+    if not config.LOG_PHI:
+        stream_handler.addFilter(PhiRedactionFilter())
+
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    root.handlers = [NonBlockingQueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -11,6 +11,167 @@ class Config:
     
     # CORS settings
     CORS_ORIGINS = ["http://localhost:3000"]
+
+    # Server: app.py runs the threaded Werkzeug development server, wsgi.py is
+    # the production entry point (gunicorn's gevent worker, ASYNC_MODE=gevent).
+    # With several server processes, SOCKETIO_MESSAGE_QUEUE (a Redis URL)
+    # relays emits so they reach clients connected to any of them
+    ASYNC_MODE = os.getenv('ASYNC_MODE', 'threading')
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'medical-scribe')
+
+    # Audio stream sent to Deepgram: browser PCM is resampled to the target
+    # rate and optionally encoded (linear16, flac or opus)
+    AUDIO_INPUT_SAMPLE_RATE = int(os.getenv('AUDIO_INPUT_SAMPLE_RATE', 48000))
+    AUDIO_TARGET_SAMPLE_RATE = int(os.getenv('AUDIO_TARGET_SAMPLE_RATE', 16000))
+    AUDIO_ENCODING = os.getenv('AUDIO_ENCODING', 'linear16')
+    
+    # Per-session audio send queue: frames are coalesced into packets of
+    # AUDIO_SEND_PACKET_MS; on overflow either drop the oldest audio
+    # (drop_oldest) or ask the client to pause (backpressure)
+    AUDIO_SEND_PACKET_MS = int(os.getenv('AUDIO_SEND_PACKET_MS', 100))
+    AUDIO_SEND_QUEUE_MAX_MS = int(os.getenv('AUDIO_SEND_QUEUE_MAX_MS', 2000))
+    AUDIO_SEND_OVERFLOW_POLICY = os.getenv('AUDIO_SEND_OVERFLOW_POLICY', 'drop_oldest')
+    
+    # Deepgram reconnects: a dropped live connection is reopened with jittered
+    # exponential backoff (DEEPGRAM_RECONNECT_BASE_MS doubling up to
+    # DEEPGRAM_RECONNECT_MAX_MS, at most DEEPGRAM_RECONNECT_ATTEMPTS tries) and
+    # the last DEEPGRAM_REPLAY_SECONDS of audio are sent again; transcripts of
+    # the replayed audio are de-duplicated by timestamp. DEEPGRAM_URL overrides
+    # the API endpoint
+    DEEPGRAM_URL = os.getenv('DEEPGRAM_URL', '')
+    DEEPGRAM_RECONNECT_ATTEMPTS = int(os.getenv('DEEPGRAM_RECONNECT_ATTEMPTS', 6))
+    DEEPGRAM_RECONNECT_BASE_MS = int(os.getenv('DEEPGRAM_RECONNECT_BASE_MS', 250))
+    DEEPGRAM_RECONNECT_MAX_MS = int(os.getenv('DEEPGRAM_RECONNECT_MAX_MS', 8000))
+    DEEPGRAM_REPLAY_SECONDS = float(os.getenv('DEEPGRAM_REPLAY_SECONDS', 10))
+    
+    # Session registry shared by REST routes and socket handlers: 'sqlite'
+    # persists sessions and transcripts to SESSION_DB_PATH (written behind
+    # every SESSION_FLUSH_INTERVAL_MS; the file holds PHI), 'redis' shares
+    # them between workers, 'memory' keeps them in this process only.
+    # After a restart, interrupted recordings either wait for the client to
+    # resume them (SESSION_RECOVERY=resume, for SESSION_DISCONNECT_GRACE_SECONDS)
+    # or are finalized straight away (finalize) by generating their SOAP note
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'scribe_sessions.db')
+    SESSION_FLUSH_INTERVAL_MS = int(os.getenv('SESSION_FLUSH_INTERVAL_MS', 200))
+    SESSION_RECOVERY = os.getenv('SESSION_RECOVERY', 'resume')
+    
+    # Session lifecycle: recordings whose sockets have been gone for
+    # SESSION_DISCONNECT_GRACE_SECONDS (or that send no audio for
+    # SESSION_RECORDING_IDLE_SECONDS) are stopped and their note queued;
+    # sessions idle for SESSION_IDLE_TIMEOUT_SECONDS are cleaned up, and the
+    # least recently used finished sessions are evicted above the caps
+    SESSION_IDLE_TIMEOUT_SECONDS = float(os.getenv('SESSION_IDLE_TIMEOUT_SECONDS', 1800))
+    SESSION_RECORDING_IDLE_SECONDS = float(os.getenv('SESSION_RECORDING_IDLE_SECONDS', 300))
+    SESSION_DISCONNECT_GRACE_SECONDS = float(os.getenv('SESSION_DISCONNECT_GRACE_SECONDS', 120))
+    SESSION_REAP_INTERVAL_SECONDS = float(os.getenv('SESSION_REAP_INTERVAL_SECONDS', 30))
+    SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', 500))
+    SESSION_MAX_MEMORY_MB = int(os.getenv('SESSION_MAX_MEMORY_MB', 256))
+    
+    # Health probes: Deepgram, Gemini and the session store are checked every
+    # HEALTH_PROBE_INTERVAL_SECONDS in the background (each check given
+    # HEALTH_PROBE_TIMEOUT_SECONDS) and /health serves the cached results;
+    # results older than HEALTH_PROBE_TTL_SECONDS count as failures
+    HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv('HEALTH_PROBE_INTERVAL_SECONDS', 30))
+    HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv('HEALTH_PROBE_TIMEOUT_SECONDS', 5))
+    HEALTH_PROBE_TTL_SECONDS = float(os.getenv('HEALTH_PROBE_TTL_SECONDS', 90))
+    
+    # SOAP generation queue: bounded worker pool with retry on quota and
+    # transient Gemini errors (exponential backoff with jitter)
+    SOAP_WORKERS = int(os.getenv('SOAP_WORKERS', 2))
+    SOAP_QUEUE_MAX = int(os.getenv('SOAP_QUEUE_MAX', 100))
+    SOAP_MAX_ATTEMPTS = int(os.getenv('SOAP_MAX_ATTEMPTS', 4))
+    SOAP_RETRY_BASE_SECONDS = float(os.getenv('SOAP_RETRY_BASE_SECONDS', 2))
+    SOAP_RETRY_MAX_SECONDS = float(os.getenv('SOAP_RETRY_MAX_SECONDS', 30))
+    # Stream the note to clients as soap_note_partial events while it is generated
+    SOAP_STREAMING = os.getenv('SOAP_STREAMING', 'True').lower() == 'true'
+    SOAP_MAX_OUTPUT_TOKENS = int(os.getenv('SOAP_MAX_OUTPUT_TOKENS', 2000))
+    # Clean the transcript before it goes into a prompt: fillers, stutters and
+    # repeats are removed, numbers written as digits and consecutive
+    # utterances by one speaker merged (services.transcript_preprocessor)
+    SOAP_PREPROCESS_TRANSCRIPT = os.getenv('SOAP_PREPROCESS_TRANSCRIPT', 'True').lower() == 'true'
+
+    # Long visits: transcripts over SOAP_CHUNK_TOKENS are split on speaker
+    # turns into chunks of at most that size; clinical facts are extracted
+    # from up to SOAP_MAP_PARALLELISM chunks at a time (each extraction capped
+    # at SOAP_MAP_MAX_OUTPUT_TOKENS) and one more request merges them into the note
+    SOAP_CHUNK_TOKENS = int(os.getenv('SOAP_CHUNK_TOKENS', 8000))
+    SOAP_MAP_PARALLELISM = int(os.getenv('SOAP_MAP_PARALLELISM', 4))
+    SOAP_MAP_MAX_OUTPUT_TOKENS = int(os.getenv('SOAP_MAP_MAX_OUTPUT_TOKENS', 1024))
+    
+    # Rolling SOAP draft: summarize new transcript into a running draft while
+    # recording, once SOAP_DRAFT_TOKEN_BUDGET tokens or SOAP_DRAFT_INTERVAL_SECONDS
+    # have accumulated, so stop only has to merge the final delta. Drafts for
+    # concurrent visits are updated by SOAP_DRAFT_WORKERS threads
+    SOAP_ROLLING_DRAFT = os.getenv('SOAP_ROLLING_DRAFT', 'False').lower() == 'true'
+    SOAP_DRAFT_TOKEN_BUDGET = int(os.getenv('SOAP_DRAFT_TOKEN_BUDGET', 1500))
+    SOAP_DRAFT_INTERVAL_SECONDS = float(os.getenv('SOAP_DRAFT_INTERVAL_SECONDS', 120))
+    SOAP_DRAFT_MAX_DELTA_TOKENS = int(os.getenv('SOAP_DRAFT_MAX_DELTA_TOKENS', 4000))
+    SOAP_DRAFT_WORKERS = int(os.getenv('SOAP_DRAFT_WORKERS', 2))
+    
+    # SOAP result cache keyed on transcript, prompt version, model and
+    # generation config. The disk tier is off unless SOAP_CACHE_DIR is set and
+    # needs SOAP_CACHE_KEY (a Fernet key) since entries contain PHI
+    SOAP_CACHE_ENABLED = os.getenv('SOAP_CACHE_ENABLED', 'True').lower() == 'true'
+    SOAP_CACHE_MAX_ENTRIES = int(os.getenv('SOAP_CACHE_MAX_ENTRIES', 256))
+    SOAP_CACHE_TTL_SECONDS = float(os.getenv('SOAP_CACHE_TTL_SECONDS', 3600))
+    SOAP_CACHE_DIR = os.getenv('SOAP_CACHE_DIR', '')
+    SOAP_CACHE_DISK_TTL_SECONDS = float(os.getenv('SOAP_CACHE_DISK_TTL_SECONDS', 86400))
+    SOAP_CACHE_KEY = os.getenv('SOAP_CACHE_KEY')
+    
+    # Raw audio archive: when enabled, each session's input PCM is written to
+    # AUDIO_ARCHIVE_DIR/<session_id>/ as 'wav' or 'flac' segments of
+    # AUDIO_ARCHIVE_SEGMENT_SECONDS for replay (benchmarks.replay_visit).
+    # Recordings are PHI. Audio is dropped rather than blocking the stream if
+    # more than AUDIO_ARCHIVE_MAX_BUFFER_MB per session waits for the disk
+    AUDIO_ARCHIVE_ENABLED = os.getenv('AUDIO_ARCHIVE_ENABLED', 'False').lower() == 'true'
+    AUDIO_ARCHIVE_DIR = os.getenv('AUDIO_ARCHIVE_DIR', 'audio_archive')
+    AUDIO_ARCHIVE_FORMAT = os.getenv('AUDIO_ARCHIVE_FORMAT', 'wav')
+    AUDIO_ARCHIVE_SEGMENT_SECONDS = float(os.getenv('AUDIO_ARCHIVE_SEGMENT_SECONDS', 300))
+    AUDIO_ARCHIVE_MAX_BUFFER_MB = float(os.getenv('AUDIO_ARCHIVE_MAX_BUFFER_MB', 8))
+    
+    # Logging: per-module levels as 'services.deepgram_service=DEBUG,...';
+    # per-audio-chunk events are logged once every LOG_SAMPLE_EVERY chunks.
+    # Transcript content is redacted from logs unless LOG_PHI is set
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    LOG_PHI = os.getenv('LOG_PHI', 'False').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))
+    
+    # Per-session tracing: spans for each visit are kept for the timeline
+    # endpoint and exported when SOAP generation finishes ('none', 'json'
+    # files in TRACE_EXPORT_DIR, or 'otlp' to an OTLP/HTTP collector).
+    # Per-segment spans leave the last TRACE_RESERVED_SPANS of TRACE_MAX_SPANS
+    # free for the visit's lifecycle and SOAP spans
+    TRACE_ENABLED = os.getenv('TRACE_ENABLED', 'True').lower() == 'true'
+    TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'none')
+    TRACE_EXPORT_DIR = os.getenv('TRACE_EXPORT_DIR', 'traces')
+    OTLP_ENDPOINT = os.getenv('OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+    TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', 2000))
+    TRACE_RETAINED = int(os.getenv('TRACE_RETAINED', 500))
+    TRACE_RESERVED_SPANS = int(os.getenv('TRACE_RESERVED_SPANS', 100))
+    
+    # Gemini endpoint override, sent over the REST transport (e.g. a local
+    # fake such as benchmarks.fake_gemini)
+    GEMINI_API_URL = os.getenv('GEMINI_API_URL', '')
+    
+    # Gemini model routing: prompts go to the first 'model:max_prompt_tokens'
+    # entry of GEMINI_MODEL_ROUTES they fit in, otherwise to GEMINI_MODEL.
+    # Hedging: a request with no output after the model's recent
+    # GEMINI_HEDGE_PERCENTILE latency (GEMINI_HEDGE_INITIAL_SECONDS until
+    # GEMINI_HEDGE_MIN_SAMPLES requests have been timed) is sent again to
+    # GEMINI_HEDGE_MODEL and/or GEMINI_HEDGE_URL, and the slower one dropped
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+    GEMINI_MODEL_ROUTES = os.getenv('GEMINI_MODEL_ROUTES', '')
+    GEMINI_HEDGE_MODEL = os.getenv('GEMINI_HEDGE_MODEL', '')
+    GEMINI_HEDGE_URL = os.getenv('GEMINI_HEDGE_URL', '')
+    GEMINI_HEDGE_PERCENTILE = float(os.getenv('GEMINI_HEDGE_PERCENTILE', 95))
+    GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv('GEMINI_HEDGE_MIN_SAMPLES', 20))
+    GEMINI_HEDGE_INITIAL_SECONDS = float(os.getenv('GEMINI_HEDGE_INITIAL_SECONDS', 10))
     
     # API Keys
     DEEPGRAM_API_KEY = os.getenv('DEEPGRAM_API_KEY')
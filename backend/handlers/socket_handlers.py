@@ -1,29 +1,59 @@
 import asyncio
-from flask_socketio import emit
-from services.medical_scribe_service import MedicalScribeService
+import inspect
+import logging
+import time
+from flask import request
+from flask_socketio import emit, join_room
+from models.soap_job import SoapJobStatus
+from services.medical_scribe_service import MedicalScribeService, session_room
+from services.metrics import SOCKET_EVENTS, STOP_TO_SOAP_TIMER
+
+logger = logging.getLogger(__name__)
 
 class SocketHandlers:
-    def __init__(self, socketio):
+    def __init__(self, socketio, scribe_service: MedicalScribeService):
         self.socketio = socketio
-        self.scribe_service = MedicalScribeService(socketio)  # Pass socketio for real-time updates
+        self.scribe_service = scribe_service  # Shared with the REST routes; emits real-time updates
         self._register_handlers()
     
     def _register_handlers(self):
         """Register all socket event handlers"""
-        self.socketio.on_event('connect', self.handle_connect)
-        self.socketio.on_event('disconnect', self.handle_disconnect)
-        self.socketio.on_event('start_recording', self.handle_start_recording)
-        self.socketio.on_event('audio_chunk', self.handle_audio_chunk)
-        self.socketio.on_event('stop_recording', self.handle_stop_recording)
+        self._on('connect', self.handle_connect)
+        self._on('disconnect', self.handle_disconnect)
+        self._on('start_recording', self.handle_start_recording)
+        self._on('audio_chunk', self.handle_audio_chunk)
+        self._on('stop_recording', self.handle_stop_recording)
+        self._on('transcript_ack', self.handle_transcript_ack)
+        self._on('resync_transcript', self.handle_resync_transcript)
+        self._on('get_soap_job_status', self.handle_get_soap_job_status)
+    
+    def _on(self, event, handler):
+        """Register a handler that also counts the event for /metrics"""
+        counter = SOCKET_EVENTS.labels(event)
+        # Flask-SocketIO retries connect without the auth argument on TypeError,
+        # so only pass what the handler accepts rather than counting twice
+        arg_count = len(inspect.signature(handler).parameters)
+        
+        def counted(*args):
+            counter.inc()
+            return handler(*args[:arg_count])
+        
+        self.socketio.on_event(event, counted)
     
     def handle_connect(self):
         """Handle client connection"""
-        print('Client connected')
+        logger.info('Client connected')
         emit('connected', {'data': 'Connected to Medical Scribe Server'})
     
     def handle_disconnect(self):
-        """Handle client disconnection"""
-        print('Client disconnected')
+        """Handle client disconnection
+        
+        Sessions left without a socket are not stopped right away; the
+        lifecycle manager gives the client a grace period to reconnect and
+        resync first.
+        """
+        orphaned = self.scribe_service.lifecycle.disconnect(request.sid)
+        logger.info('Client disconnected', extra={'orphaned_sessions': len(orphaned)})
     
     def handle_start_recording(self, data):
         """Handle start recording event"""
@@ -32,20 +62,32 @@ class SocketHandlers:
             emit('error', {'message': 'Session ID is required'})
             return
         
-        # Create new session
-        session = self.scribe_service.create_session(session_id)
-        result = self.scribe_service.start_recording(session_id)
+        if not self.scribe_service.lifecycle.admit(session_id):
+            emit('error', {'message': 'Server is at capacity, please try again shortly'})
+            return
+        
+        # Create a new session, or pick up one interrupted by a server restart
+        session = self.scribe_service.open_session(session_id, request.sid)
+        join_room(session_room(session_id))
+        result = self.scribe_service.start_recording(session_id, data.get('audio_format'))
         
         if result['success']:
             emit('recording_started', {
                 'session_id': session_id,
+                'audio_format': result['audio_format'],
+                'last_seq': session.last_seq,
                 'status': 'Recording started - Real-time streaming transcription active'
             })
         else:
             emit('error', {'message': result.get('error', 'Failed to start recording')})
     
     def handle_audio_chunk(self, data):
-        """Handle real-time audio chunk processing with streaming"""
+        """Handle real-time audio chunk processing with streaming
+        
+        audio_data is normally a binary attachment (raw PCM bytes); a base64
+        string is accepted as a fallback.
+        """
+        received_at = time.monotonic()
         session_id = data.get('session_id')
         audio_data = data.get('audio_data')
         
@@ -53,8 +95,10 @@ class SocketHandlers:
             emit('error', {'message': 'Session ID and audio data are required'})
             return
         
+        self.scribe_service.lifecycle.touch(session_id, request.sid)
+        
         # Send chunk to streaming transcription - transcripts will be emitted automatically
-        result = self.scribe_service.add_audio_chunk(session_id, audio_data)
+        result = self.scribe_service.add_audio_chunk(session_id, audio_data, received_at)
         
         if not result['success']:
             emit('transcription_error', {
@@ -62,6 +106,43 @@ class SocketHandlers:
                 'error': result.get('error', 'Unknown error')
             })
     
+    def handle_transcript_ack(self, data):
+        """Handle client acknowledgement of received transcript segments"""
+        session_id = data.get('session_id')
+        seq = data.get('seq')
+        if not session_id or not isinstance(seq, int):
+            emit('error', {'message': 'Session ID and sequence number are required'})
+            return
+        
+        self.scribe_service.lifecycle.touch(session_id, request.sid)
+        self.scribe_service.acknowledge_transcript(session_id, seq)
+    
+    def handle_resync_transcript(self, data):
+        """Handle a reconnecting client asking for the segments it missed"""
+        session_id = data.get('session_id')
+        if not session_id:
+            emit('error', {'message': 'Session ID is required'})
+            return
+        
+        self.scribe_service.lifecycle.touch(session_id, request.sid)
+        # Clients resync on every (re)connect, which moves the session's live
+        # transcript and SOAP progress over to this socket
+        join_room(session_room(session_id))
+        since_seq = data.get('since_seq')
+        result = self.scribe_service.get_transcript_delta(
+            session_id,
+            since_seq if isinstance(since_seq, int) else None
+        )
+        
+        if result['success']:
+            emit('transcript_resync', {
+                'session_id': session_id,
+                'segments': result['segments'],
+                'last_seq': result['last_seq']
+            })
+        else:
+            emit('error', {'message': result.get('error', 'Failed to resync transcript')})
+    
     def handle_stop_recording(self, data):
         """Handle stop recording and generate SOAP note"""
         session_id = data.get('session_id')
@@ -69,6 +150,9 @@ class SocketHandlers:
             emit('error', {'message': 'Session ID is required'})
             return
         
+        # SOAP progress goes to the session's room, wherever this socket came from
+        join_room(session_room(session_id))
+        STOP_TO_SOAP_TIMER.start(session_id)
         result = self.scribe_service.stop_recording(session_id)
         if result['success']:
             emit('recording_stopped', {
@@ -77,30 +161,38 @@ class SocketHandlers:
                 'status': 'Recording stopped, generating SOAP note...'
             })
             
-            # Generate SOAP note in background
-            self.socketio.start_background_task(self._generate_soap_note, session_id)
-        else:
-            emit('error', {'message': 'Failed to stop recording'})
-    
-    def _generate_soap_note(self, session_id):
-        """Background task to generate SOAP note"""
-        try:
-            result = self.scribe_service.generate_soap_note(session_id)
-            
-            if result.success:
-                self.socketio.emit('soap_note_complete', {
+            # Queue SOAP generation; progress arrives as soap_job_status events
+            submitted = self.scribe_service.submit_soap_job(session_id)
+            if not submitted['success']:
+                STOP_TO_SOAP_TIMER.cancel(session_id)
+                emit('soap_generation_error', {
                     'session_id': session_id,
-                    'soap_note': result.soap_note,
-                    'status': 'SOAP note generated successfully'
+                    'error': submitted['error']
                 })
-            else:
-                self.socketio.emit('soap_generation_error', {
+                return
+            
+            job = submitted['job']
+            emit('soap_job_status', job.to_dict())
+            
+            # A duplicate stop for an already finished job gets the stored note
+            session = self.scribe_service.get_session(session_id)
+            if job.status == SoapJobStatus.COMPLETED and session:
+                emit('soap_note_complete', {
                     'session_id': session_id,
-                    'error': result.error
+                    'job_id': job.job_id,
+                    'soap_note': session.soap_note,
+                    'status': 'SOAP note generated successfully'
                 })
-                
-        except Exception as e:
-            self.socketio.emit('soap_generation_error', {
-                'session_id': session_id,
-                'error': f"SOAP generation failed: {str(e)}"
-            }) 
\ No newline at end of file
+                STOP_TO_SOAP_TIMER.finish(session_id)
+        else:
+            STOP_TO_SOAP_TIMER.cancel(session_id)
+            emit('error', {'message': 'Failed to stop recording'})
+    
+    def handle_get_soap_job_status(self, data):
+        """Handle a request for SOAP job progress by job_id or session_id"""
+        job = self.scribe_service.get_soap_job(data.get('job_id'), data.get('session_id'))
+        if job:
+            join_room(session_room(job.session_id))
+            emit('soap_job_status', job.to_dict())
+        else:
+            emit('error', {'message': 'SOAP job not found'})
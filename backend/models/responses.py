@@ -19,4 +19,6 @@ class APIResponse:
 class SOAPNoteResult:
     success: bool
     soap_note: str = ""
-    error: Optional[str] = None 
\ No newline at end of file
+    error: Optional[str] = None
+    error_type: Optional[str] = None  # class from GeminiService._classify_gemini_error
+ 
\ No newline at end of file
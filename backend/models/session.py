@@ -1,6 +1,12 @@
-from dataclasses import dataclass
-from typing import Optional
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any
 from enum import Enum
+from models.transcript import TranscriptStore
+
+# Rough per-segment cost on top of its text: the slotted segment, its str
+# and float objects, and a share of the rendered transcript cache
+SEGMENT_OVERHEAD_BYTES = 250
 
 class SessionStatus(Enum):
     READY = "ready"
@@ -13,11 +19,35 @@ class SessionStatus(Enum):
 class RecordingSession:
     session_id: str
     is_recording: bool = False
-    transcript: str = ""
     soap_note: str = ""
     status: SessionStatus = SessionStatus.READY
     error_message: Optional[str] = None
-    
+    segments: TranscriptStore = field(default_factory=TranscriptStore)
+    acked_seq: int = 0
+    soap_draft: str = ""
+    soap_draft_seq: int = 0
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def transcript(self) -> str:
+        """Flat transcript rendered from the segment store"""
+        return self.segments.render()
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest transcript segment (0 when empty)"""
+        return self.segments.last_seq
+
+    def estimated_bytes(self) -> int:
+        """Approximate memory held by the session's transcript and notes"""
+        return (2 * self.segments.text_chars + SEGMENT_OVERHEAD_BYTES * len(self.segments)
+                + len(self.soap_note) + len(self.soap_draft))
+
+    def acknowledge(self, seq: int) -> int:
+        """Record the highest segment the client has confirmed receiving"""
+        self.acked_seq = max(self.acked_seq, min(seq, self.last_seq))
+        return self.acked_seq
+
     def to_dict(self):
         return {
             'session_id': self.session_id,
@@ -25,5 +55,47 @@ class RecordingSession:
             'soap_note': self.soap_note,
             'is_recording': self.is_recording,
             'status': self.status.value,
-            'error_message': self.error_message
-        } 
\ No newline at end of file
+            'error_message': self.error_message,
+            'last_seq': self.last_seq,
+            'soap_draft_seq': self.soap_draft_seq
+        }
+    
+    def to_summary_dict(self):
+        """Listing view without the transcript or note bodies"""
+        return {
+            'session_id': self.session_id,
+            'is_recording': self.is_recording,
+            'status': self.status.value,
+            'error_message': self.error_message,
+            'last_seq': self.last_seq,
+            'has_soap_note': bool(self.soap_note),
+            'created_at': self.created_at
+        }
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Everything except the segments, for storage backends"""
+        record = self.to_summary_dict()
+        record.update({
+            'soap_note': self.soap_note,
+            'acked_seq': self.acked_seq,
+            'soap_draft': self.soap_draft,
+            'soap_draft_seq': self.soap_draft_seq
+        })
+        return record
+    
+    @classmethod
+    def from_record(cls, record: Dict[str, Any], segments=()) -> 'RecordingSession':
+        """Rebuild a session from to_record() output and segment dicts"""
+        session = cls(
+            session_id=record['session_id'],
+            is_recording=record.get('is_recording', False),
+            soap_note=record.get('soap_note', ''),
+            status=SessionStatus(record.get('status', SessionStatus.READY.value)),
+            error_message=record.get('error_message'),
+            acked_seq=record.get('acked_seq', 0),
+            soap_draft=record.get('soap_draft', ''),
+            soap_draft_seq=record.get('soap_draft_seq', 0),
+            created_at=record.get('created_at', time.time())
+        )
+        session.segments.restore(segments)
+        return session
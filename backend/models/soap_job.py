@@ -0,0 +1,50 @@
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+from enum import Enum
+
+class SoapJobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+@dataclass
+class SoapJob:
+    job_id: str
+    session_id: str
+    dedup_key: str
+    status: SoapJobStatus = SoapJobStatus.QUEUED
+    attempts: int = 0
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    next_attempt_at: Optional[float] = None
+    first_token_at: Optional[float] = None
+    first_section_at: Optional[float] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (SoapJobStatus.COMPLETED, SoapJobStatus.FAILED)
+
+    def _since_created(self, timestamp: Optional[float]) -> Optional[float]:
+        return timestamp - self.created_at if timestamp is not None else None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'session_id': self.session_id,
+            'status': self.status.value,
+            'attempts': self.attempts,
+            'error': self.error,
+            'error_type': self.error_type,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'next_attempt_at': self.next_attempt_at,
+            'time_to_first_token': self._since_created(self.first_token_at),
+            'time_to_first_section': self._since_created(self.first_section_at)
+        }
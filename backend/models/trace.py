@@ -0,0 +1,96 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+def new_span_id() -> str:
+    return os.urandom(8).hex()
+
+@dataclass
+class SpanEvent:
+    name: str
+    timestamp: float = field(default_factory=time.time)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self):
+        return {'name': self.name, 'timestamp': self.timestamp, 'attributes': self.attributes}
+
+@dataclass
+class Span:
+    trace_id: str
+    name: str
+    span_id: str = field(default_factory=new_span_id)
+    parent_span_id: Optional[str] = None
+    start_time: float = field(default_factory=time.time)
+    end_time: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    events: List[SpanEvent] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        return self.end_time - self.start_time if self.end_time is not None else None
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append(SpanEvent(name, attributes=attributes))
+
+    def end(self, error: Optional[str] = None, **attributes) -> None:
+        """Close the span (first call wins)"""
+        if self.end_time is not None:
+            return
+        self.attributes.update(attributes)
+        if error:
+            self.error = error
+        self.end_time = time.time()
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_span_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'attributes': self.attributes,
+            'events': [event.to_dict() for event in self.events],
+            'error': self.error
+        }
+
+@dataclass
+class SessionTrace:
+    """All spans recorded for one visit, under a root 'visit' span"""
+    session_id: str
+    root: Span
+    spans: List[Span] = field(default_factory=list)
+    dropped_spans: int = 0
+
+    @property
+    def trace_id(self) -> str:
+        return self.root.trace_id
+
+    @property
+    def finished(self) -> bool:
+        return self.root.end_time is not None
+
+    def to_dict(self):
+        """Visit timeline: spans in start order with offsets from the visit start"""
+        origin = self.root.start_time
+        timeline = []
+        for span in sorted([self.root] + self.spans, key=lambda span: span.start_time):
+            entry = span.to_dict()
+            entry['offset_ms'] = round((span.start_time - origin) * 1000, 3)
+            timeline.append(entry)
+        return {
+            'session_id': self.session_id,
+            'trace_id': self.trace_id,
+            'started_at': origin,
+            'finished': self.finished,
+            'duration_ms': round(self.root.duration * 1000, 3) if self.finished else None,
+            'span_count': len(timeline),
+            'dropped_spans': self.dropped_spans,
+            'spans': timeline
+        }
@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Iterator
+
+@dataclass(frozen=True)
+class TranscriptSegment:
+    __slots__ = ('seq', 'text', 'speaker', 'start', 'end', 'confidence')
+
+    seq: int
+    text: str
+    speaker: Optional[int]
+    start: Optional[float]
+    end: Optional[float]
+    confidence: Optional[float]
+
+    @property
+    def formatted_text(self) -> str:
+        """Text with its speaker label, as it appears in the flat transcript"""
+        if self.speaker is not None:
+            return f"Speaker {self.speaker}: {self.text}"
+        return self.text
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'text': self.formatted_text,
+            'raw_text': self.text,
+            'speaker': self.speaker,
+            'start': self.start,
+            'end': self.end,
+            'confidence': self.confidence
+        }
+
+class TranscriptStore:
+    """Append-only list of transcript segments
+
+    The flat transcript is only rendered when someone asks for it and is
+    cached until the next append, so utterances never copy the whole text.
+    """
+
+    def __init__(self):
+        self._segments: List[TranscriptSegment] = []
+        self._rendered: Optional[str] = ""
+        self._text_chars = 0
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def __iter__(self) -> Iterator[TranscriptSegment]:
+        return iter(self._segments)
+
+    @property
+    def text_chars(self) -> int:
+        """Total characters of segment text, kept up to date on append"""
+        return self._text_chars
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest segment (0 when empty)"""
+        return len(self._segments)
+
+    def append(self, text: str, speaker: Optional[int] = None, start: Optional[float] = None,
+               end: Optional[float] = None, confidence: Optional[float] = None) -> TranscriptSegment:
+        """Append a segment and return it with its sequence number assigned"""
+        segment = TranscriptSegment(
+            seq=self.last_seq + 1,
+            text=text,
+            speaker=speaker,
+            start=start,
+            end=end,
+            confidence=confidence
+        )
+        self._segments.append(segment)
+        self._text_chars += len(text)
+        self._rendered = None
+        return segment
+
+    def restore(self, segment_dicts) -> None:
+        """Append previously serialized segments (TranscriptSegment.to_dict output)"""
+        for data in segment_dicts:
+            self.append(
+                data['raw_text'],
+                data.get('speaker'),
+                data.get('start'),
+                data.get('end'),
+                data.get('confidence')
+            )
+
+    def since(self, seq: int) -> List[TranscriptSegment]:
+        """Return the segments numbered strictly after seq"""
+        # Sequence numbers are 1-based and contiguous, so seq doubles as a list offset
+        return self._segments[max(seq, 0):]
+
+    def render(self) -> str:
+        """Flat 'Speaker N: ...' transcript, cached until the next append"""
+        if self._rendered is None:
+            self._rendered = " ".join(segment.formatted_text for segment in self._segments)
+        return self._rendered
+
+    def to_list(self, since_seq: int = 0) -> List[Dict[str, Any]]:
+        return [segment.to_dict() for segment in self.since(since_seq)]
@@ -1,36 +1,160 @@
-from flask import Blueprint, jsonify
-from services.gemini_service import GeminiService
+from flask import Blueprint, Response, jsonify, request, current_app
 from services.medical_scribe_service import MedicalScribeService
+from services.metrics import render_metrics
+from services.tracing import to_otlp
 
 # Create blueprint
 api_bp = Blueprint('api', __name__)
 
-# Initialize services
-gemini_service = GeminiService()
-scribe_service = MedicalScribeService()
+MAX_SESSIONS_PAGE = 200
+
+def get_scribe_service() -> MedicalScribeService:
+    """Scribe service shared with the socket handlers (created in create_app)"""
+    return current_app.extensions['scribe_service']
 
 @api_bp.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({"status": "healthy"})
+    """Readiness and per-dependency health from cached probes (503 when not ready)"""
+    report = get_scribe_service().health_report()
+    return jsonify(report), 200 if report['ready'] else 503
+
+@api_bp.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "alive"})
+
+@api_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for the scribe pipeline"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
 
 @api_bp.route('/gemini-status', methods=['GET'])
 def gemini_status():
-    """Check if Gemini API is configured and working"""
-    status = gemini_service.test_api_connection()
+    """Check if Gemini API is configured and working, as of the last background probe"""
+    probe = get_scribe_service().health.result('gemini')
+    if probe['ok']:
+        status = {"status": "working", "model": probe['model'], "message": "Gemini API is configured and working"}
+    elif probe['ok'] is None:
+        status = {"status": "unknown", "message": "Gemini API has not been checked yet"}
+    else:
+        status = {"status": "error", "message": probe['error']}
+    status['checked_seconds_ago'] = probe.get('age_seconds')
     return jsonify(status)
 
+@api_bp.route('/gemini_models', methods=['GET'])
+def gemini_model_stats():
+    """Get Gemini model routes, hedging counters and per-model latency percentiles"""
+    return jsonify(get_scribe_service().gemini_service.router.stats())
+
 @api_bp.route('/get_session/<session_id>', methods=['GET'])
 def get_session(session_id):
     """Get session data"""
-    session = scribe_service.get_session(session_id)
+    session = get_scribe_service().get_session(session_id)
     if session:
         return jsonify(session.to_dict())
     else:
         return jsonify({'error': 'Session not found'}), 404
 
+@api_bp.route('/get_session/<session_id>/transcript', methods=['GET'])
+def get_transcript_delta(session_id):
+    """Get transcript segments after ?since=<seq> (defaults to the last acknowledged one)"""
+    since_seq = request.args.get('since', type=int)
+    result = get_scribe_service().get_transcript_delta(session_id, since_seq)
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify({'error': result['error']}), 404
+
+@api_bp.route('/get_session/<session_id>/timeline', methods=['GET'])
+def get_session_timeline(session_id):
+    """Get the visit trace as a span timeline, or as OTLP JSON with ?format=otlp"""
+    trace = get_scribe_service().tracer.get_trace(session_id)
+    if not trace:
+        return jsonify({'error': 'No trace recorded for session'}), 404
+    if request.args.get('format') == 'otlp':
+        return jsonify(to_otlp(trace))
+    return jsonify(trace.to_dict())
+
+@api_bp.route('/get_session/<session_id>/audio_queue', methods=['GET'])
+def get_audio_queue_stats(session_id):
+    """Get audio send queue depth and throughput for a recording session"""
+    stats = get_scribe_service().get_audio_queue_stats(session_id)
+    if stats:
+        return jsonify(stats)
+    else:
+        return jsonify({'error': 'No active audio stream for session'}), 404
+
+@api_bp.route('/audio_queues', methods=['GET'])
+def list_audio_queue_stats():
+    """Get audio send queue metrics for every active stream"""
+    return jsonify({"queues": get_scribe_service().get_audio_queue_stats()})
+
+@api_bp.route('/get_session/<session_id>/soap_job', methods=['GET'])
+def get_session_soap_job(session_id):
+    """Get the latest SOAP generation job for a session"""
+    job = get_scribe_service().get_soap_job(session_id=session_id)
+    if job:
+        return jsonify(job.to_dict())
+    else:
+        return jsonify({'error': 'SOAP job not found'}), 404
+
+@api_bp.route('/soap_jobs/<job_id>', methods=['GET'])
+def get_soap_job(job_id):
+    """Get SOAP generation job status"""
+    job = get_scribe_service().get_soap_job(job_id=job_id)
+    if job:
+        return jsonify(job.to_dict())
+    else:
+        return jsonify({'error': 'SOAP job not found'}), 404
+
+@api_bp.route('/soap_jobs', methods=['GET'])
+def soap_job_stats():
+    """Get SOAP queue depth, worker and outcome counters"""
+    return jsonify(get_scribe_service().soap_jobs.stats())
+
+@api_bp.route('/soap_cache', methods=['GET'])
+def soap_cache_stats():
+    """Get SOAP result cache hit/miss counters"""
+    stats = get_scribe_service().get_soap_cache_stats()
+    if stats:
+        return jsonify(stats)
+    else:
+        return jsonify({'error': 'SOAP cache is disabled'}), 404
+
+@api_bp.route('/get_session/<session_id>/soap_cache', methods=['DELETE'])
+def purge_session_soap_cache(session_id):
+    """Purge cached SOAP notes produced for a session"""
+    purged = get_scribe_service().purge_soap_cache(session_id)
+    return jsonify({'session_id': session_id, 'purged': purged})
+
+@api_bp.route('/session_lifecycle', methods=['GET'])
+def session_lifecycle_stats():
+    """Get tracked session counts, memory estimate and reaping counters"""
+    return jsonify(get_scribe_service().lifecycle.stats())
+
+@api_bp.route('/session_store', methods=['GET'])
+def session_store_stats():
+    """Get write-behind queue and batch counters for the session store"""
+    stats = get_scribe_service().get_session_store_stats()
+    if stats:
+        return jsonify(stats)
+    else:
+        return jsonify({'error': 'Session backend does not report stats'}), 404
+
+@api_bp.route('/audio_archive', methods=['GET'])
+def audio_archive_stats():
+    """Get bytes archived, buffered and dropped by the raw audio archive"""
+    stats = get_scribe_service().get_audio_archive_stats()
+    if stats:
+        return jsonify(stats)
+    else:
+        return jsonify({'error': 'Audio archive is disabled'}), 404
+
 @api_bp.route('/sessions', methods=['GET'])
 def list_sessions():
-    """List all active sessions"""
-    sessions = [session.to_dict() for session in scribe_service.sessions.values()]
-    return jsonify({"sessions": sessions}) 
\ No newline at end of file
+    """List session summaries, paginated with ?offset=&limit= and filtered by ?status="""
+    status = request.args.get('status')
+    offset = request.args.get('offset', 0, type=int)
+    limit = min(request.args.get('limit', 50, type=int), MAX_SESSIONS_PAGE)
+    return jsonify(get_scribe_service().list_sessions(status, offset, limit)) 
\ No newline at end of file
@@ -0,0 +1,348 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from services.audio_pipeline import FlacEncoder, pyflac
+
+logger = logging.getLogger(__name__)
+
+WAV_HEADER_BYTES = 44
+SAMPLE_BYTES = 2  # int16 PCM
+MANIFEST = "manifest.json"
+
+def archive_dir_name(session_id: str) -> str:
+    """Directory name for a session; IDs that aren't plain file names are hashed"""
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,128}", session_id):
+        return session_id
+    return hashlib.sha256(session_id.encode()).hexdigest()[:32]
+
+def wav_header(sample_rate: int, channels: int, data_bytes: int) -> bytes:
+    """Canonical 44-byte PCM WAV header"""
+    byte_rate = sample_rate * channels * SAMPLE_BYTES
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * SAMPLE_BYTES, 16,
+        b"data", data_bytes
+    )
+
+@dataclass
+class ArchiveSegment:
+    file: str
+    start_sample: int
+    samples: int = 0
+
+    def to_dict(self):
+        return {'file': self.file, 'start_sample': self.start_sample, 'samples': self.samples}
+
+class SessionAudioRecorder:
+    """Appends one session's input PCM to numbered WAV or FLAC segments
+
+    write() only buffers; AudioArchive's writer thread calls drain() to put
+    the audio on disk. Segments roll over every segment_seconds of audio and
+    manifest.json lists them, so a visit can be replayed even if the
+    process died before the last segment was closed.
+    """
+
+    def __init__(self, directory: str, session_id: str, sample_rate: int, channels: int = 1,
+                 encoding: str = "wav", segment_seconds: float = 300):
+        self.directory = directory
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.encoding = encoding
+        self.segment_bytes = max(SAMPLE_BYTES, int(segment_seconds * sample_rate) * channels * SAMPLE_BYTES)
+
+        self._buffer: List[bytes] = []
+        self.buffered_bytes = 0
+        self.bytes_in = 0
+        self.bytes_written = 0
+        self.dropped_bytes = 0
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self.closed = False
+
+        self._segments: List[ArchiveSegment] = []
+        self._file = None
+        self._encoder = None
+        self._segment_written = 0
+        self._pending_sample = b""  # odd trailing byte carried to the next drain
+        os.makedirs(directory, exist_ok=True)
+        self._load_manifest()
+
+    @property
+    def total_samples(self) -> int:
+        return sum(segment.samples for segment in self._segments)
+
+    def write(self, pcm, max_buffered_bytes: int) -> bool:
+        """Buffer a chunk of PCM, or drop it if max_buffered_bytes are already waiting"""
+        with self._lock:
+            if self.closed:
+                return False
+            if self.buffered_bytes + len(pcm) > max_buffered_bytes:
+                self.dropped_bytes += len(pcm)
+                return False
+            self._buffer.append(bytes(pcm))
+            self.buffered_bytes += len(pcm)
+            self.bytes_in += len(pcm)
+        return True
+
+    def drain(self, final: bool = False) -> int:
+        """Write buffered audio to disk; returns bytes written"""
+        with self._drain_lock:
+            with self._lock:
+                chunks, self._buffer = self._buffer, []
+                self.buffered_bytes = 0
+                if final:
+                    self.closed = True
+            data = self._pending_sample + b"".join(chunks)
+            frame_bytes = self.channels * SAMPLE_BYTES
+            whole = len(data) - len(data) % frame_bytes
+            data, self._pending_sample = data[:whole], data[whole:]
+
+            written = 0
+            while data:
+                if self._file is None:
+                    self._open_segment()
+                room = self.segment_bytes - self._segment_written
+                piece, data = data[:room], data[room:]
+                self._write_segment(piece)
+                written += len(piece)
+                if self._segment_written >= self.segment_bytes:
+                    self._close_segment()
+
+            if final:
+                self._close_segment()
+            elif written and self._file:
+                self._file.flush()
+            self.bytes_written += written
+            return written
+
+    def _load_manifest(self) -> None:
+        """Continue numbering after segments left by an earlier recording"""
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('sample_rate') != self.sample_rate or manifest.get('channels') != self.channels:
+            raise ValueError(f"Archived audio for {self.session_id} uses a different format")
+        self._segments = [ArchiveSegment(**segment) for segment in manifest.get('segments', [])]
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            'session_id': self.session_id,
+            'sample_rate': self.sample_rate,
+            'channels': self.channels,
+            'sample_format': 's16le',
+            'segments': [segment.to_dict() for segment in self._segments]
+        }
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def _open_segment(self) -> None:
+        extension = "flac" if self.encoding == "flac" else "wav"
+        segment = ArchiveSegment(f"segment-{len(self._segments) + 1:05d}.{extension}", self.total_samples)
+        self._segments.append(segment)
+        self._file = open(os.path.join(self.directory, segment.file), "wb")
+        self._segment_written = 0
+        if self.encoding == "flac":
+            self._encoder = FlacEncoder(self.sample_rate)
+        else:
+            # Sizes are patched on close; readers fall back to the file length
+            self._file.write(wav_header(self.sample_rate, self.channels, 0))
+        self._write_manifest()
+
+    def _write_segment(self, pcm: bytes) -> None:
+        self._file.write(self._encoder.encode(pcm) if self._encoder else pcm)
+        self._segment_written += len(pcm)
+        self._segments[-1].samples += len(pcm) // (self.channels * SAMPLE_BYTES)
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        if self._encoder:
+            self._file.write(self._encoder.flush())
+            self._encoder = None
+        else:
+            self._file.seek(0)
+            self._file.write(wav_header(self.sample_rate, self.channels, self._segment_written))
+        self._file.close()
+        self._file = None
+        self._write_manifest()
+
+class AudioArchive:
+    """Per-session audio recorders served by one background writer thread
+
+    The request thread only appends to a recorder's buffer. Every
+    flush_interval seconds the writer drains all buffers to disk. A session
+    with more than max_buffered_bytes waiting (disk too slow) has new audio
+    dropped rather than blocking the audio path.
+    """
+
+    def __init__(self, directory: str, encoding: str = "wav", segment_seconds: float = 300,
+                 flush_interval: float = 1.0, max_buffered_bytes: int = 8 * 1024 * 1024):
+        if encoding not in ("wav", "flac"):
+            raise ValueError(f"Unknown AUDIO_ARCHIVE_FORMAT: {encoding}")
+        if encoding == "flac" and pyflac is None:
+            raise ValueError("AUDIO_ARCHIVE_FORMAT=flac requires the 'pyflac' package")
+        self.directory = directory
+        self.encoding = encoding
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.max_buffered_bytes = max_buffered_bytes
+
+        self._recorders: Dict[str, SessionAudioRecorder] = {}
+        self._closing: List[SessionAudioRecorder] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._finished = {'bytes_in': 0, 'bytes_written': 0, 'dropped_bytes': 0}
+        self._write_errors = 0
+        self._thread = threading.Thread(target=self._run, name="audio-archiver", daemon=True)
+        self._thread.start()
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.directory, archive_dir_name(session_id))
+
+    def start_session(self, session_id: str, sample_rate: int, channels: int = 1) -> None:
+        """Begin archiving a session's audio, continuing any earlier segments"""
+        with self._lock:
+            previous = self._recorders.pop(session_id, None)
+            previous = previous or next((r for r in self._closing if r.session_id == session_id), None)
+        if previous:
+            # Finish its last segment first so numbering carries on from it
+            self._drain(previous, final=True)
+        recorder = SessionAudioRecorder(
+            self.session_dir(session_id), session_id, sample_rate, channels,
+            self.encoding, self.segment_seconds)
+        with self._lock:
+            self._recorders[session_id] = recorder
+
+    def write(self, session_id: str, pcm) -> bool:
+        """Buffer audio for a session; never blocks on disk"""
+        recorder = self._recorders.get(session_id)
+        return recorder.write(pcm, self.max_buffered_bytes) if recorder else False
+
+    def stop_session(self, session_id: str) -> None:
+        """Close the session's current segment once its buffer is written"""
+        with self._lock:
+            recorder = self._recorders.pop(session_id, None)
+            if recorder:
+                self._closing.append(recorder)
+        if recorder:
+            self._wake.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._finished)
+            recorders = list(self._recorders.values()) + self._closing
+        for recorder in recorders:
+            stats['bytes_in'] += recorder.bytes_in
+            stats['bytes_written'] += recorder.bytes_written
+            stats['dropped_bytes'] += recorder.dropped_bytes
+        stats.update({
+            'directory': self.directory,
+            'format': self.encoding,
+            'recording_sessions': len(self._recorders),
+            'buffered_bytes': sum(recorder.buffered_bytes for recorder in recorders),
+            'write_errors': self._write_errors
+        })
+        return stats
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                active = list(self._recorders.values())
+                closing = list(self._closing)
+            for recorder in active:
+                self._drain(recorder, final=False)
+            for recorder in closing:
+                self._drain(recorder, final=True)
+            with self._lock:
+                for recorder in closing:
+                    if recorder in self._closing:
+                        self._closing.remove(recorder)
+                        self._finished['bytes_in'] += recorder.bytes_in
+                        self._finished['bytes_written'] += recorder.bytes_written
+                        self._finished['dropped_bytes'] += recorder.dropped_bytes
+
+    def _drain(self, recorder: SessionAudioRecorder, final: bool) -> None:
+        try:
+            recorder.drain(final)
+        except Exception:
+            self._write_errors += 1
+            logger.exception("Audio archive write failed", extra={'session_id': recorder.session_id})
+
+class ArchivedVisit:
+    """Read-only view of an archived visit; WAV segments are memory-mapped"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        self.session_id = manifest.get('session_id')
+        self.sample_rate = manifest['sample_rate']
+        self.channels = manifest['channels']
+        self.segments = [ArchiveSegment(**segment) for segment in manifest['segments']]
+        self._maps: List[mmap.mmap] = []
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.sample_rate * self.channels * SAMPLE_BYTES
+
+    @property
+    def duration(self) -> float:
+        return sum(segment.samples for segment in self.segments) / self.sample_rate
+
+    def _segment_pcm(self, segment: ArchiveSegment):
+        path = os.path.join(self.directory, segment.file)
+        if segment.file.endswith(".flac"):
+            if pyflac is None:
+                raise ValueError("Replaying FLAC archives requires the 'pyflac' package")
+            # pyflac decodes to floats in [-1, 1)
+            data, _ = pyflac.FileDecoder(path).process()
+            pcm = np.clip(np.rint(data * 32768), -32768, 32767).astype("<i2")
+            return memoryview(pcm.tobytes())
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        # The header may still say 0 bytes if the recorder never closed it
+        end = WAV_HEADER_BYTES + segment.samples * self.channels * SAMPLE_BYTES
+        return memoryview(mapped)[WAV_HEADER_BYTES:min(end, len(mapped))]
+
+    def chunks(self, chunk_ms: int = 100) -> Iterator[memoryview]:
+        """PCM in chunk_ms slices, without copying WAV data out of the mapping"""
+        chunk_bytes = max(SAMPLE_BYTES, self.bytes_per_second * chunk_ms // 1000)
+        chunk_bytes -= chunk_bytes % (self.channels * SAMPLE_BYTES)
+        for segment in self.segments:
+            pcm = self._segment_pcm(segment)
+            for offset in range(0, len(pcm), chunk_bytes):
+                yield pcm[offset:offset + chunk_bytes]
+
+    def close(self) -> None:
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # a caller still holds a slice; the mapping goes with it
+        self._maps.clear()
+
+def create_audio_archive(enabled: bool, directory: str, encoding: str, segment_seconds: float,
+                         max_buffered_bytes: int) -> Optional[AudioArchive]:
+    """Build the audio archive from configuration, or None when disabled"""
+    if not enabled:
+        return None
+    return AudioArchive(directory, encoding, segment_seconds, max_buffered_bytes=max_buffered_bytes)
@@ -0,0 +1,277 @@
+import logging
+import struct
+from dataclasses import dataclass
+from math import gcd
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Optional codecs - sessions fall back to linear16 when these are missing
+try:
+    import pyflac
+except ImportError:
+    pyflac = None
+
+try:
+    import opuslib
+except Exception:  # opuslib raises a bare Exception when libopus is not installed
+    opuslib = None
+
+# Client-reported input rates outside this range are ignored
+MIN_INPUT_SAMPLE_RATE = 8000
+MAX_INPUT_SAMPLE_RATE = 192000
+
+@dataclass
+class AudioFormat:
+    encoding: str = "linear16"
+    sample_rate: int = 16000
+    input_sample_rate: int = 48000
+    channels: int = 1
+
+    def to_dict(self):
+        return {
+            'encoding': self.encoding,
+            'sample_rate': self.sample_rate,
+            'input_sample_rate': self.input_sample_rate,
+            'channels': self.channels
+        }
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce for Deepgram"""
+    encodings = ["linear16"]
+    if pyflac is not None:
+        encodings.append("flac")
+    if opuslib is not None:
+        encodings.append("opus")
+    return encodings
+
+def negotiate_audio_format(requested_encoding: Optional[str], input_sample_rate: Optional[int],
+                           default_encoding: str, target_sample_rate: int,
+                           default_input_sample_rate: int) -> AudioFormat:
+    """Pick the stream format for a session from what the client asked for"""
+    encoding = (requested_encoding or default_encoding).lower()
+    if encoding not in available_encodings():
+        logger.warning("Audio encoding '%s' unavailable, falling back to linear16", encoding)
+        encoding = "linear16"
+
+    input_rate = default_input_sample_rate
+    if input_sample_rate:
+        try:
+            input_rate = int(input_sample_rate)
+        except (TypeError, ValueError, OverflowError):
+            input_rate = None
+        if input_rate is None or not MIN_INPUT_SAMPLE_RATE <= input_rate <= MAX_INPUT_SAMPLE_RATE:
+            logger.warning("Invalid input sample rate %r, falling back to %d Hz",
+                           input_sample_rate, default_input_sample_rate)
+            input_rate = default_input_sample_rate
+    # Never upsample - it costs bandwidth without adding information
+    output_rate = min(target_sample_rate, input_rate)
+    if encoding == "opus" and output_rate not in OpusEncoder.SAMPLE_RATES:
+        output_rate = max(r for r in OpusEncoder.SAMPLE_RATES if r <= output_rate)
+
+    return AudioFormat(encoding=encoding, sample_rate=output_rate, input_sample_rate=input_rate)
+
+class Resampler:
+    """Streaming int16 mono resampler
+
+    Polyphase windowed-sinc filter, evaluated with NumPy fancy indexing so a
+    whole chunk is filtered at once. Filter history carries across chunks so
+    there are no clicks at chunk boundaries.
+    """
+
+    TAPS_PER_PHASE = 32
+
+    def __init__(self, input_rate: int, output_rate: int):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        divisor = gcd(input_rate, output_rate)
+        self._up = output_rate // divisor
+        self._down = input_rate // divisor
+        self._passthrough = self._up == self._down
+
+        taps = self.TAPS_PER_PHASE
+        if not self._passthrough:
+            length = taps * self._up
+            # Cut off a little below the output Nyquist so the transition band does not alias
+            cutoff = 0.45 / max(self._up, self._down)
+            n = np.arange(length) - (length - 1) / 2.0
+            prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, 8.0) * self._up
+            # phases[p, k] = prototype[p + k * up]
+            self._phases = prototype.reshape(taps, self._up).T.astype(np.float32)
+            self._history = np.zeros(taps - 1, dtype=np.float32)
+            self._position = (taps - 1) * self._up
+        self._pending = b""
+
+    def process(self, audio_bytes) -> bytes:
+        """Resample a chunk of little-endian int16 PCM"""
+        if self._passthrough:
+            return audio_bytes
+
+        if self._pending:
+            audio_bytes = self._pending + bytes(audio_bytes)
+            self._pending = b""
+        if len(audio_bytes) % 2:
+            self._pending = bytes(audio_bytes[-1:])
+            audio_bytes = audio_bytes[:-1]
+
+        samples = np.frombuffer(audio_bytes, dtype="<i2").astype(np.float32)
+        buffer = np.concatenate((self._history, samples))
+
+        up, down, taps = self._up, self._down, self.TAPS_PER_PHASE
+        end = len(buffer) * up
+        count = max(0, -(-(end - self._position) // down))
+        positions = self._position + down * np.arange(count)
+        indices = (positions // up)[:, None] - np.arange(taps)[None, :]
+        output = np.einsum('ij,ij->i', buffer[indices], self._phases[positions % up])
+
+        self._position += count * down - (len(buffer) - (taps - 1)) * up
+        self._history = buffer[len(buffer) - (taps - 1):]
+
+        return np.clip(np.rint(output), -32768, 32767).astype("<i2").tobytes()
+
+class Linear16Encoder:
+    def encode(self, pcm: bytes) -> bytes:
+        return pcm
+
+    def flush(self) -> bytes:
+        return b""
+
+class FlacEncoder:
+    """Streaming FLAC encoder built on pyflac"""
+
+    def __init__(self, sample_rate: int):
+        self._output = []
+        self._encoder = pyflac.StreamEncoder(
+            write_callback=self._on_write,
+            sample_rate=sample_rate,
+            compression_level=5
+        )
+
+    def _on_write(self, buffer, num_bytes, num_samples, current_frame):
+        self._output.append(bytes(buffer))
+
+    def _drain(self) -> bytes:
+        data = b"".join(self._output)
+        self._output.clear()
+        return data
+
+    def encode(self, pcm: bytes) -> bytes:
+        if pcm:
+            self._encoder.process(np.frombuffer(pcm, dtype="<i2"))
+        return self._drain()
+
+    def flush(self) -> bytes:
+        self._encoder.finish()
+        return self._drain()
+
+class OpusEncoder:
+    """Ogg/Opus encoder: 20 ms Opus frames muxed into Ogg pages"""
+
+    SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+    FRAME_MS = 20
+    FRAMES_PER_PAGE = 5
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._encoder = opuslib.Encoder(sample_rate, 1, opuslib.APPLICATION_VOIP)
+        self._frame_samples = sample_rate * self.FRAME_MS // 1000
+        self._pending = b""
+        self._packets = []
+        self._ogg = _OggStream()
+        # Opus granule positions always count 48 kHz samples
+        self._granule_step = 48000 * self.FRAME_MS // 1000
+        self._header = self._ogg.page([self._opus_head()], 0, bos=True) + \
+            self._ogg.page([b"OpusTags" + struct.pack("<I", 0) + struct.pack("<I", 0)], 0)
+
+    def _opus_head(self) -> bytes:
+        return b"OpusHead" + struct.pack("<BBHIhB", 1, 1, 312, self.sample_rate, 0, 0)
+
+    def encode(self, pcm: bytes) -> bytes:
+        data = self._header
+        self._header = b""
+
+        buffer = self._pending + bytes(pcm)
+        frame_bytes = self._frame_samples * 2
+        usable = len(buffer) - len(buffer) % frame_bytes
+        for offset in range(0, usable, frame_bytes):
+            self._packets.append(self._encoder.encode(buffer[offset:offset + frame_bytes], self._frame_samples))
+        self._pending = buffer[usable:]
+
+        while len(self._packets) >= self.FRAMES_PER_PAGE:
+            data += self._write_page(self._packets[:self.FRAMES_PER_PAGE])
+            del self._packets[:self.FRAMES_PER_PAGE]
+        return data
+
+    def flush(self) -> bytes:
+        if self._pending:
+            padded = self._pending.ljust(self._frame_samples * 2, b"\0")
+            self._packets.append(self._encoder.encode(padded, self._frame_samples))
+            self._pending = b""
+        page = self._write_page(self._packets, eos=True)
+        self._packets = []
+        return self._header + page
+
+    def _write_page(self, packets, eos: bool = False) -> bytes:
+        self._ogg.granule += len(packets) * self._granule_step
+        return self._ogg.page(packets, self._ogg.granule, eos=eos)
+
+class _OggStream:
+    """Minimal Ogg page writer (RFC 3533) for a single logical stream"""
+
+    _CRC_TABLE = None
+
+    def __init__(self, serial: int = 0x5C41BE):
+        self.serial = serial
+        self.sequence = 0
+        self.granule = 0
+
+    @classmethod
+    def _crc(cls, data: bytes) -> int:
+        if cls._CRC_TABLE is None:
+            table = []
+            for i in range(256):
+                r = i << 24
+                for _ in range(8):
+                    r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else (r << 1)
+                table.append(r & 0xFFFFFFFF)
+            cls._CRC_TABLE = table
+        crc = 0
+        table = cls._CRC_TABLE
+        for byte in data:
+            crc = ((crc << 8) & 0xFFFFFFFF) ^ table[((crc >> 24) ^ byte) & 0xFF]
+        return crc
+
+    def page(self, packets, granule: int, bos: bool = False, eos: bool = False) -> bytes:
+        lacing = bytearray()
+        for packet in packets:
+            lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+        flags = (0x02 if bos else 0) | (0x04 if eos else 0)
+        header = struct.pack("<4sBBqIIIB", b"OggS", 0, flags, granule, self.serial,
+                             self.sequence, 0, len(lacing)) + bytes(lacing)
+        body = b"".join(packets)
+        crc = self._crc(header + body)
+        self.sequence += 1
+        return header[:22] + struct.pack("<I", crc) + header[26:] + body
+
+class AudioPipeline:
+    """Per-session resample + encode stage in front of the Deepgram socket"""
+
+    def __init__(self, audio_format: AudioFormat):
+        self.audio_format = audio_format
+        self.resampler = Resampler(audio_format.input_sample_rate, audio_format.sample_rate)
+        if audio_format.encoding == "flac":
+            self.encoder = FlacEncoder(audio_format.sample_rate)
+        elif audio_format.encoding == "opus":
+            self.encoder = OpusEncoder(audio_format.sample_rate)
+        else:
+            self.encoder = Linear16Encoder()
+
+    def process(self, audio_bytes) -> bytes:
+        """Turn a chunk of browser PCM into bytes ready to send upstream"""
+        return self.encoder.encode(self.resampler.process(audio_bytes))
+
+    def flush(self) -> bytes:
+        """Encoder tail to send before closing the stream"""
+        return self.encoder.flush()
@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+BACKPRESSURE = "backpressure"
+
+class AudioSendQueue:
+    """Bounded per-session audio queue drained by a dedicated sender thread
+
+    The Socket.IO handler only appends frames; the sender coalesces them into
+    packets of roughly packet_bytes, runs them through `process` (resample and
+    encode) and writes them upstream with `send`. When the queue is full the
+    overflow policy either drops the oldest audio or tells the client to back
+    off via `on_backpressure(paused)`. `on_sent(latency)` reports how long the
+    oldest frame of each sent packet waited since it was received.
+    """
+
+    def __init__(self, session_id: str, send: Callable[[bytes], None],
+                 process: Callable[[bytes], bytes], bytes_per_second: int,
+                 packet_ms: int = 100, max_queue_ms: int = 2000,
+                 overflow_policy: str = DROP_OLDEST,
+                 on_backpressure: Optional[Callable[[bool], None]] = None,
+                 on_sent: Optional[Callable[[float], None]] = None):
+        if overflow_policy not in (DROP_OLDEST, BACKPRESSURE):
+            raise ValueError(f"Unknown audio overflow policy: {overflow_policy}")
+
+        self.session_id = session_id
+        self._send = send
+        self._process = process
+        self._on_backpressure = on_backpressure
+        self._on_sent = on_sent
+        self.overflow_policy = overflow_policy
+
+        self.bytes_per_second = bytes_per_second
+        self.packet_bytes = max(2, bytes_per_second * packet_ms // 1000)
+        self.max_bytes = max(self.packet_bytes, bytes_per_second * max_queue_ms // 1000)
+        self._packet_seconds = packet_ms / 1000.0
+
+        self._frames = deque()  # (frame, received_at) pairs
+        self._depth_bytes = 0
+        self._closed = False
+        self._paused = False
+        self._condition = threading.Condition()
+
+        self._stats = {
+            'frames_in': 0,
+            'bytes_in': 0,
+            'packets_sent': 0,
+            'bytes_sent': 0,
+            'dropped_frames': 0,
+            'dropped_bytes': 0,
+            'rejected_frames': 0,
+            'backpressure_signals': 0,
+            'send_errors': 0,
+            'max_depth_bytes': 0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name=f"audio-sender-{session_id}", daemon=True)
+        self._thread.start()
+
+    def put(self, frame, received_at: Optional[float] = None) -> bool:
+        """Queue a frame of PCM; returns False if it was rejected
+
+        received_at is the time.monotonic() at which the frame reached the
+        server, if the caller noted it earlier than now.
+        """
+        signal = None
+        with self._condition:
+            if self._closed:
+                return False
+
+            size = len(frame)
+            if self._depth_bytes + size > self.max_bytes:
+                if self.overflow_policy == DROP_OLDEST:
+                    while self._frames and self._depth_bytes + size > self.max_bytes:
+                        dropped, _ = self._frames.popleft()
+                        self._depth_bytes -= len(dropped)
+                        self._stats['dropped_frames'] += 1
+                        self._stats['dropped_bytes'] += len(dropped)
+                else:
+                    self._stats['rejected_frames'] += 1
+                    return False
+
+            self._frames.append((frame, received_at if received_at is not None else time.monotonic()))
+            self._depth_bytes += size
+            self._stats['frames_in'] += 1
+            self._stats['bytes_in'] += size
+            self._stats['max_depth_bytes'] = max(self._stats['max_depth_bytes'], self._depth_bytes)
+
+            # Ask the client to slow down once the queue is three quarters full
+            if self.overflow_policy == BACKPRESSURE and not self._paused \
+                    and self._depth_bytes >= self.max_bytes * 3 // 4:
+                self._paused = True
+                self._stats['backpressure_signals'] += 1
+                signal = True
+
+            if self._depth_bytes >= self.packet_bytes:
+                self._condition.notify()
+
+        if signal is not None:
+            self._signal_backpressure(signal)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Send whatever is queued, then stop the sender thread
+
+        Audio still queued after `timeout` seconds is dropped so a stalled
+        upstream cannot hold up the caller.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+        if self._thread.is_alive():
+            with self._condition:
+                self._stats['dropped_frames'] += len(self._frames)
+                self._stats['dropped_bytes'] += self._depth_bytes
+                self._frames.clear()
+                self._depth_bytes = 0
+
+    def stats(self) -> dict:
+        """Queue depth and throughput counters for this session"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'session_id': self.session_id,
+                'overflow_policy': self.overflow_policy,
+                'depth_frames': len(self._frames),
+                'depth_bytes': self._depth_bytes,
+                'depth_ms': self._depth_bytes * 1000 // self.bytes_per_second,
+                'max_bytes': self.max_bytes,
+                'paused': self._paused,
+            })
+        return stats
+
+    def _take_packet(self):
+        """Pop up to packet_bytes of queued frames as one buffer (lock held)
+
+        Returns the buffer and the receipt time of its oldest frame.
+        """
+        frames = []
+        size = 0
+        oldest = self._frames[0][1]
+        while self._frames and size < self.packet_bytes:
+            frame, _ = self._frames.popleft()
+            frames.append(frame)
+            size += len(frame)
+        self._depth_bytes -= size
+        return (frames[0] if len(frames) == 1 else b"".join(frames)), oldest
+
+    def _run(self):
+        while True:
+            signal = None
+            with self._condition:
+                # Wait for a full packet, but never hold audio longer than one packet interval
+                deadline = time.monotonic() + self._packet_seconds
+                while not self._closed and self._depth_bytes < self.packet_bytes:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                if not self._frames:
+                    if self._closed:
+                        return
+                    continue
+
+                packet, received_at = self._take_packet()
+                if self._paused and self._depth_bytes <= self.max_bytes // 4:
+                    self._paused = False
+                    signal = False
+
+            if signal is not None:
+                self._signal_backpressure(signal)
+
+            try:
+                payload = self._process(packet)
+                if payload:
+                    self._send(payload)
+                with self._condition:
+                    self._stats['packets_sent'] += 1
+                    self._stats['bytes_sent'] += len(payload)
+                if self._on_sent:
+                    self._on_sent(time.monotonic() - received_at)
+            except Exception as e:
+                with self._condition:
+                    self._stats['send_errors'] += 1
+                logger.error("Error sending audio for session %s: %s", self.session_id, e)
+
+    def _signal_backpressure(self, paused: bool):
+        if self._on_backpressure:
+            try:
+                self._on_backpressure(paused)
+            except Exception as e:
+                logger.error("Error signalling audio backpressure: %s", e)
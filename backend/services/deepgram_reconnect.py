@@ -0,0 +1,171 @@
+import random
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+from services.audio_pipeline import AudioFormat, AudioPipeline
+
+# Words ending this close to already-transcribed audio are treated as repeats
+SEAM_TOLERANCE_SECONDS = 0.05
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class AudioReplayBuffer:
+    """Ring buffer of the last max_seconds of input PCM sent upstream
+
+    total_bytes counts every byte ever appended, so it doubles as the
+    session's audio position.
+    """
+
+    def __init__(self, bytes_per_second: int, max_seconds: float):
+        self.bytes_per_second = bytes_per_second
+        self.max_bytes = int(bytes_per_second * max_seconds)
+        self._packets = deque()
+        self.buffered_bytes = 0
+        self.total_bytes = 0
+
+    def append(self, packet) -> None:
+        if self.max_bytes <= 0:
+            self.total_bytes += len(packet)
+            return
+        self._packets.append(packet)
+        self.buffered_bytes += len(packet)
+        self.total_bytes += len(packet)
+        while self.buffered_bytes > self.max_bytes and len(self._packets) > 1:
+            self.buffered_bytes -= len(self._packets.popleft())
+
+    def packets(self) -> list:
+        return list(self._packets)
+
+    @property
+    def start_seconds(self) -> float:
+        """Session audio time of the oldest buffered byte"""
+        return (self.total_bytes - self.buffered_bytes) / self.bytes_per_second
+
+class TranscriptSeam:
+    """Maps a connection's timestamps onto the session timeline and drops repeats
+
+    A reconnected stream starts its clock at zero with replayed audio, so
+    its results are shifted by `offset` and any words ending before the
+    last transcribed audio are discarded.
+    """
+
+    __slots__ = ('offset', 'last_end', 'dropped_segments', 'trimmed_words')
+
+    def __init__(self):
+        self.offset = 0.0
+        self.last_end = 0.0
+        self.dropped_segments = 0
+        self.trimmed_words = 0
+
+    def place(self, sentence: str, start: Optional[float], end: Optional[float],
+              words=None) -> Optional[Tuple[str, Optional[float], Optional[float], list]]:
+        """Session-timeline (sentence, start, end, words), or None for a repeat"""
+        if start is None or end is None:
+            return sentence, start, end, words
+        start += self.offset
+        end += self.offset
+        cutoff = self.last_end + SEAM_TOLERANCE_SECONDS
+        if end <= cutoff:
+            self.dropped_segments += 1
+            return None
+        if start < self.last_end and words:
+            kept = [word for word in words if word.end + self.offset > cutoff]
+            if not kept:
+                self.dropped_segments += 1
+                return None
+            if len(kept) < len(words):
+                self.trimmed_words += len(words) - len(kept)
+                sentence = " ".join(getattr(word, 'punctuated_word', None) or word.word for word in kept)
+                start = kept[0].start + self.offset
+                words = kept
+        self.last_end = end
+        return sentence, start, end, words
+
+class LiveStream:
+    """One session's Deepgram stream across reconnects
+
+    The sender thread calls process() then send() for every packet.
+    process() records the input PCM in the replay buffer before encoding,
+    so audio arriving while the connection is down is replayed later.
+    Each (re)connection bumps `generation`; a payload encoded for an older
+    connection is dropped by send() because its audio is in the replay.
+    """
+
+    def __init__(self, session_id: str, audio_format: AudioFormat, replay_seconds: float,
+                 on_transcript=None, on_state=None):
+        self.session_id = session_id
+        self.on_transcript = on_transcript
+        self.on_state = on_state
+        self.audio_format = audio_format
+        self.bytes_per_second = audio_format.input_sample_rate * 2 * audio_format.channels
+        self.replay = AudioReplayBuffer(self.bytes_per_second, replay_seconds)
+        self.seam = TranscriptSeam()
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+
+        self.connection = None
+        self.pipeline: Optional[AudioPipeline] = None
+        self.generation = 0
+        self.connected = False
+        self.reconnecting = False
+        self.failed = False
+        self._encoded_generation = 0
+
+        self.reconnects = 0
+        self.replayed_bytes = 0
+        self.send_failures = 0
+
+    def attach(self, connection, pipeline: AudioPipeline) -> None:
+        """Make `connection` current (lock held) before replaying into it"""
+        self.connection = connection
+        self.pipeline = pipeline
+        self.generation += 1
+        self.connected = True
+        self.seam.offset = self.replay.start_seconds if self.generation > 1 else 0.0
+
+    def process(self, packet) -> bytes:
+        with self.lock:
+            self.replay.append(packet)
+            if not self.connected:
+                return b""
+            self._encoded_generation = self.generation
+            return self.pipeline.process(packet)
+
+    def send(self, payload) -> bool:
+        """Send on the current connection; False means the connection just failed"""
+        with self.lock:
+            if not self.connected or self._encoded_generation != self.generation:
+                return True
+            try:
+                self.connection.send(payload)
+                return True
+            except Exception:
+                self.send_failures += 1
+                self.connected = False
+                return False
+
+    def mark_lost(self, connection) -> bool:
+        """Note that `connection` failed; True if a reconnect should start"""
+        with self.lock:
+            if connection is not self.connection or self.closed.is_set() or self.reconnecting:
+                return False
+            self.connected = False
+            self.reconnecting = True
+            return True
+
+    def stats(self) -> dict:
+        return {
+            'connected': self.connected,
+            'reconnecting': self.reconnecting,
+            'failed': self.failed,
+            'generation': self.generation,
+            'reconnects': self.reconnects,
+            'replay_buffer_ms': self.replay.buffered_bytes * 1000 // self.bytes_per_second,
+            'replayed_bytes': self.replayed_bytes,
+            'send_failures': self.send_failures,
+            'duplicate_segments_dropped': self.seam.dropped_segments,
+            'duplicate_words_trimmed': self.seam.trimmed_words
+        }
@@ -1,12 +1,25 @@
-from deepgram import DeepgramClient, LiveTranscriptionEvents, LiveOptions
+import logging
+import threading
+import time
+from typing import Optional
+import requests
 from config.settings import Config
+from services.audio_pipeline import AudioFormat, AudioPipeline
+from services.audio_send_queue import AudioSendQueue
+from services.deepgram_reconnect import LiveStream, backoff_delay
+from services.metrics import AUDIO_CHUNK_TO_SEND, DEEPGRAM_RECONNECTS
+from services.service_container import get_service_container
+from services.speaker_attribution import SpeakerAttributor
+from services.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
 
 class DeepgramService:
-    def __init__(self):
-        self.client = DeepgramClient(Config.DEEPGRAM_API_KEY)
-        
-        # Streaming options for real-time transcription
-        self.streaming_options = LiveOptions(
+    def __init__(self, client=None):
+        self._client = client
+        # Streaming options for real-time transcription; the audio format
+        # fields are filled in per session by _build_streaming_options
+        self.streaming_options = dict(
             model="nova-2",
             language="en-US",
             smart_format=True,
@@ -17,300 +30,374 @@ class DeepgramService:
             search=["medical", "healthcare", "patient", "doctor"],
             keywords=["patient", "doctor", "nurse", "provider"],
             interim_results=False,  # Disable interim for better speaker detection
-            encoding="linear16",
-            sample_rate=48000,
-            channels=1,
         )
         
-        # Store streaming connections per session
+        # Store streaming connections and their audio streams per session
         self.connections = {}
-        self.connection_transcripts = {}
-        self.session_speaker_count = {}  # Track number of speakers per session
+        self.streams = {}
+        self.send_queues = {}
+        self.connection_spans = {}  # deepgram.connection span per session
+        self.tracer = get_tracer()
+        self.speaker_attributor = SpeakerAttributor()
 
-    def start_streaming_session(self, session_id: str, on_transcript_callback) -> bool:
-        """Start a streaming session for real-time transcription"""
+    @property
+    def client(self):
+        """The client passed in, else the process-wide one (created on first use)"""
+        return self._client or get_service_container().get('deepgram_client')
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
+    def _build_streaming_options(self, audio_format: AudioFormat):
+        """LiveOptions matching the format the session's audio pipeline produces"""
+        from deepgram import LiveOptions
+        return LiveOptions(
+            **self.streaming_options,
+            encoding=audio_format.encoding,
+            sample_rate=audio_format.sample_rate,
+            channels=audio_format.channels,
+        )
+    
+    def start_streaming_session(self, session_id: str, on_transcript_callback,
+                                audio_format: Optional[AudioFormat] = None,
+                                on_backpressure=None, on_connection_state=None) -> bool:
+        """Start a streaming session for real-time transcription
+        
+        on_backpressure(paused) is called when the session's send queue wants
+        the client to pause or resume sending audio. If the Deepgram
+        connection drops it is reopened in the background and
+        on_connection_state(state) reports 'reconnecting', 'connected' or
+        'failed'. A stream already running for the session is stopped first,
+        so a repeated start replaces it rather than leaving it running.
+        """
+        if session_id in self.streams or session_id in self.send_queues or session_id in self.connections:
+            logger.warning("Replacing the running streaming session", extra={'session_id': session_id})
+            self.stop_streaming_session(session_id)
         try:
-            print(f"Starting streaming session: {session_id}")
+            logger.info("Starting streaming session", extra={'session_id': session_id})
+            audio_format = audio_format or AudioFormat(
+                encoding="linear16",
+                sample_rate=Config.AUDIO_INPUT_SAMPLE_RATE,
+                input_sample_rate=Config.AUDIO_INPUT_SAMPLE_RATE
+            )
+            stream = LiveStream(session_id, audio_format, Config.DEEPGRAM_REPLAY_SECONDS,
+                                on_transcript_callback, on_connection_state)
             
-            # Create a live transcription connection using the correct pattern
-            print("Creating live connection...")
-            connection = self.client.listen.live.v("1")
-            print("Live connection created successfully")
+            connection_span = self.tracer.start_span(
+                session_id, "deepgram.connection",
+                encoding=audio_format.encoding,
+                sample_rate=audio_format.sample_rate
+            )
+            if connection_span:
+                self.connection_spans[session_id] = connection_span
             
-            # Store connection and initialize transcript buffer
-            self.connections[session_id] = connection
-            self.connection_transcripts[session_id] = ""
-            self.session_speaker_count[session_id] = 1  # Start with speaker 1
+            connection = self._open_connection(stream)
+            with stream.lock:
+                stream.attach(connection, AudioPipeline(audio_format))
             
-            # Simple speaker inference state
-            last_speaker_time = 0
-            current_speaker = 1
-            
-            # Define event handler functions
-            def on_open(connection_self, **kwargs):
-                print(f"Streaming connection opened for session: {session_id}")
-            
-            def on_message(connection_self, result, **kwargs):
-                sentence = result.channel.alternatives[0].transcript
-                if sentence.strip():
-                    # Extract speaker information if available
-                    speaker_id = None
-                    
-                    # Debug: Print the structure to understand how Deepgram sends speaker info
-                    print(f"Deepgram result structure: {type(result)}")
-                    print(f"Has channel: {hasattr(result, 'channel')}")
-                    if hasattr(result, 'channel'):
-                        print(f"Channel type: {type(result.channel)}")
-                        print(f"Has alternatives: {hasattr(result.channel, 'alternatives')}")
-                        if hasattr(result.channel, 'alternatives') and result.channel.alternatives:
-                            alt = result.channel.alternatives[0]
-                            print(f"Alternative has words: {hasattr(alt, 'words')}")
-                            if hasattr(alt, 'words') and alt.words:
-                                print(f"First few words: {[{w.word if hasattr(w, 'word') else str(w): getattr(w, 'speaker', 'no_speaker')} for w in alt.words[:3]]}")
-                    
-                    # Try multiple ways to extract speaker information
-                    try:
-                        # Method 1: Check if words have speaker information
-                        if (hasattr(result.channel.alternatives[0], 'words') and 
-                            result.channel.alternatives[0].words and 
-                            len(result.channel.alternatives[0].words) > 0):
-                            
-                            # Look for speaker in the first word
-                            first_word = result.channel.alternatives[0].words[0]
-                            if hasattr(first_word, 'speaker') and first_word.speaker is not None:
-                                speaker_id = first_word.speaker
-                                print(f"Found speaker from first word: {speaker_id}")
-                            
-                            # If not found, check all words for speaker info
-                            if speaker_id is None:
-                                for word in result.channel.alternatives[0].words:
-                                    if hasattr(word, 'speaker') and word.speaker is not None:
-                                        speaker_id = word.speaker
-                                        print(f"Found speaker from word '{word.word if hasattr(word, 'word') else str(word)}': {speaker_id}")
-                                        break
-                        
-                        # Method 2: Check if there's speaker info at the alternative level
-                        if speaker_id is None and hasattr(result.channel.alternatives[0], 'speaker'):
-                            speaker_id = result.channel.alternatives[0].speaker
-                            print(f"Found speaker at alternative level: {speaker_id}")
-                        
-                        # Method 3: Check if there's speaker info at the channel level
-                        if speaker_id is None and hasattr(result.channel, 'speaker'):
-                            speaker_id = result.channel.speaker
-                            print(f"Found speaker at channel level: {speaker_id}")
-                            
-                    except Exception as e:
-                        print(f"Error extracting speaker info: {e}")
-                    
-                    # Fallback: Improved speaker inference if no speaker data from Deepgram
-                    if speaker_id is None:
-                        import time
-                        current_time = time.time()
-                        
-                        # Initialize session tracking if needed
-                        if not hasattr(self, '_session_current_speaker'):
-                            self._session_current_speaker = {}
-                        if not hasattr(self, '_session_speaker_patterns'):
-                            self._session_speaker_patterns = {}
-                        
-                        if session_id not in self._session_current_speaker:
-                            self._session_current_speaker[session_id] = 1
-                        if session_id not in self._session_speaker_patterns:
-                            self._session_speaker_patterns[session_id] = {
-                                'last_speaker': 1,
-                                'utterance_count': 0,
-                                'speaker_1_words': 0,
-                                'speaker_2_words': 0
-                            }
-                        
-                        patterns = self._session_speaker_patterns[session_id]
-                        
-                        # Improved heuristics for speaker detection
-                        last_time_key = f'_last_transcript_time_{session_id}'
-                        time_gap = 0
-                        if hasattr(self, last_time_key):
-                            time_gap = current_time - getattr(self, last_time_key)
-                        
-                        # Analyze sentence patterns for speaker inference
-                        sentence_lower = sentence.lower()
-                        word_count = len(sentence.split())
-                        
-                        # Medical conversation patterns
-                        doctor_phrases = ["let's", "i'm going to", "can you", "how are", "what brings", 
-                                        "i need to", "we should", "i'd like to", "tell me about"]
-                        patient_phrases = ["i have", "it hurts", "i feel", "my", "i can't", 
-                                         "i've been", "i think", "i'm worried", "i'm having"]
-                        
-                        is_likely_doctor = any(phrase in sentence_lower for phrase in doctor_phrases)
-                        is_likely_patient = any(phrase in sentence_lower for phrase in patient_phrases)
-                        
-                        # Decision logic for speaker identification
-                        should_switch_speaker = False
-                        
-                        # Rule 1: Long pause (>2 seconds) suggests speaker change
-                        if time_gap > 2.0:
-                            should_switch_speaker = True
-                            print(f"Speaker change due to {time_gap:.1f}s pause")
-                        
-                        # Rule 2: Short utterance after long one suggests response/question
-                        elif word_count < 5 and patterns['utterance_count'] > 0:
-                            should_switch_speaker = True
-                            print(f"Speaker change due to short response ({word_count} words)")
-                        
-                        # Rule 3: Medical conversation patterns
-                        elif is_likely_doctor and patterns['last_speaker'] == 2:
-                            should_switch_speaker = True
-                            print("Speaker change: detected doctor language pattern")
-                        elif is_likely_patient and patterns['last_speaker'] == 1:
-                            should_switch_speaker = True
-                            print("Speaker change: detected patient language pattern")
-                        
-                        # Rule 4: Balance conversation - prevent one speaker dominating
-                        elif patterns['speaker_1_words'] > patterns['speaker_2_words'] + 50 and patterns['last_speaker'] == 1:
-                            should_switch_speaker = True
-                            print("Speaker change: balancing conversation")
-                        elif patterns['speaker_2_words'] > patterns['speaker_1_words'] + 50 and patterns['last_speaker'] == 2:
-                            should_switch_speaker = True
-                            print("Speaker change: balancing conversation")
-                        
-                        # Apply speaker change
-                        if should_switch_speaker:
-                            current_speaker = 2 if patterns['last_speaker'] == 1 else 1
-                            self._session_current_speaker[session_id] = current_speaker
-                            patterns['last_speaker'] = current_speaker
-                            print(f"Switched to Speaker {current_speaker}")
-                        else:
-                            current_speaker = patterns['last_speaker']
-                        
-                        # Update patterns
-                        patterns['utterance_count'] += 1
-                        if current_speaker == 1:
-                            patterns['speaker_1_words'] += word_count
-                        else:
-                            patterns['speaker_2_words'] += word_count
-                        
-                        setattr(self, last_time_key, current_time)
-                        speaker_id = current_speaker - 1  # Convert to 0-based for consistency
-                        print(f"Final speaker assignment: Speaker {current_speaker} (words: {word_count}, gap: {time_gap:.1f}s)")
-                    
-                    # Format the transcript with speaker information
-                    if speaker_id is not None:
-                        formatted_sentence = f"Speaker {speaker_id + 1}: {sentence}"
-                        print(f"Streaming transcript: Speaker {speaker_id + 1}: '{sentence[:50]}...'")
-                    else:
-                        formatted_sentence = sentence
-                        print(f"Streaming transcript (no speaker): '{sentence[:50]}...'")
-                    
-                    self.connection_transcripts[session_id] += " " + formatted_sentence
-                    
-                    # Call the callback with speaker-labeled transcript
-                    transcript_data = {
-                        'text': sentence,
-                        'speaker': speaker_id + 1 if speaker_id is not None else None,
-                        'formatted_text': formatted_sentence,
-                        'full_transcript': self.connection_transcripts[session_id]
-                    }
-                    on_transcript_callback(transcript_data)
-            
-            def on_metadata(connection_self, metadata, **kwargs):
-                print(f"Streaming metadata: {metadata}")
-            
-            def on_close(connection_self, **kwargs):
-                print(f"Streaming connection closed for session: {session_id}")
-            
-            def on_error(connection_self, error, **kwargs):
-                print(f"Streaming error for session {session_id}: {error}")
-            
-            # Register event handlers
-            print("Registering event handlers...")
-            connection.on(LiveTranscriptionEvents.Open, on_open)
-            connection.on(LiveTranscriptionEvents.Transcript, on_message)
-            connection.on(LiveTranscriptionEvents.Metadata, on_metadata)
-            connection.on(LiveTranscriptionEvents.Close, on_close)
-            connection.on(LiveTranscriptionEvents.Error, on_error)
-            print("Event handlers registered successfully")
+            # Store connection; transcript segments are kept by the caller
+            self.streams[session_id] = stream
+            self.connections[session_id] = connection
             
-            # Start the connection
-            print("Starting Deepgram connection...")
-            connection.start(self.streaming_options)
-            print("Deepgram connection started successfully")
+            # Audio is resampled, coalesced and sent by a per-session sender thread
+            self.send_queues[session_id] = AudioSendQueue(
+                session_id,
+                send=lambda payload: self._send(stream, payload),
+                process=stream.process,
+                bytes_per_second=stream.bytes_per_second,
+                packet_ms=Config.AUDIO_SEND_PACKET_MS,
+                max_queue_ms=Config.AUDIO_SEND_QUEUE_MAX_MS,
+                overflow_policy=Config.AUDIO_SEND_OVERFLOW_POLICY,
+                on_backpressure=on_backpressure,
+                on_sent=AUDIO_CHUNK_TO_SEND.observe
+            )
             
             return True
                 
         except Exception as e:
-            print(f"Error starting streaming session: {e}")
-            print(f"Error type: {type(e)}")
-            import traceback
-            traceback.print_exc()
+            self.streams.pop(session_id, None)
+            self.connections.pop(session_id, None)
+            connection_span = self.connection_spans.pop(session_id, None)
+            if connection_span:
+                connection_span.end(error=str(e))
+            logger.exception("Error starting streaming session %s", session_id)
             return False
     
-    def send_audio_chunk_to_stream(self, session_id: str, audio_bytes: bytes) -> bool:
-        """Send audio chunk to streaming connection"""
+    def _open_connection(self, stream: LiveStream):
+        """Open a live connection whose events are ignored once it is replaced"""
+        from deepgram import LiveTranscriptionEvents
+        session_id = stream.session_id
+        connection_span = self.connection_spans.get(session_id)
+        
+        # Create a live transcription connection using the correct pattern
+        connection = self.client.listen.live.v("1")
+        
+        # Define event handler functions
+        def on_open(connection_self, **kwargs):
+            logger.info("Streaming connection opened", extra={'session_id': session_id})
+            if connection_span:
+                connection_span.add_event("open")
+        
+        def on_message(connection_self, result, **kwargs):
+            if connection_self is not stream.connection:
+                return
+            received_at = time.monotonic()
+            alternative = result.channel.alternatives[0]
+            sentence = alternative.transcript
+            if sentence.strip():
+                start = result.start
+                end = start + result.duration if start is not None and result.duration is not None else None
+                # Shift onto the session timeline and drop audio re-sent after a reconnect
+                placed = stream.seam.place(sentence, start, end, getattr(alternative, 'words', None))
+                if placed is None:
+                    return
+                sentence, start, end, words = placed
+                speaker = self.speaker_attributor.attribute(session_id, sentence, words, end)
+                
+                formatted_sentence = f"Speaker {speaker}: {sentence}"
+                
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Streaming transcript received", extra={
+                        'session_id': session_id,
+                        'speaker': speaker,
+                        'word_count': len(sentence.split()),
+                        'sentence': sentence
+                    })
+                
+                # Call the callback with the speaker-labeled segment and its timing
+                transcript_data = {
+                    'text': sentence,
+                    'speaker': speaker,
+                    'formatted_text': formatted_sentence,
+                    'start': start,
+                    'end': end,
+                    'confidence': alternative.confidence,
+                    'received_at': received_at
+                }
+                stream.on_transcript(transcript_data)
+        
+        def on_metadata(connection_self, metadata, **kwargs):
+            logger.debug("Streaming metadata received", extra={'session_id': session_id})
+        
+        def on_close(connection_self, **kwargs):
+            logger.info("Streaming connection closed", extra={'session_id': session_id})
+            if connection_span:
+                connection_span.add_event("close")
+            self._connection_lost(stream, connection_self, "closed")
+        
+        def on_error(connection_self, error, **kwargs):
+            logger.error("Streaming error for session %s: %s", session_id, error)
+            if connection_span:
+                connection_span.add_event("error", error=str(error))
+            self._connection_lost(stream, connection_self, str(error))
+        
+        # Register event handlers
+        connection.on(LiveTranscriptionEvents.Open, on_open)
+        connection.on(LiveTranscriptionEvents.Transcript, on_message)
+        connection.on(LiveTranscriptionEvents.Metadata, on_metadata)
+        connection.on(LiveTranscriptionEvents.Close, on_close)
+        connection.on(LiveTranscriptionEvents.Error, on_error)
+        
+        # Start the connection
+        connection.start(self._build_streaming_options(stream.audio_format))
+        logger.info("Deepgram connection started", extra={
+            'session_id': session_id,
+            'encoding': stream.audio_format.encoding,
+            'sample_rate': stream.audio_format.sample_rate,
+            'generation': stream.generation + 1
+        })
+        return connection
+    
+    def _send(self, stream: LiveStream, payload: bytes) -> None:
+        if not stream.send(payload):
+            self._connection_lost(stream, stream.connection, "send failed")
+    
+    def _connection_lost(self, stream: LiveStream, connection, reason: str) -> None:
+        """Start reconnecting if `connection` is the stream's live one"""
+        if not stream.mark_lost(connection):
+            return
+        session_id = stream.session_id
+        logger.warning("Deepgram connection lost, reconnecting", extra={'session_id': session_id, 'reason': reason})
+        connection_span = self.connection_spans.get(session_id)
+        if connection_span:
+            connection_span.add_event("disconnect", reason=reason)
+        self._notify_state(stream, "reconnecting")
+        self._discard_connection(connection)
+        threading.Thread(target=self._reconnect, args=(stream,),
+                         name=f"deepgram-reconnect-{session_id}", daemon=True).start()
+    
+    def _reconnect(self, stream: LiveStream) -> None:
+        """Reopen the stream with jittered backoff and replay the buffered audio"""
+        session_id = stream.session_id
+        base = Config.DEEPGRAM_RECONNECT_BASE_MS / 1000
+        cap = Config.DEEPGRAM_RECONNECT_MAX_MS / 1000
+        for attempt in range(Config.DEEPGRAM_RECONNECT_ATTEMPTS):
+            if stream.closed.wait(backoff_delay(attempt, base, cap)):
+                return
+            try:
+                connection = self._open_connection(stream)
+            except Exception as e:
+                logger.warning("Deepgram reconnect attempt %d failed: %s", attempt + 1, e,
+                               extra={'session_id': session_id})
+                continue
+            
+            pipeline = AudioPipeline(stream.audio_format)
+            with stream.lock:
+                if stream.closed.is_set():
+                    self._discard_connection(connection)
+                    return
+                stream.attach(connection, pipeline)
+                try:
+                    replayed = 0
+                    for packet in stream.replay.packets():
+                        payload = pipeline.process(packet)
+                        if payload:
+                            connection.send(payload)
+                        replayed += len(packet)
+                except Exception as e:
+                    stream.connected = False
+                    self._discard_connection(connection)
+                    logger.warning("Deepgram replay failed on attempt %d: %s", attempt + 1, e,
+                                   extra={'session_id': session_id})
+                    continue
+                stream.reconnecting = False
+                stream.reconnects += 1
+                stream.replayed_bytes += replayed
+            
+            if session_id in self.connections:
+                self.connections[session_id] = connection
+            DEEPGRAM_RECONNECTS.labels('reconnected').inc()
+            logger.info("Deepgram connection restored", extra={
+                'session_id': session_id,
+                'attempt': attempt + 1,
+                'replayed_ms': replayed * 1000 // stream.bytes_per_second
+            })
+            connection_span = self.connection_spans.get(session_id)
+            if connection_span:
+                connection_span.add_event("reconnect", attempt=attempt + 1, replayed_bytes=replayed)
+            self._notify_state(stream, "connected")
+            return
+        
+        with stream.lock:
+            stream.reconnecting = False
+            stream.failed = True
+        DEEPGRAM_RECONNECTS.labels('failed').inc()
+        logger.error("Giving up on Deepgram reconnect after %d attempts", Config.DEEPGRAM_RECONNECT_ATTEMPTS,
+                     extra={'session_id': session_id})
+        self._notify_state(stream, "failed")
+    
+    @staticmethod
+    def _notify_state(stream: LiveStream, state: str) -> None:
+        if stream.on_state:
+            try:
+                stream.on_state(state)
+            except Exception as e:
+                logger.error("Error reporting Deepgram connection state: %s", e)
+    
+    @staticmethod
+    def _discard_connection(connection) -> None:
+        """Close a dead connection without waiting on it
+        
+        finish() can block on a socket that already failed, so it runs on
+        a throwaway thread.
+        """
+        def finish():
+            try:
+                connection.finish()
+            except Exception:
+                # finish() gives up at CloseStream on a dead socket; still
+                # let the SDK's keepalive thread exit
+                connection.exit = True
+        threading.Thread(target=finish, name="deepgram-discard", daemon=True).start()
+    
+    def send_audio_chunk_to_stream(self, session_id: str, audio_bytes: bytes,
+                                   received_at: Optional[float] = None) -> bool:
+        """Queue audio chunk for the session's sender; never blocks on the network"""
         try:
-            connection = self.connections.get(session_id)
-            if connection:
-                connection.send(audio_bytes)
-                return True
+            send_queue = self.send_queues.get(session_id)
+            if send_queue:
+                return send_queue.put(audio_bytes, received_at)
             else:
-                print(f"No streaming connection found for session: {session_id}")
+                logger.warning("No streaming connection found for session %s", session_id)
                 return False
         except Exception as e:
-            print(f"Error sending audio chunk to stream: {e}")
+            logger.error("Error sending audio chunk to stream: %s", e, extra={'session_id': session_id})
             return False
     
-    def stop_streaming_session(self, session_id: str) -> str:
-        """Stop streaming session and return final transcript"""
+    def stop_streaming_session(self, session_id: str) -> bool:
+        """Stop streaming session, flushing any final results to the callback"""
         try:
-            connection = self.connections.get(session_id)
-            if connection:
+            stream = self.streams.pop(session_id, None)
+            if stream:
+                stream.closed.set()
+            
+            # Drain queued audio before flushing the encoder and closing
+            send_queue = self.send_queues.pop(session_id, None)
+            if send_queue:
+                send_queue.close()
+            
+            connection = self.connections.pop(session_id, None)
+            if stream and stream.connected:
+                tail = stream.pipeline.flush()
+                if tail:
+                    stream.send(tail)
                 connection.finish()
-                del self.connections[session_id]
+            elif connection:
+                # Dropped and not (yet) reconnected; nothing more will arrive
+                self._discard_connection(connection)
             
-            # Get final transcript
-            final_transcript = self.connection_transcripts.get(session_id, "")
-            if session_id in self.connection_transcripts:
-                del self.connection_transcripts[session_id]
+            connection_span = self.connection_spans.pop(session_id, None)
+            if connection_span:
+                connection_span.add_event("finish")
+                connection_span.end()
+            self.speaker_attributor.forget(session_id)
             
-            print(f"Streaming session stopped for: {session_id}")
-            return final_transcript
+            logger.info("Streaming session stopped", extra={'session_id': session_id})
+            return True
             
         except Exception as e:
-            print(f"Error stopping streaming session: {e}")
-            return ""
+            logger.error("Error stopping streaming session %s: %s", session_id, e)
+            return False
+    
+    def check_connection(self, timeout: float = 5.0) -> dict:
+        """Confirm the API is reachable and accepts our key
+        
+        Lists the key's projects over REST, which costs nothing, rather than
+        opening a live transcription connection. Raises on failure.
+        """
+        base_url = (Config.DEEPGRAM_URL or "https://api.deepgram.com").rstrip("/")
+        response = requests.get(f"{base_url}/v1/projects", timeout=timeout,
+                                headers={'Authorization': f"Token {Config.DEEPGRAM_API_KEY}"})
+        if response.status_code in (401, 403):
+            raise RuntimeError("Deepgram rejected the API key, check DEEPGRAM_API_KEY")
+        response.raise_for_status()
+        return {'connections': len(self.connections)}
+    
+    def is_streaming(self, session_id: str) -> bool:
+        return session_id in self.connections
+    
+    def get_send_queue_stats(self, session_id: str) -> Optional[dict]:
+        """Queue depth metrics for a session's audio sender"""
+        send_queue = self.send_queues.get(session_id)
+        if not send_queue:
+            return None
+        stats = send_queue.stats()
+        stream = self.streams.get(session_id)
+        if stream:
+            stats['connection'] = stream.stats()
+        return stats
+    
+    def get_all_send_queue_stats(self) -> list:
+        """Queue depth metrics for every active audio sender"""
+        return [stats for stats in map(self.get_send_queue_stats, list(self.send_queues)) if stats]
     
     def correct_speaker(self, session_id: str, speaker_number: int) -> bool:
         """Manually correct the current speaker for a session"""
-        try:
-            if not hasattr(self, '_session_current_speaker'):
-                self._session_current_speaker = {}
-            if not hasattr(self, '_session_speaker_patterns'):
-                self._session_speaker_patterns = {}
-                
-            self._session_current_speaker[session_id] = speaker_number
-            
-            # Update patterns if they exist
-            if session_id in self._session_speaker_patterns:
-                self._session_speaker_patterns[session_id]['last_speaker'] = speaker_number
-                
-            print(f"Speaker manually corrected to Speaker {speaker_number} for session {session_id}")
-            return True
-        except Exception as e:
-            print(f"Error correcting speaker: {e}")
-            return False
+        self.speaker_attributor.correct(session_id, speaker_number)
+        logger.info("Speaker manually corrected", extra={'session_id': session_id, 'speaker': speaker_number})
+        return True
     
     def get_session_speaker_stats(self, session_id: str) -> dict:
         """Get speaker statistics for a session"""
-        try:
-            if (hasattr(self, '_session_speaker_patterns') and 
-                session_id in self._session_speaker_patterns):
-                patterns = self._session_speaker_patterns[session_id]
-                return {
-                    'current_speaker': patterns['last_speaker'],
-                    'speaker_1_words': patterns['speaker_1_words'],
-                    'speaker_2_words': patterns['speaker_2_words'],
-                    'total_utterances': patterns['utterance_count']
-                }
-            return {'current_speaker': 1, 'speaker_1_words': 0, 'speaker_2_words': 0, 'total_utterances': 0}
-        except Exception as e:
-            print(f"Error getting speaker stats: {e}")
-            return {'current_speaker': 1, 'speaker_1_words': 0, 'speaker_2_words': 0, 'total_utterances': 0} 
\ No newline at end of file
+        return self.speaker_attributor.stats(session_id)
@@ -1,18 +1,71 @@
-import google.generativeai as genai
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
 from models.responses import SOAPNoteResult
+from models.transcript import TranscriptSegment, TranscriptStore
 from config.settings import Config
+from services.metrics import GEMINI_ERRORS, GEMINI_HEDGES, GEMINI_REQUEST
+from services.model_router import HedgedCall, HedgeLost, ModelRouter, ModelTarget, parse_model_routes
+from services.service_container import get_service_container
+from services.soap_cache import create_soap_cache, soap_cache_key
+from services.soap_drafter import CHARS_PER_TOKEN, estimate_tokens
+from services.transcript_chunker import chunk_transcript
+
+logger = logging.getLogger(__name__)
+
+# Error classes reported in SOAPNoteResult.error_type
+ERROR_AUTH = "auth"
+ERROR_QUOTA = "quota"
+ERROR_SAFETY = "safety"
+ERROR_PERMISSION = "permission"
+ERROR_TRANSIENT = "transient"
+ERROR_UNKNOWN = "unknown"
+
+# Errors worth retrying: rate limits and temporary server/network failures
+RETRYABLE_ERRORS = (ERROR_QUOTA, ERROR_TRANSIENT)
+
+# Bump whenever _create_soap_prompt changes so cached notes are not reused
+SOAP_PROMPT_VERSION = "1"
+# Same for _create_extraction_prompt and cached chunk extractions
+EXTRACTION_PROMPT_VERSION = "1"
+
+TRANSIENT_ERROR_MARKERS = ("DEADLINE", "UNAVAILABLE", "TIMEOUT", "TIMED OUT", "INTERNAL",
+                           "500", "502", "503", "504", "CONNECTION")
 
 class GeminiService:
     def __init__(self):
-        genai.configure(api_key=Config.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # The SDK is imported and configured on first use (see service_container)
+        self.router = ModelRouter(
+            Config.GEMINI_MODEL,
+            parse_model_routes(Config.GEMINI_MODEL_ROUTES),
+            hedge=ModelTarget(Config.GEMINI_HEDGE_MODEL, Config.GEMINI_HEDGE_URL or None)
+            if Config.GEMINI_HEDGE_MODEL or Config.GEMINI_HEDGE_URL else None,
+            hedge_percentile=Config.GEMINI_HEDGE_PERCENTILE,
+            min_samples=Config.GEMINI_HEDGE_MIN_SAMPLES,
+            initial_deadline=Config.GEMINI_HEDGE_INITIAL_SECONDS
+        )
+        self.model_name = self.router.describe()
+        self._models = {}
+        self._models_lock = threading.Lock()
         
         # Configure generation parameters for medical content
-        self.generation_config = genai.types.GenerationConfig(
-            candidate_count=1,
-            max_output_tokens=2000,
-            temperature=0.3,
-        )
+        self.generation_config = {
+            'candidate_count': 1,
+            'max_output_tokens': Config.SOAP_MAX_OUTPUT_TOKENS,
+            'temperature': 0.3,
+        }
+        
+        # Long transcripts are map-reduced: facts are extracted chunk by chunk
+        # in parallel, then merged into the note
+        self.chunk_tokens = Config.SOAP_CHUNK_TOKENS
+        self.map_parallelism = max(1, Config.SOAP_MAP_PARALLELISM)
+        self.extraction_config = {
+            'candidate_count': 1,
+            'max_output_tokens': Config.SOAP_MAP_MAX_OUTPUT_TOKENS,
+            'temperature': 0.1,
+        }
         
         # Safety settings for medical content
         self.safety_settings = [
@@ -21,23 +74,203 @@ class GeminiService:
             {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
             {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
         ]
+        
+        # Identical transcripts (retries, repeated stops, QA replays) reuse the stored note
+        self.cache = create_soap_cache(
+            Config.SOAP_CACHE_MAX_ENTRIES,
+            Config.SOAP_CACHE_TTL_SECONDS,
+            Config.SOAP_CACHE_DIR,
+            Config.SOAP_CACHE_KEY,
+            Config.SOAP_CACHE_DISK_TTL_SECONDS
+        ) if Config.SOAP_CACHE_ENABLED else None
+    
+    def generate_soap_note(self, transcript: TranscriptStore,
+                           on_chunk: Optional[Callable[[str], None]] = None,
+                           session_id: Optional[str] = None) -> SOAPNoteResult:
+        """Generate SOAP note from transcript using Google Gemini
+        
+        When on_chunk is given the response is streamed and on_chunk is called
+        with each text chunk as it arrives; the full note is still returned.
+        A cached note for the same transcript is returned without calling the
+        API (and passed to on_chunk in one piece). Transcripts over
+        chunk_tokens go through _generate_chunked.
+        """
+        cache_key = self._cache_key(transcript.render(), SOAP_PROMPT_VERSION,
+                                    self.generation_config) if self.cache else None
+        if cache_key:
+            soap_note = self.cache.get(cache_key, session_id)
+            if soap_note is not None:
+                logger.info("Using cached SOAP note", extra={'session_id': session_id, 'segments': len(transcript)})
+                if on_chunk is not None:
+                    on_chunk(soap_note)
+                return SOAPNoteResult(success=True, soap_note=soap_note)
+        
+        if estimate_tokens(transcript) > self.chunk_tokens:
+            result = self._generate_chunked(transcript, on_chunk, session_id)
+        else:
+            logger.info("Calling Gemini API", extra={'session_id': session_id, 'segments': len(transcript)})
+            result = self._generate(self._create_soap_prompt(transcript.render()), on_chunk, 'soap_note')
+        if cache_key and result.success:
+            self.cache.put(cache_key, result.soap_note, session_id)
+        return result
+    
+    def _generate_chunked(self, transcript: TranscriptStore, on_chunk: Optional[Callable[[str], None]],
+                          session_id: Optional[str]) -> SOAPNoteResult:
+        """Map-reduce a transcript too long for one prompt
+        
+        The transcript is split on speaker turns, the clinical facts in each
+        chunk are extracted with up to map_parallelism requests in flight, and
+        a final request (streamed to on_chunk) writes the note from the
+        extractions in transcript order. Extractions are cached like notes,
+        so a retry after a failed chunk only repeats the chunks still missing.
+        """
+        chunks = chunk_transcript(transcript, self.chunk_tokens)
+        logger.info("Calling Gemini API on transcript chunks",
+                    extra={'session_id': session_id, 'segments': len(transcript), 'chunks': len(chunks)})
+        
+        def extract(numbered):
+            part, segments = numbered
+            return self._extract_chunk(segments, part, len(chunks), session_id)
+        
+        with ThreadPoolExecutor(max_workers=min(self.map_parallelism, len(chunks)),
+                                thread_name_prefix="soap-map") as pool:
+            extractions = list(pool.map(extract, enumerate(chunks, 1)))
+        
+        failed = next((result for result in extractions if not result.success), None)
+        if failed:
+            return failed
+        return self._generate(self._create_reduce_prompt([result.soap_note for result in extractions]),
+                              on_chunk, 'soap_reduce')
     
-    def generate_soap_note(self, transcript: str) -> SOAPNoteResult:
-        """Generate SOAP note from transcript using Google Gemini"""
+    def _extract_chunk(self, segments: List[TranscriptSegment], part: int, parts: int,
+                       session_id: Optional[str]) -> SOAPNoteResult:
+        """Pull the clinical facts out of one transcript chunk"""
+        text = " ".join(segment.formatted_text for segment in segments)
+        cache_key = self._cache_key(text, EXTRACTION_PROMPT_VERSION, self.extraction_config) if self.cache else None
+        if cache_key:
+            extraction = self.cache.get(cache_key, session_id)
+            if extraction is not None:
+                return SOAPNoteResult(success=True, soap_note=extraction)
+        
+        result = self._generate(self._create_extraction_prompt(text, part, parts), None, 'soap_map',
+                                self.extraction_config)
+        if cache_key and result.success:
+            self.cache.put(cache_key, result.soap_note, session_id)
+        return result
+    
+    def _cache_key(self, text: str, prompt_version: str, generation_config) -> str:
+        return soap_cache_key(
+            text,
+            prompt_version,
+            self.model_name,
+            dict(generation_config, safety_settings=self.safety_settings)
+        )
+    
+    def update_soap_draft(self, draft: str, segments: Sequence[TranscriptSegment], final: bool = False,
+                          on_chunk: Optional[Callable[[str], None]] = None) -> SOAPNoteResult:
+        """Fold new transcript segments into a running SOAP draft
+        
+        Only the draft and the new segments are sent, so the prompt stays
+        bounded however long the visit runs. With final=True the result is
+        the finished note rather than another working draft.
+        """
+        logger.info("Calling Gemini API to merge new segments into the SOAP draft",
+                    extra={'segments': len(segments), 'final': final})
+        return self._generate(self._create_draft_prompt(draft, segments, final), on_chunk,
+                              'final_merge' if final else 'draft_update')
+    
+    def _generate(self, prompt: str, on_chunk: Optional[Callable[[str], None]],
+                  operation: str, generation_config=None) -> SOAPNoteResult:
+        """Run one Gemini request on the routed model, streaming to on_chunk when given"""
+        generation_config = generation_config or self.generation_config
+        target = self.router.route(len(prompt) // CHARS_PER_TOKEN)
+        hedge = self.router.hedge_for(target)
+        if hedge is None:
+            return self._timed_request(target, prompt, on_chunk, generation_config, operation)
+        return self._hedged_request(target, hedge, prompt, on_chunk, generation_config, operation)
+    
+    def _hedged_request(self, target: ModelTarget, hedge: ModelTarget, prompt: str,
+                        on_chunk: Optional[Callable[[str], None]], generation_config,
+                        operation: str) -> SOAPNoteResult:
+        """Send the request to target, and to hedge too if target is slower than usual"""
+        call = HedgedCall(on_chunk)
+        
+        def attempt(name: str, attempt_target: ModelTarget) -> None:
+            result = self._timed_request(attempt_target, prompt, call.forward(name), generation_config, operation)
+            call.finish(name, result)
+        
+        threading.Thread(target=attempt, args=('primary', target), name="gemini-request", daemon=True).start()
+        deadline = self.router.hedge_deadline(target, operation)
+        if call.wait_for_output('primary', deadline):
+            return call.result(['primary'])
+        
+        logger.info("Hedging slow Gemini request", extra={
+            'operation': operation, 'model': target.label, 'hedge_model': hedge.label,
+            'deadline_ms': round(deadline * 1000)})
+        threading.Thread(target=attempt, args=('hedge', hedge), name="gemini-hedge", daemon=True).start()
+        result = call.result(['primary', 'hedge'])
+        self.router.record_hedge(hedge, call.winner == 'hedge')
+        GEMINI_HEDGES.labels(call.winner or 'none').inc()
+        return result
+    
+    def _timed_request(self, target: ModelTarget, prompt: str, on_chunk: Optional[Callable[[str], None]],
+                       generation_config, operation: str) -> SOAPNoteResult:
+        started = time.monotonic()
+        first_output = []
+        
+        def timed_chunk(text: str) -> None:
+            if not first_output:
+                first_output.append(time.monotonic() - started)
+            on_chunk(text)
+        
         try:
-            prompt = self._create_soap_prompt(transcript)
-            print("----------------CHecking gemini API", transcript)
-            
-            response = self.model.generate_content(
+            result = self._request(self._model(target), prompt, timed_chunk if on_chunk else None, generation_config)
+            cancelled = False
+        except HedgeLost:
+            result = SOAPNoteResult(success=False, error="Cancelled: the hedged request answered first")
+            cancelled = True
+        elapsed = time.monotonic() - started
+        outcome = 'cancelled' if cancelled else 'success' if result.success else 'error'
+        GEMINI_REQUEST.labels(operation, target.model, outcome).observe(elapsed)
+        self.router.record(target, operation, result, first_output[0] if first_output else None, elapsed, cancelled)
+        return result
+    
+    def _model(self, target: ModelTarget):
+        """GenerativeModel for a routing target, created on first use"""
+        with self._models_lock:
+            model = self._models.get(target)
+            if model is None:
+                model = get_service_container().get('genai').GenerativeModel(target.model)
+                if target.endpoint:
+                    from google.ai import generativelanguage as glm
+                    # GenerativeModel takes no client argument in this SDK version;
+                    # the default one is bound to GEMINI_API_URL or Google's endpoint
+                    model._client = glm.GenerativeServiceClient(
+                        transport='rest',
+                        client_options={'api_endpoint': target.endpoint, 'api_key': Config.GOOGLE_API_KEY}
+                    )
+                self._models[target] = model
+            return model
+    
+    def _request(self, model, prompt: str, on_chunk: Optional[Callable[[str], None]],
+                 generation_config) -> SOAPNoteResult:
+        try:
+            response = model.generate_content(
                 prompt,
-                generation_config=self.generation_config,
-                safety_settings=self.safety_settings
+                generation_config=generation_config,
+                safety_settings=self.safety_settings,
+                stream=on_chunk is not None
             )
             
-            if response.text:
+            if on_chunk is not None:
+                soap_note = self._consume_stream(response, on_chunk)
+            else:
+                soap_note = response.text
+            
+            if soap_note:
                 return SOAPNoteResult(
                     success=True,
-                    soap_note=response.text
+                    soap_note=soap_note
                 )
             else:
                 return SOAPNoteResult(
@@ -45,32 +278,46 @@ class GeminiService:
                     error="No response generated from Gemini API"
                 )
                 
+        except HedgeLost:
+            raise
         except Exception as e:
             error_message = self._handle_gemini_error(str(e))
             return SOAPNoteResult(
                 success=False,
-                error=error_message
+                error=error_message,
+                error_type=self._classify_gemini_error(str(e))
             )
     
+    def _consume_stream(self, response, on_chunk: Callable[[str], None]) -> str:
+        """Pass each streamed chunk to on_chunk and return the joined text"""
+        parts = []
+        for chunk in response:
+            text = chunk.text
+            if text:
+                parts.append(text)
+                on_chunk(text)
+        return "".join(parts)
+    
     def test_api_connection(self) -> dict:
-        """Test Gemini API connection"""
+        """Test Gemini API connection
+        
+        Looks up the model's metadata rather than generating anything, so it
+        proves the key and endpoint work without using generation quota.
+        """
+        target = self.router.route(0)
         try:
-            test_model = genai.GenerativeModel('gemini-1.5-flash')
-            response = test_model.generate_content(
-                "Respond with 'API Working' if you can see this message.",
-                generation_config=genai.types.GenerationConfig(max_output_tokens=10)
-            )
+            model = get_service_container().get('genai').get_model(f"models/{target.model}")
             
-            if response.text and "API Working" in response.text:
+            if "generateContent" in model.supported_generation_methods:
                 return {
                     "status": "working",
-                    "model": "gemini-1.5-flash",
+                    "model": target.label,
                     "message": "Gemini API is configured and working"
                 }
             else:
                 return {
                     "status": "error", 
-                    "message": "Gemini API responded but with unexpected content"
+                    "message": f"Model {target.model} does not support content generation"
                 }
                 
         except Exception as e:
@@ -101,15 +348,90 @@ Please format the SOAP note professionally with clear sections. If any section l
 Create a well-structured SOAP note now:
 """
     
+    def _create_extraction_prompt(self, transcript: str, part: int, parts: int) -> str:
+        """Create the map prompt: the clinical facts in one part of a long transcript"""
+        return f"""
+You are a medical documentation assistant. A long doctor-patient conversation has been split into {parts} consecutive parts; below is part {part}.
+
+Extract every clinically relevant fact from this part as terse bullet points under the headings SUBJECTIVE, OBJECTIVE, ASSESSMENT and PLAN. Keep medications, doses, measurements and dates exactly as spoken and note who said what when it matters. Leave a heading empty if this part has nothing for it. Do not add anything that is not in the transcript.
+
+Transcript part {part} of {parts}:
+{transcript}
+"""
+    
+    def _create_reduce_prompt(self, extractions: List[str]) -> str:
+        """Create the reduce prompt: one SOAP note from the per-part extractions"""
+        parts = "\n\n".join(f"Part {part}:\n{extraction.strip()}"
+                             for part, extraction in enumerate(extractions, 1))
+        return f"""
+You are a medical documentation assistant specializing in creating accurate SOAP notes from doctor-patient conversations.
+
+A long conversation was split into {len(extractions)} consecutive parts and the clinical facts of each part were extracted below, in order.
+
+SOAP Format:
+- SUBJECTIVE: Patient's symptoms, complaints, and history in their own words
+- OBJECTIVE: Observable, measurable findings (vital signs, physical exam, test results)
+- ASSESSMENT: Medical diagnosis or clinical impression
+- PLAN: Treatment plan, medications, follow-up instructions
+
+{parts}
+
+Merge these into one professional SOAP note with clear sections. Remove duplicates, and where a later part corrects or contradicts an earlier one, keep the later information. If any section lacks information, note "Not documented in visit" for that section.
+
+Create a well-structured SOAP note now:
+"""
+    
+    def _create_draft_prompt(self, draft: str, segments: Sequence[TranscriptSegment], final: bool) -> str:
+        """Create the prompt that merges new transcript into the running draft"""
+        new_transcript = " ".join(segment.formatted_text for segment in segments)
+        if final:
+            task = ("The visit has ended. Produce the final, professionally formatted SOAP note with "
+                    "SUBJECTIVE, OBJECTIVE, ASSESSMENT and PLAN sections. If any section lacks "
+                    "information, note \"Not documented in visit\" for that section.")
+        else:
+            task = ("The visit is still in progress. Return the complete updated working draft in the "
+                    "same SOAP structure, keeping it concise; it will be updated again later.")
+        return f"""
+You are a medical documentation assistant maintaining a SOAP note while a doctor-patient conversation is in progress.
+
+Current SOAP draft (covers the conversation so far):
+{draft or "(empty - nothing drafted yet)"}
+
+New transcript since the draft was last updated:
+{new_transcript or "(no new transcript)"}
+
+Merge the new transcript into the draft: add new findings to the right sections and correct earlier statements the new transcript contradicts. Do not drop information already in the draft.
+
+{task}
+"""
+    
+    def _classify_gemini_error(self, error_message: str) -> str:
+        """Classify a Gemini API error so callers can decide whether to retry"""
+        upper = error_message.upper()
+        if "API_KEY" in upper:
+            return ERROR_AUTH
+        elif "QUOTA" in upper or "RESOURCE_EXHAUSTED" in upper or "429" in upper:
+            return ERROR_QUOTA
+        elif "SAFETY" in upper:
+            return ERROR_SAFETY
+        elif "PERMISSION_DENIED" in upper:
+            return ERROR_PERMISSION
+        elif any(marker in upper for marker in TRANSIENT_ERROR_MARKERS):
+            return ERROR_TRANSIENT
+        else:
+            return ERROR_UNKNOWN
+    
     def _handle_gemini_error(self, error_message: str) -> str:
         """Handle and format Gemini API errors"""
-        if "API_KEY" in error_message.upper():
+        error_type = self._classify_gemini_error(error_message)
+        GEMINI_ERRORS.labels(error_type).inc()
+        if error_type == ERROR_AUTH:
             return "Invalid or missing Google API key. Please check your GOOGLE_API_KEY in .env file."
-        elif "QUOTA" in error_message.upper():
+        elif error_type == ERROR_QUOTA:
             return "API quota exceeded. Please check your Gemini API usage limits."
-        elif "SAFETY" in error_message.upper():
+        elif error_type == ERROR_SAFETY:
             return "Content was blocked by safety filters. This may happen with medical content."
-        elif "PERMISSION_DENIED" in error_message.upper():
+        elif error_type == ERROR_PERMISSION:
             return "API key doesn't have permission to use Gemini"
         else:
             return f"Gemini API error: {error_message}" 
\ No newline at end of file
@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class HealthProber:
+    """Checks dependencies on a background thread and caches the outcome
+
+    Each check is a callable that returns a dict of details when the
+    dependency is reachable and raises when it is not. Every interval
+    seconds each check runs on its own thread; one that has not returned
+    within timeout seconds is reported as failed, and is not started again
+    until it does. result() only reads the cache, so health endpoints cost
+    the same however slow the dependencies are. A result older than ttl
+    seconds (the prober has fallen behind or stopped) counts as failed.
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], Optional[dict]]], interval: float = 30.0,
+                 ttl: float = 90.0, timeout: float = 5.0):
+        self.checks = checks
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self._results: Dict[str, dict] = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="health-prober", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def result(self, name: str) -> dict:
+        """Last outcome of a check: ok (None until it first completes), age and details"""
+        with self._lock:
+            result = self._results.get(name)
+        if result is None:
+            return {'ok': None, 'error': "not checked yet"}
+        result = dict(result)
+        result['age_seconds'] = round(time.time() - result['checked_at'], 1)
+        if result['ok'] and result['age_seconds'] > self.ttl:
+            result.update(ok=False, error=f"last successful check is older than {self.ttl:g}s")
+        return result
+
+    def probe_now(self) -> None:
+        """Run every check once and wait for them (up to timeout)"""
+        threads = [self._start_check(name, check) for name, check in self.checks.items()]
+        deadline = time.monotonic() + self.timeout
+        for name, thread in zip(self.checks, threads):
+            if thread is None:
+                continue
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                self._record(name, False, self.timeout, error=f"timed out after {self.timeout:g}s")
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.probe_now()
+            self._stop.wait(self.interval)
+
+    def _start_check(self, name: str, check: Callable[[], Optional[dict]]) -> Optional[threading.Thread]:
+        with self._lock:
+            if name in self._running:
+                return None
+            self._running.add(name)
+        thread = threading.Thread(target=self._run_check, args=(name, check), name=f"health-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _run_check(self, name: str, check: Callable[[], Optional[dict]]) -> None:
+        started = time.monotonic()
+        try:
+            details = check() or {}
+            self._record(name, True, time.monotonic() - started, **details)
+        except Exception as e:
+            logger.warning("Health check failed: %s", e, extra={'check': name})
+            self._record(name, False, time.monotonic() - started, error=str(e))
+        finally:
+            with self._lock:
+                self._running.discard(name)
+
+    def _record(self, name: str, ok: bool, elapsed: float, **details) -> None:
+        result = {'ok': ok, 'checked_at': time.time(), 'latency_ms': round(elapsed * 1000, 1), **details}
+        with self._lock:
+            self._results[name] = result
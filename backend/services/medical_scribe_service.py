@@ -1,121 +1,405 @@
 import base64
-from typing import Dict
+import hashlib
+import logging
+import time
+from typing import Dict, Optional, Sequence, Set, Union
 from models.session import RecordingSession, SessionStatus
 from models.responses import  SOAPNoteResult
+from models.transcript import TranscriptSegment
+from models.soap_job import SoapJob, SoapJobStatus
+from config.settings import Config
+from services.audio_archive import create_audio_archive
+from services.audio_pipeline import negotiate_audio_format
 from services.deepgram_service import DeepgramService
 from services.gemini_service import GeminiService
+from services.health_prober import HealthProber
+from services.metrics import (ACTIVE_SESSIONS, AUDIO_QUEUE_DEPTH, DEEPGRAM_CONNECTIONS, PROMPT_TRANSCRIPT_TOKENS,
+                              SOAP_JOBS_RUNNING, SOAP_QUEUE_DEPTH, STOP_TO_SOAP_TIMER, TRANSCRIPT_TO_EMIT)
+from services.session_lifecycle import SessionLifecycleManager
+from services.session_registry import SessionRegistry, get_session_registry
+from services.soap_drafter import RollingSoapDrafter, estimate_tokens, take_within_budget
+from services.soap_job_queue import SoapJobQueue
+from services.soap_sections import SoapSectionTracker
+from services.tracing import get_tracer
+from services.transcript_preprocessor import preprocess_transcript
+from config.logging_config import LogSampler
+
+logger = logging.getLogger(__name__)
+
+# Per-chunk events arrive many times a second per session
+_audio_chunk_log_sampler = LogSampler(Config.LOG_SAMPLE_EVERY)
+
+def session_room(session_id: str) -> str:
+    """Socket.IO room of the clients following a session"""
+    return f"session:{session_id}"
 
 class MedicalScribeService:
-    def __init__(self, socketio=None):
-        self.sessions: Dict[str, RecordingSession] = {}
+    def __init__(self, socketio=None, sessions: Optional[SessionRegistry] = None):
+        self.sessions = sessions or get_session_registry()
         self.deepgram_service = DeepgramService()
         self.gemini_service = GeminiService()
         self.socketio = socketio
+        self.tracer = get_tracer()
+        # Sessions of this process in the recording state, for the metrics gauge
+        self._recording_ids: Set[str] = set()
+        self.soap_jobs = SoapJobQueue(
+            self._run_soap_job,
+            self._on_soap_job_update,
+            workers=Config.SOAP_WORKERS,
+            max_queued=Config.SOAP_QUEUE_MAX,
+            max_attempts=Config.SOAP_MAX_ATTEMPTS,
+            backoff_base=Config.SOAP_RETRY_BASE_SECONDS,
+            backoff_max=Config.SOAP_RETRY_MAX_SECONDS
+        )
+        self.soap_drafter = RollingSoapDrafter(
+            self.gemini_service,
+            self.sessions,
+            self._on_soap_draft_update,
+            token_budget=Config.SOAP_DRAFT_TOKEN_BUDGET,
+            interval_seconds=Config.SOAP_DRAFT_INTERVAL_SECONDS,
+            max_delta_tokens=Config.SOAP_DRAFT_MAX_DELTA_TOKENS,
+            workers=Config.SOAP_DRAFT_WORKERS
+        ) if Config.SOAP_ROLLING_DRAFT else None
+        self.lifecycle = SessionLifecycleManager(
+            self,
+            idle_timeout=Config.SESSION_IDLE_TIMEOUT_SECONDS,
+            recording_idle_timeout=Config.SESSION_RECORDING_IDLE_SECONDS,
+            disconnect_grace=Config.SESSION_DISCONNECT_GRACE_SECONDS,
+            reap_interval=Config.SESSION_REAP_INTERVAL_SECONDS,
+            max_sessions=Config.SESSION_MAX_COUNT,
+            max_memory_bytes=Config.SESSION_MAX_MEMORY_MB * 1024 * 1024
+        )
+        self.lifecycle.start()
+        self.audio_archive = create_audio_archive(
+            Config.AUDIO_ARCHIVE_ENABLED,
+            Config.AUDIO_ARCHIVE_DIR,
+            Config.AUDIO_ARCHIVE_FORMAT,
+            Config.AUDIO_ARCHIVE_SEGMENT_SECONDS,
+            int(Config.AUDIO_ARCHIVE_MAX_BUFFER_MB * 1024 * 1024)
+        )
+        self.health = HealthProber(
+            {
+                'deepgram': lambda: self.deepgram_service.check_connection(Config.HEALTH_PROBE_TIMEOUT_SECONDS),
+                'gemini': self._check_gemini,
+                'session_store': self._check_session_store,
+            },
+            interval=Config.HEALTH_PROBE_INTERVAL_SECONDS,
+            ttl=Config.HEALTH_PROBE_TTL_SECONDS,
+            timeout=Config.HEALTH_PROBE_TIMEOUT_SECONDS
+        )
+        self._register_gauges()
+    
+    def _register_gauges(self):
+        """Point the /metrics gauges at this service's live state"""
+        # Scrapes must not query the session store (a SQLite count waits for a flush)
+        ACTIVE_SESSIONS.set_function(lambda: len(self._recording_ids))
+        DEEPGRAM_CONNECTIONS.set_function(lambda: len(self.deepgram_service.connections))
+        AUDIO_QUEUE_DEPTH.set_function(
+            lambda: sum(stats['depth_bytes'] for stats in self.deepgram_service.get_all_send_queue_stats()))
+        SOAP_QUEUE_DEPTH.set_function(lambda: self.soap_jobs.stats()['queued'])
+        SOAP_JOBS_RUNNING.set_function(lambda: self.soap_jobs.stats()['running'])
     
-    def create_session(self, session_id: str) -> RecordingSession:
-        """Create a new recording session"""
+    def _check_gemini(self) -> dict:
+        status = self.gemini_service.test_api_connection()
+        if status['status'] != 'working':
+            raise RuntimeError(status['message'])
+        return {'model': status['model']}
+    
+    def _check_session_store(self) -> dict:
+        self.sessions.ping()
+        return {'backend': Config.SESSION_BACKEND}
+    
+    def health_report(self) -> Dict[str, any]:
+        """Liveness and readiness by dependency, from cached probe results
+        
+        Ready means new visits can be recorded: the session store and
+        Deepgram answered their last probe and the SOAP queue has room.
+        Gemini being down only delays notes (jobs are retried), so it marks
+        the service degraded rather than not ready.
+        """
+        deepgram = self.health.result('deepgram')
+        deepgram['connections'] = len(self.deepgram_service.connections)
+        soap_jobs = self.soap_jobs.stats()
+        dependencies = {
+            'deepgram': deepgram,
+            'gemini': self.health.result('gemini'),
+            'session_store': self.health.result('session_store'),
+            'soap_queue': {
+                'ok': soap_jobs['queued'] < soap_jobs['max_queued'],
+                'queued': soap_jobs['queued'],
+                'running': soap_jobs['running'],
+                'max_queued': soap_jobs['max_queued']
+            }
+        }
+        ready = all(dependencies[name]['ok'] for name in ('deepgram', 'session_store', 'soap_queue'))
+        if not ready:
+            status = "unhealthy"
+        elif dependencies['gemini']['ok']:
+            status = "healthy"
+        else:
+            status = "degraded"
+        return {"status": status, "live": True, "ready": ready, "dependencies": dependencies}
+    
+    def _emit(self, event: str, data: dict) -> None:
+        """Send a session event to the clients in that session's room
+        
+        With a message queue configured this also reaches clients connected
+        to other server processes.
+        """
+        if self.socketio:
+            self.socketio.emit(event, data, to=session_room(data['session_id']))
+    
+    def create_session(self, session_id: str, sid: Optional[str] = None) -> RecordingSession:
+        """Create a new recording session, attached to socket `sid` if given"""
         session = RecordingSession(
             session_id=session_id,
             is_recording=False,
-            transcript="",
             soap_note="",
             status=SessionStatus.READY
         )
-        self.sessions[session_id] = session
+        self.sessions.save(session)
+        self._recording_ids.discard(session_id)
+        self.lifecycle.track(session_id, sid)
+        if Config.TRACE_ENABLED:
+            self.tracer.start_trace(session_id)
         return session
     
-    def start_recording(self, session_id: str) -> Dict[str, any]:
-        """Start recording for a session using streaming transcription"""
+    def open_session(self, session_id: str, sid: Optional[str] = None) -> RecordingSession:
+        """Resume a recording interrupted by a restart, or create a new session"""
+        session = self.get_session(session_id)
+        if session and session.is_recording and not self.deepgram_service.is_streaming(session_id):
+            self.lifecycle.track(session_id, sid)
+            logger.info("Resuming interrupted recording", extra={'session_id': session_id, 'last_seq': session.last_seq})
+            return session
+        return self.create_session(session_id, sid)
+    
+    def recover_sessions(self) -> Dict[str, int]:
+        """Pick up visits a previous run left recording or generating
+        
+        With SESSION_RECOVERY=resume an interrupted recording is left open
+        so the client can continue it with start_recording; if nobody does
+        within the disconnect grace period the lifecycle manager stops it
+        and queues its note. Everything else is finalized now by generating
+        the SOAP note from the persisted transcript.
+        """
+        counts = {'resumable': 0, 'finalized': 0, 'failed': 0}
+        for session in self.sessions.interrupted_sessions():
+            session_id = session.session_id
+            if Config.TRACE_ENABLED:
+                self.tracer.start_trace(session_id, recovered=True)
+            if session.is_recording and Config.SESSION_RECOVERY == 'resume':
+                self.lifecycle.track(session_id, orphaned=True)
+                self._recording_ids.add(session_id)
+                counts['resumable'] += 1
+                continue
+            
+            self.lifecycle.track(session_id)
+            session.is_recording = False
+            session.status = SessionStatus.PROCESSING
+            self.sessions.save(session)
+            submitted = self.submit_soap_job(session_id)
+            if submitted['success']:
+                counts['finalized'] += 1
+            else:
+                session.status = SessionStatus.ERROR
+                session.error_message = f"Interrupted by a restart: {submitted['error']}"
+                self.sessions.save(session)
+                counts['failed'] += 1
+        
+        if any(counts.values()):
+            logger.info("Recovered interrupted sessions", extra=counts)
+        return counts
+    
+    def start_recording(self, session_id: str, audio_format: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+        """Start recording for a session using streaming transcription
+        
+        audio_format may carry the client's 'sample_rate' and a requested
+        'encoding'; the negotiated stream format is returned to the caller.
+        """
         session = self.get_session(session_id)
         if not session:
             return {"success": False, "error": "Session not found"}
         
+        audio_format = audio_format or {}
+        stream_format = negotiate_audio_format(
+            audio_format.get('encoding'),
+            audio_format.get('sample_rate'),
+            default_encoding=Config.AUDIO_ENCODING,
+            target_sample_rate=Config.AUDIO_TARGET_SAMPLE_RATE,
+            default_input_sample_rate=Config.AUDIO_INPUT_SAMPLE_RATE
+        )
+        
         # Define callback for streaming transcripts
         def on_transcript_received(transcript_data):
             """Callback when new transcript is received from streaming"""
             # Handle both old format (string) and new format (dict) for backward compatibility
             if isinstance(transcript_data, dict):
-                transcript_chunk = transcript_data.get('formatted_text', '')
-                full_transcript = transcript_data.get('full_transcript', '')
-                speaker = transcript_data.get('speaker')
                 raw_text = transcript_data.get('text', '')
+                speaker = transcript_data.get('speaker')
+                start = transcript_data.get('start')
+                end = transcript_data.get('end')
+                confidence = transcript_data.get('confidence')
+                received_at = transcript_data.get('received_at')
             else:
                 # Legacy format support
-                transcript_chunk = transcript_data
-                full_transcript = session.transcript + " " + transcript_chunk
-                speaker = None
                 raw_text = transcript_data
+                speaker = start = end = confidence = received_at = None
             
-            session.transcript = full_transcript.strip()
-            print(f"Updated session transcript: {len(session.transcript)} characters")
+            if not raw_text.strip():
+                return
             
-            # Emit real-time transcript update to frontend with speaker info
-            if self.socketio and transcript_chunk.strip():
-                self.socketio.emit('live_transcription', {
-                    'session_id': session_id,
-                    'transcript_chunk': transcript_chunk.strip(),
-                    'raw_text': raw_text.strip(),
-                    'speaker': speaker,
-                    'full_transcript': session.transcript
-                })
+            segment = session.segments.append(raw_text.strip(), speaker, start, end, confidence)
+            self.sessions.save(session)
+            logger.debug("Added transcript segment", extra={'session_id': session_id, 'seq': segment.seq})
+            
+            if self.soap_drafter:
+                self.soap_drafter.note_segment(session)
+            
+            # Emit only the new numbered segment; clients rebuild the transcript
+            # locally and use resync_transcript to fill any gaps
+            self._emit('live_transcription', {
+                'session_id': session_id,
+                'seq': segment.seq,
+                'transcript_chunk': segment.formatted_text,
+                'raw_text': segment.text,
+                'speaker': segment.speaker
+            })
+            if received_at is not None:
+                elapsed = time.monotonic() - received_at
+                TRANSCRIPT_TO_EMIT.observe(elapsed)
+                now = time.time()
+                self.tracer.record_span(
+                    session_id, "transcript.segment", now - elapsed, now,
+                    bulk=True,
+                    seq=segment.seq,
+                    speaker=segment.speaker,
+                    audio_start=segment.start,
+                    audio_end=segment.end,
+                    confidence=segment.confidence
+                )
+        
+        def on_audio_backpressure(paused):
+            """Callback when the session's audio send queue fills up or drains"""
+            self._emit('audio_backpressure', {
+                'session_id': session_id,
+                'paused': paused
+            })
+        
+        def on_connection_state(state):
+            """Callback when the Deepgram connection drops, recovers or is given up on"""
+            self._emit('transcription_connection', {
+                'session_id': session_id,
+                'state': state
+            })
         
         # Start Deepgram streaming session
-        streaming_started = self.deepgram_service.start_streaming_session(
-            session_id, 
-            on_transcript_received
-        )
+        with self.tracer.span(session_id, "start_recording",
+                              encoding=stream_format.encoding,
+                              sample_rate=stream_format.sample_rate) as span:
+            streaming_started = self.deepgram_service.start_streaming_session(
+                session_id, 
+                on_transcript_received,
+                stream_format,
+                on_audio_backpressure,
+                on_connection_state
+            )
+            if span:
+                span.attributes['success'] = streaming_started
         
         if streaming_started:
             session.is_recording = True
             session.status = SessionStatus.RECORDING
-            print(f"Started streaming recording for session: {session_id}")
-            return {"success": True}
+            self.sessions.save(session)
+            self._recording_ids.add(session_id)
+            if self.audio_archive:
+                self._start_audio_archive(session_id, stream_format)
+            logger.info("Started streaming recording", extra={'session_id': session_id})
+            return {"success": True, "audio_format": stream_format.to_dict()}
         else:
             return {"success": False, "error": "Failed to start streaming session"}
     
-    def add_audio_chunk(self, session_id: str, audio_data: str) -> Dict[str, any]:
-        """Send PCM audio chunk to streaming transcription"""
+    def add_audio_chunk(self, session_id: str, audio_data: Union[bytes, bytearray, memoryview, str],
+                        received_at: Optional[float] = None) -> Dict[str, any]:
+        """Send PCM audio chunk to streaming transcription
+        
+        Binary Socket.IO attachments are forwarded as-is; base64 strings
+        (optionally data URLs) are still accepted from older clients.
+        received_at (time.monotonic()) marks when the chunk reached the server.
+        """
         session = self.get_session(session_id)
         if not session or not session.is_recording:
             return {"success": False, "error": "Session not recording"}
         
         try:
-            # Decode the base64 PCM audio data
-            audio_bytes = base64.b64decode(audio_data.split(',')[1] if ',' in audio_data else audio_data)
+            if isinstance(audio_data, (bytes, bytearray, memoryview)):
+                audio_bytes = audio_data
+            else:
+                audio_bytes = self._decode_base64_audio(audio_data)
             
-            print(f"Sending PCM chunk to streaming: {len(audio_bytes)} bytes")
+            if logger.isEnabledFor(logging.DEBUG) and _audio_chunk_log_sampler():
+                logger.debug("Sending PCM chunk to streaming", extra={
+                    'session_id': session_id,
+                    'bytes': len(audio_bytes),
+                    'sample_every': _audio_chunk_log_sampler.every
+                })
+            
+            if self.audio_archive:
+                self.audio_archive.write(session_id, audio_bytes)
             
             # Send raw PCM bytes to streaming connection
-            success = self.deepgram_service.send_audio_chunk_to_stream(session_id, audio_bytes)
+            success = self.deepgram_service.send_audio_chunk_to_stream(session_id, audio_bytes, received_at)
             
             if success:
-                return {
-                    "success": True,
-                    "total_transcript": session.transcript
-                }
+                return {"success": True}
             else:
                 return {"success": False, "error": "Failed to send audio to streaming"}
             
         except Exception as e:
-            print(f"Error processing PCM audio chunk: {e}")
+            logger.error("Error processing PCM audio chunk: %s", e, extra={'session_id': session_id})
             return {"success": False, "error": str(e)}
     
+    def _start_audio_archive(self, session_id: str, stream_format) -> None:
+        """Archive the session's input audio; a failure here never stops the recording"""
+        try:
+            self.audio_archive.start_session(session_id, stream_format.input_sample_rate, stream_format.channels)
+        except Exception:
+            logger.exception("Could not start audio archive", extra={'session_id': session_id})
+    
+    def get_audio_archive_stats(self) -> Optional[Dict[str, any]]:
+        return self.audio_archive.stats() if self.audio_archive else None
+    
+    @staticmethod
+    def _decode_base64_audio(audio_data: str) -> bytes:
+        """Decode a base64 PCM chunk, stripping any data URL prefix"""
+        comma = audio_data.find(',')
+        return base64.b64decode(audio_data[comma + 1:] if comma != -1 else audio_data)
+    
+    def get_audio_queue_stats(self, session_id: Optional[str] = None):
+        """Audio send queue metrics for one session, or all active sessions"""
+        if session_id is None:
+            return self.deepgram_service.get_all_send_queue_stats()
+        return self.deepgram_service.get_send_queue_stats(session_id)
+    
     def stop_recording(self, session_id: str) -> Dict[str, any]:
         """Stop recording and streaming session"""
         session = self.get_session(session_id)
         if not session:
             return {"success": False, "error": "Session not found"}
         
-        session.is_recording = False
-        session.status = SessionStatus.PROCESSING
-        
-        # Stop streaming session and get final transcript
-        final_transcript = self.deepgram_service.stop_streaming_session(session_id)
-        if final_transcript:
-            session.transcript = final_transcript.strip()
+        with self.tracer.span(session_id, "stop_recording", segments=len(session.segments)):
+            session.is_recording = False
+            session.status = SessionStatus.PROCESSING
+            self.sessions.save(session)
+            self._recording_ids.discard(session_id)
+            
+            # Stop streaming session; segments were already stored as they arrived
+            self.deepgram_service.stop_streaming_session(session_id)
+            if self.audio_archive:
+                self.audio_archive.stop_session(session_id)
+            if self.soap_drafter:
+                self.soap_drafter.stop_session(session_id)
         
-        print(f"Recording stopped for session: {session_id}")
-        print(f"Final transcript length: {len(session.transcript)} characters")
+        logger.info("Recording stopped", extra={'session_id': session_id, 'segments': len(session.segments)})
         
         return {
             "success": True, 
@@ -129,45 +413,297 @@ class MedicalScribeService:
         if not session:
             return SOAPNoteResult(success=False, error="Session not found")
         
-        if not session.transcript.strip():
+        if not len(session.segments):
             return SOAPNoteResult(success=False, error="No transcript available for SOAP note generation")
         
         session.status = SessionStatus.PROCESSING
+        self.sessions.save(session)
         
         try:
-            print(f"Generating SOAP note for {len(session.transcript)} characters of transcript")
-            result = self.gemini_service.generate_soap_note(session.transcript)
+            logger.info("Generating SOAP note", extra={'session_id': session_id, 'segments': len(session.segments)})
+            transcript = self._prepare_transcript(session.segments, session_id)
+            result = self.gemini_service.generate_soap_note(transcript, session_id=session_id)
+        except Exception as e:
+            result = SOAPNoteResult(success=False, error=f"Error generating SOAP note: {str(e)}")
+        
+        self._apply_soap_result(session, result)
+        return result
+    
+    def _apply_soap_result(self, session: RecordingSession, result: SOAPNoteResult) -> None:
+        """Store the outcome of SOAP generation on the session"""
+        if result.success:
+            session.soap_note = result.soap_note
+            session.status = SessionStatus.COMPLETED
+            session.error_message = None
+            logger.info("SOAP note generated", extra={'session_id': session.session_id})
+        else:
+            session.status = SessionStatus.ERROR
+            session.error_message = result.error
+            logger.warning("SOAP note generation failed: %s", result.error,
+                           extra={'session_id': session.session_id, 'error_type': result.error_type})
+        self.sessions.save(session)
+    
+    def submit_soap_job(self, session_id: str) -> Dict[str, any]:
+        """Queue SOAP generation for a session's transcript
+        
+        Resubmitting an unchanged transcript returns the existing job rather
+        than calling the LLM again.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return {"success": False, "error": "Session not found"}
+        
+        if not len(session.segments):
+            return {"success": False, "error": "No transcript available for SOAP note generation"}
+        
+        dedup_key = hashlib.sha256(f"{session_id}\0{session.transcript}".encode()).hexdigest()
+        job = self.soap_jobs.submit(session_id, dedup_key)
+        if job is None:
+            return {"success": False, "error": "SOAP generation queue is full, please retry shortly"}
+        
+        # stop_recording marked the session as processing; a deduplicated job
+        # that already finished will not run again to reset it
+        if job.status == SoapJobStatus.COMPLETED and session.soap_note:
+            session.status = SessionStatus.COMPLETED
+            self.sessions.save(session)
+        
+        return {"success": True, "job": job}
+    
+    def get_soap_job(self, job_id: Optional[str] = None, session_id: Optional[str] = None) -> Optional[SoapJob]:
+        """Look up a SOAP job by ID, or the latest job for a session"""
+        if job_id:
+            return self.soap_jobs.get(job_id)
+        if session_id:
+            return self.soap_jobs.get_for_session(session_id)
+        return None
+    
+    def _run_soap_job(self, job: SoapJob) -> SOAPNoteResult:
+        """One SOAP generation attempt, run on a queue worker"""
+        session = self.get_session(job.session_id)
+        if not session:
+            return SOAPNoteResult(success=False, error="Session not found")
+        
+        session.status = SessionStatus.PROCESSING
+        self.sessions.save(session)
+        on_chunk = self._soap_chunk_publisher(job) if Config.SOAP_STREAMING else None
+        
+        with self.tracer.span(job.session_id, "soap.attempt", job_id=job.job_id, attempt=job.attempts) as span:
+            result = self._generate_for_job(job, session, on_chunk)
+            if span:
+                span.end(error=result.error, error_type=result.error_type)
+        return result
+    
+    def _generate_for_job(self, job: SoapJob, session: RecordingSession, on_chunk) -> SOAPNoteResult:
+        # With a rolling draft only the segments it has not seen yet are sent
+        if self.soap_drafter and session.soap_draft_seq:
+            delta = session.segments.since(session.soap_draft_seq)
+            logger.info("Merging final transcript segments into the SOAP draft", extra={
+                'session_id': job.session_id, 'segments': len(delta), 'attempt': job.attempts})
+            # A drafter that fell behind leaves more than one prompt's worth; fold it
+            # in max_delta_tokens at a time, saving each step so a retry resumes there
+            max_tokens = self.soap_drafter.max_delta_tokens
+            while estimate_tokens(delta) > max_tokens:
+                piece = take_within_budget(delta, max_tokens)
+                result = self.gemini_service.update_soap_draft(
+                    session.soap_draft, self._prepare_transcript(piece, job.session_id))
+                if not result.success:
+                    return result
+                session.soap_draft = result.soap_note
+                session.soap_draft_seq = piece[-1].seq
+                self.sessions.save(session)
+                delta = delta[len(piece):]
+            return self.gemini_service.update_soap_draft(
+                session.soap_draft, self._prepare_transcript(delta, job.session_id), final=True, on_chunk=on_chunk)
+        
+        logger.info("Generating SOAP note", extra={
+            'session_id': job.session_id, 'segments': len(session.segments), 'attempt': job.attempts})
+        transcript = self._prepare_transcript(session.segments, job.session_id)
+        return self.gemini_service.generate_soap_note(transcript, on_chunk, job.session_id)
+    
+    def _prepare_transcript(self, segments: Sequence[TranscriptSegment], session_id: str):
+        """Transcript as it should go into a SOAP prompt, preprocessed unless disabled"""
+        raw_tokens = estimate_tokens(segments)
+        PROMPT_TRANSCRIPT_TOKENS.labels('raw').inc(raw_tokens)
+        if not Config.SOAP_PREPROCESS_TRANSCRIPT:
+            PROMPT_TRANSCRIPT_TOKENS.labels('sent').inc(raw_tokens)
+            return segments
+        
+        started = time.perf_counter()
+        # Merged turns must stay small enough for the chunked SOAP path to split
+        transcript = preprocess_transcript(segments, self.gemini_service.chunk_tokens)
+        tokens = estimate_tokens(transcript)
+        PROMPT_TRANSCRIPT_TOKENS.labels('sent').inc(tokens)
+        logger.info("Transcript preprocessed", extra={
+            'session_id': session_id, 'segments': len(segments), 'turns': len(transcript),
+            'tokens_before': raw_tokens, 'tokens_after': tokens,
+            'reduction_pct': round(100 * (1 - tokens / raw_tokens), 1) if raw_tokens else 0.0,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2)})
+        return transcript
+    
+    def _soap_chunk_publisher(self, job: SoapJob):
+        """Callback that emits each streamed chunk with its S/O/A/P section"""
+        tracker = SoapSectionTracker()
+        attempt = job.attempts
+        
+        def on_chunk(text: str) -> None:
+            now = time.time()
+            new_sections = tracker.feed(text)
+            if job.first_token_at is None:
+                job.first_token_at = now
+            if new_sections and job.first_section_at is None:
+                job.first_section_at = now
             
+            self._emit('soap_note_partial', {
+                'session_id': job.session_id,
+                'job_id': job.job_id,
+                'attempt': attempt,
+                'chunk': text,
+                'section': tracker.current,
+                'new_sections': new_sections,
+                'sections_completed': tracker.completed
+            })
+        
+        return on_chunk
+    
+    def _on_soap_job_update(self, job: SoapJob, result: Optional[SOAPNoteResult]) -> None:
+        """Record finished jobs on the session and publish job progress"""
+        if result is not None:
+            session = self.get_session(job.session_id)
+            if session:
+                self._apply_soap_result(session, result)
+            self._trace_soap_job(job, result)
             if result.success:
-                session.soap_note = result.soap_note
-                session.status = SessionStatus.COMPLETED
-                print("SOAP note generated successfully")
+                STOP_TO_SOAP_TIMER.finish(job.session_id)
             else:
-                session.status = SessionStatus.ERROR
-                print(f"SOAP note generation failed: {result.error}")
-            
-            return result
-            
-        except Exception as e:
-            session.status = SessionStatus.ERROR
-            error_msg = f"Error generating SOAP note: {str(e)}"
-            print(error_msg)
-            return SOAPNoteResult(success=False, error=error_msg)
+                STOP_TO_SOAP_TIMER.cancel(job.session_id)
+        
+        if not self.socketio:
+            return
+        
+        self._emit('soap_job_status', job.to_dict())
+        if result is None:
+            return
+        
+        if result.success:
+            self._emit('soap_note_complete', {
+                'session_id': job.session_id,
+                'job_id': job.job_id,
+                'soap_note': result.soap_note,
+                'status': 'SOAP note generated successfully'
+            })
+        else:
+            self._emit('soap_generation_error', {
+                'session_id': job.session_id,
+                'job_id': job.job_id,
+                'error': result.error
+            })
+    
+    def _trace_soap_job(self, job: SoapJob, result: SOAPNoteResult) -> None:
+        """Record the finished job and close the visit trace"""
+        job_data = job.to_dict()
+        self.tracer.record_span(
+            job.session_id, "soap.generation", job.created_at, job.finished_at or time.time(),
+            error=result.error,
+            job_id=job.job_id,
+            attempts=job.attempts,
+            status=job.status.value,
+            error_type=job.error_type,
+            time_to_first_token=job_data['time_to_first_token'],
+            time_to_first_section=job_data['time_to_first_section']
+        )
+        self.tracer.finish_trace(job.session_id, error=result.error)
+    
+    def _on_soap_draft_update(self, session: RecordingSession) -> None:
+        """Publish the running draft so clients can show it during the visit"""
+        self._emit('soap_draft_updated', {
+            'session_id': session.session_id,
+            'soap_draft': session.soap_draft,
+            'soap_draft_seq': session.soap_draft_seq
+        })
+    
+    def acknowledge_transcript(self, session_id: str, seq: int) -> Dict[str, any]:
+        """Record the last transcript segment the client has received"""
+        session = self.get_session(session_id)
+        if not session:
+            return {"success": False, "error": "Session not found"}
+        
+        acked_seq = session.acknowledge(seq)
+        self.sessions.save(session)
+        return {"success": True, "acked_seq": acked_seq}
+    
+    def get_transcript_delta(self, session_id: str, since_seq: Optional[int] = None) -> Dict[str, any]:
+        """Return the transcript segments a client is missing
+        
+        Defaults to everything after the last acknowledged segment, which is
+        what a reconnecting client needs to catch up.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return {"success": False, "error": "Session not found"}
+        
+        if since_seq is None:
+            since_seq = session.acked_seq
+        
+        return {
+            "success": True,
+            "session_id": session_id,
+            "segments": session.segments.to_list(since_seq),
+            "last_seq": session.last_seq,
+            "acked_seq": session.acked_seq
+        }
+    
+    def list_sessions(self, status: Optional[str] = None, offset: int = 0, limit: int = 50) -> Dict[str, any]:
+        """One page of session summaries, optionally filtered by status"""
+        sessions, total = self.sessions.list_sessions(status, offset, limit)
+        return {
+            "sessions": [session.to_summary_dict() for session in sessions],
+            "total": total,
+            "offset": offset,
+            "limit": limit
+        }
     
     def get_session(self, session_id: str) -> RecordingSession:
         """Get session by ID"""
         return self.sessions.get(session_id)
     
-    def cleanup_session(self, session_id: str) -> bool:
-        """Clean up session resources"""
+    def purge_soap_cache(self, session_id: str) -> int:
+        """Drop cached SOAP notes produced for a session"""
+        cache = self.gemini_service.cache
+        return cache.purge_session(session_id) if cache else 0
+    
+    def get_session_store_stats(self) -> Optional[Dict[str, any]]:
+        return self.sessions.stats()
+    
+    def get_soap_cache_stats(self) -> Optional[Dict[str, any]]:
+        cache = self.gemini_service.cache
+        return cache.stats() if cache else None
+    
+    def cleanup_session(self, session_id: str, delete: bool = True) -> bool:
+        """Clean up session resources
+        
+        With delete=False the stored session is kept and only this
+        process's copy and per-session state are released.
+        """
         try:
             # Stop streaming session if still active
             self.deepgram_service.stop_streaming_session(session_id)
+            if self.audio_archive:
+                self.audio_archive.stop_session(session_id)
             
-            if session_id in self.sessions:
-                del self.sessions[session_id]
-            print(f"Session {session_id} cleaned up")
+            if delete:
+                self.sessions.delete(session_id)
+            else:
+                self.sessions.unload(session_id)
+            self.soap_jobs.forget_session(session_id)
+            if self.soap_drafter:
+                self.soap_drafter.stop_session(session_id)
+            self.purge_soap_cache(session_id)
+            STOP_TO_SOAP_TIMER.cancel(session_id)
+            self._recording_ids.discard(session_id)
+            self.tracer.finish_trace(session_id)
+            self.lifecycle.forget(session_id)
+            logger.info("Session cleaned up", extra={'session_id': session_id})
             return True
-        except Exception as e:
-            print(f"Error cleaning up session: {e}")
+        except Exception:
+            logger.exception("Error cleaning up session %s", session_id)
             return False 
\ No newline at end of file
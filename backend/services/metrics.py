@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Dict, Optional
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Metrics live in their own registry so /metrics only shows the scribe pipeline
+REGISTRY = CollectorRegistry()
+
+# Sub-second buckets for the streaming path, longer ones for LLM calls
+_STREAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+AUDIO_CHUNK_TO_SEND = Histogram(
+    'scribe_audio_chunk_to_send_seconds',
+    'Time from audio_chunk receipt to the packet containing it being sent to Deepgram',
+    buckets=_STREAM_BUCKETS, registry=REGISTRY)
+TRANSCRIPT_TO_EMIT = Histogram(
+    'scribe_transcript_to_emit_seconds',
+    'Time from a final Deepgram result to the live_transcription emit',
+    buckets=_STREAM_BUCKETS, registry=REGISTRY)
+STOP_TO_SOAP_NOTE = Histogram(
+    'scribe_stop_to_soap_note_seconds',
+    'Time from stop_recording to soap_note_complete',
+    buckets=_LLM_BUCKETS, registry=REGISTRY)
+GEMINI_REQUEST = Histogram(
+    'scribe_gemini_request_seconds',
+    'Gemini API call duration',
+    ['operation', 'model', 'outcome'], buckets=_LLM_BUCKETS, registry=REGISTRY)
+GEMINI_HEDGES = Counter(
+    'scribe_gemini_hedges_total',
+    'Hedged second Gemini requests, by which of the two answered first',
+    ['winner'], registry=REGISTRY)
+
+GEMINI_ERRORS = Counter(
+    'scribe_gemini_errors_total',
+    'Gemini API errors by error class',
+    ['error_type'], registry=REGISTRY)
+DEEPGRAM_RECONNECTS = Counter(
+    'scribe_deepgram_reconnects_total',
+    'Deepgram live connections re-established or given up on',
+    ['outcome'], registry=REGISTRY)
+SESSIONS_REAPED = Counter(
+    'scribe_sessions_reaped_total',
+    'Sessions stopped or cleaned up by the lifecycle manager',
+    ['reason'], registry=REGISTRY)
+PROMPT_TRANSCRIPT_TOKENS = Counter(
+    'scribe_prompt_transcript_tokens_total',
+    'Estimated transcript tokens sent for SOAP generation, before and after preprocessing',
+    ['stage'], registry=REGISTRY)
+SOCKET_EVENTS = Counter(
+    'scribe_socket_events_total',
+    'Socket.IO events received',
+    ['event'], registry=REGISTRY)
+
+ACTIVE_SESSIONS = Gauge(
+    'scribe_active_sessions', 'Sessions currently recording', registry=REGISTRY)
+DEEPGRAM_CONNECTIONS = Gauge(
+    'scribe_deepgram_connections', 'Open Deepgram live connections', registry=REGISTRY)
+AUDIO_QUEUE_DEPTH = Gauge(
+    'scribe_audio_send_queue_bytes', 'Audio queued for Deepgram across all sessions', registry=REGISTRY)
+SOAP_QUEUE_DEPTH = Gauge(
+    'scribe_soap_jobs_queued', 'SOAP jobs waiting for a worker (including retry backoff)', registry=REGISTRY)
+SOAP_JOBS_RUNNING = Gauge(
+    'scribe_soap_jobs_running', 'SOAP jobs currently being generated', registry=REGISTRY)
+
+class PendingTimer:
+    """Times operations that start and finish in different places, keyed by ID"""
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self._started: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def start(self, key: str) -> None:
+        with self._lock:
+            self._started[key] = time.monotonic()
+
+    def finish(self, key: str) -> Optional[float]:
+        """Observe the elapsed time since start(key), if it was started"""
+        with self._lock:
+            started = self._started.pop(key, None)
+        if started is None:
+            return None
+        elapsed = time.monotonic() - started
+        self.histogram.observe(elapsed)
+        return elapsed
+
+    def cancel(self, key: str) -> None:
+        with self._lock:
+            self._started.pop(key, None)
+
+STOP_TO_SOAP_TIMER = PendingTimer(STOP_TO_SOAP_NOTE)
+
+def render_metrics():
+    """Exposition body and content type for the /metrics endpoint"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,215 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from models.responses import SOAPNoteResult
+
+@dataclass(frozen=True)
+class ModelTarget:
+    """A Gemini model, optionally served from a non-default API endpoint"""
+    model: str
+    endpoint: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.model}@{self.endpoint}" if self.endpoint else self.model
+
+def parse_model_routes(spec: str) -> List[Tuple[str, int]]:
+    """Parse 'model:max_prompt_tokens,...' into (model, max_prompt_tokens) tiers"""
+    routes = []
+    for entry in spec.split(','):
+        if not entry.strip():
+            continue
+        model, _, max_tokens = entry.strip().rpartition(':')
+        if not model or not max_tokens.isdigit():
+            raise ValueError(f"Invalid model route {entry!r}, expected 'model:max_prompt_tokens'")
+        routes.append((model, int(max_tokens)))
+    return routes
+
+class HedgeLost(Exception):
+    """Raised into the slower of two hedged requests to stop it streaming"""
+
+class _ModelStats:
+    def __init__(self, window: int):
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.hedges_launched = 0
+        self.hedges_won = 0
+        # Recent successful latencies per operation: time to first output, total
+        self.first_output: Dict[str, deque] = {}
+        self.total: Dict[str, deque] = {}
+        self._window = window
+
+    def samples(self, table: Dict[str, deque], operation: str) -> deque:
+        if operation not in table:
+            table[operation] = deque(maxlen=self._window)
+        return table[operation]
+
+def _percentile(samples: Sequence[float], percentile: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+class ModelRouter:
+    """Chooses the Gemini model for a prompt and when to hedge it
+
+    Prompts go to the first route whose max_prompt_tokens they fit in, or to
+    default_model. When a hedge target is configured and a request has not
+    produced any output by the route's recent hedge_percentile latency for
+    that operation (initial_deadline until min_samples have been seen), a
+    second request is sent to the hedge target and whichever answers first
+    is used.
+    """
+
+    def __init__(self, default_model: str, routes: Sequence[Tuple[str, int]] = (),
+                 hedge: Optional[ModelTarget] = None, hedge_percentile: float = 95.0,
+                 min_samples: int = 20, initial_deadline: float = 10.0, window: int = 200):
+        self.default = ModelTarget(default_model)
+        self.routes = [(ModelTarget(model), max_tokens) for model, max_tokens in routes]
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.initial_deadline = initial_deadline
+        self._window = window
+        self._stats: Dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def describe(self) -> str:
+        """Routing table as text, e.g. for cache keys"""
+        return ",".join([f"{target.model}:{max_tokens}" for target, max_tokens in self.routes] + [self.default.model])
+
+    def route(self, prompt_tokens: int) -> ModelTarget:
+        for target, max_tokens in self.routes:
+            if prompt_tokens <= max_tokens:
+                return target
+        return self.default
+
+    def hedge_for(self, target: ModelTarget) -> Optional[ModelTarget]:
+        """Where to send a hedge of a request to target, if anywhere"""
+        if self.hedge is None:
+            return None
+        # GEMINI_HEDGE_URL alone means the same model at the alternate endpoint
+        hedge = ModelTarget(self.hedge.model or target.model, self.hedge.endpoint)
+        return hedge if hedge != target else None
+
+    def hedge_deadline(self, target: ModelTarget, operation: str) -> float:
+        """Seconds to wait for the first output of a request before hedging it"""
+        with self._lock:
+            stats = self._stats.get(target.label)
+            samples = list(stats.first_output.get(operation, ())) if stats else []
+        if len(samples) < self.min_samples:
+            return self.initial_deadline
+        return _percentile(samples, self.hedge_percentile)
+
+    def record(self, target: ModelTarget, operation: str, result: SOAPNoteResult,
+               first_output: Optional[float], total: float, cancelled: bool = False) -> None:
+        with self._lock:
+            stats = self._model_stats(target)
+            stats.requests += 1
+            if cancelled:
+                stats.cancelled += 1
+            elif not result.success:
+                stats.errors += 1
+            else:
+                stats.samples(stats.first_output, operation).append(first_output if first_output is not None else total)
+                stats.samples(stats.total, operation).append(total)
+
+    def record_hedge(self, hedge: ModelTarget, won: bool) -> None:
+        with self._lock:
+            stats = self._model_stats(hedge)
+            stats.hedges_launched += 1
+            stats.hedges_won += won
+
+    def stats(self) -> dict:
+        """Per-model request counts, hedges and latency percentiles (ms) by operation"""
+        with self._lock:
+            models = {}
+            for label, stats in self._stats.items():
+                operations = {}
+                for operation, totals in stats.total.items():
+                    first_output = stats.first_output[operation]
+                    operations[operation] = {
+                        'samples': len(totals),
+                        'first_output_p50_ms': _ms(_percentile(first_output, 50)),
+                        'first_output_p95_ms': _ms(_percentile(first_output, 95)),
+                        'total_p50_ms': _ms(_percentile(totals, 50)),
+                        'total_p95_ms': _ms(_percentile(totals, 95)),
+                        'total_p99_ms': _ms(_percentile(totals, 99)),
+                    }
+                models[label] = {
+                    'requests': stats.requests,
+                    'errors': stats.errors,
+                    'cancelled': stats.cancelled,
+                    'hedges_launched': stats.hedges_launched,
+                    'hedges_won': stats.hedges_won,
+                    'operations': operations,
+                }
+        return {
+            'routes': [{'model': target.label, 'max_prompt_tokens': max_tokens} for target, max_tokens in self.routes],
+            'default': self.default.label,
+            'hedge': self.hedge and {'model': self.hedge.model or None, 'endpoint': self.hedge.endpoint,
+                                     'percentile': self.hedge_percentile},
+            'models': models,
+        }
+
+    def _model_stats(self, target: ModelTarget) -> _ModelStats:
+        if target.label not in self._stats:
+            self._stats[target.label] = _ModelStats(self._window)
+        return self._stats[target.label]
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+class HedgedCall:
+    """First-output-wins race between a request and its hedge
+
+    An attempt wins when it streams its first chunk (or, unstreamed, when it
+    succeeds). Only the winner's chunks reach on_chunk; the loser gets
+    HedgeLost raised from its next chunk, which ends its stream. An
+    unstreamed loser cannot be interrupted and its result is discarded.
+    """
+
+    def __init__(self, on_chunk: Optional[Callable[[str], None]]):
+        self._on_chunk = on_chunk
+        self._condition = threading.Condition()
+        self.winner: Optional[str] = None
+        self._results: Dict[str, SOAPNoteResult] = {}
+
+    def forward(self, name: str) -> Optional[Callable[[str], None]]:
+        """on_chunk for one attempt (None when the call is not streamed)"""
+        if self._on_chunk is None:
+            return None
+
+        def on_chunk(text: str) -> None:
+            if not self._claim(name):
+                raise HedgeLost()
+            self._on_chunk(text)
+        return on_chunk
+
+    def finish(self, name: str, result: SOAPNoteResult) -> None:
+        with self._condition:
+            self._results[name] = result
+            if result.success and self.winner is None:
+                self.winner = name
+            self._condition.notify_all()
+
+    def wait_for_output(self, name: str, timeout: float) -> bool:
+        """Wait until some attempt has produced output or name has finished"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.winner or name in self._results, timeout)
+
+    def result(self, names: Sequence[str]) -> SOAPNoteResult:
+        """The winner's result, or the first attempt's failure if none won"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.winner in self._results or
+                                     all(name in self._results for name in names))
+            return self._results.get(self.winner) or self._results[names[0]]
+
+    def _claim(self, name: str) -> bool:
+        with self._condition:
+            if self.winner is None:
+                self.winner = name
+                self._condition.notify_all()
+            return self.winner == name
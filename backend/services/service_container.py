@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+class ServiceContainer:
+    """Shared clients built once, on first use
+
+    Each entry is registered with a zero-argument factory; get() runs it the
+    first time anyone asks (a route, a socket handler, a worker thread) and
+    returns the same object from then on. Factories may get() other entries.
+    Nothing is built at import time, so the server starts without paying
+    for SDKs it has not needed yet; warm_up() builds them in the background
+    once it is serving.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._build_ms: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._build_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+                logger.info("Initialized %s", name, extra={'duration_ms': self._build_ms[name]})
+            return self._instances[name]
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Build entries (all by default) on a background thread"""
+        names = list(names if names is not None else self._factories)
+
+        def build():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    # get() will try again, and raise, on first real use
+                    logger.warning("Could not initialize %s: %s", name, e)
+
+        thread = threading.Thread(target=build, name="service-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: {'built': name in self._instances, 'build_ms': self._build_ms.get(name)}
+                    for name in self._factories}
+
+def _configure_genai():
+    # google.generativeai takes most of a second to import
+    import google.generativeai as genai
+
+    # gRPC calls block a gevent/eventlet event loop; the REST transport goes
+    # through requests, which monkey patching makes cooperative
+    use_rest = Config.GEMINI_API_URL or Config.ASYNC_MODE != 'threading'
+    genai.configure(
+        api_key=Config.GOOGLE_API_KEY,
+        transport='rest' if use_rest else None,
+        client_options={'api_endpoint': Config.GEMINI_API_URL} if Config.GEMINI_API_URL else None
+    )
+    return genai
+
+def create_deepgram_client():
+    """A new Deepgram client for the configured endpoint"""
+    from deepgram import DeepgramClient, DeepgramClientOptions
+
+    # DEEPGRAM_URL points the client at another endpoint (e.g. a local fake)
+    return DeepgramClient(
+        Config.DEEPGRAM_API_KEY,
+        DeepgramClientOptions(url=Config.DEEPGRAM_URL) if Config.DEEPGRAM_URL else None
+    )
+
+_container = None
+_container_lock = threading.Lock()
+
+def get_service_container() -> ServiceContainer:
+    """Process-wide container holding the configured Gemini SDK ('genai') and the Deepgram client"""
+    global _container
+    with _container_lock:
+        if _container is None:
+            _container = ServiceContainer()
+            _container.register('genai', _configure_genai)
+            _container.register('deepgram_client', create_deepgram_client)
+        return _container
@@ -0,0 +1,276 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Set
+from models.session import SessionStatus
+from services.metrics import SESSIONS_REAPED
+
+logger = logging.getLogger(__name__)
+
+class SessionActivity:
+    """When a session was last used and which sockets are attached to it"""
+    __slots__ = ('session_id', 'last_active', 'sids', 'disconnected_at')
+
+    def __init__(self, session_id: str, now: float):
+        self.session_id = session_id
+        self.last_active = now
+        self.sids: Set[str] = set()
+        self.disconnected_at: Optional[float] = None
+
+class SessionLifecycleManager:
+    """Maps socket SIDs to sessions and reaps sessions nobody is using
+
+    Every reap_interval seconds a background thread:
+
+    - stops the Deepgram stream of recording sessions whose sockets have all
+      been gone for disconnect_grace seconds, or that have sent no audio for
+      recording_idle_timeout, and queues their SOAP note so the visit is kept
+    - releases sessions idle for idle_timeout (never while a SOAP job for
+      them is still pending); persistent backends keep the stored copy
+    - evicts the least recently used finished sessions while the process is
+      over max_sessions or max_memory_bytes
+
+    New sessions are refused by admit() when the caps can't be met even
+    after eviction.
+    """
+
+    def __init__(self, scribe_service, idle_timeout: float = 1800, recording_idle_timeout: float = 300,
+                 disconnect_grace: float = 120, reap_interval: float = 30,
+                 max_sessions: int = 500, max_memory_bytes: int = 256 * 1024 * 1024):
+        self.scribe_service = scribe_service
+        self.idle_timeout = idle_timeout
+        self.recording_idle_timeout = recording_idle_timeout
+        self.disconnect_grace = disconnect_grace
+        self.reap_interval = reap_interval
+        self.max_sessions = max_sessions
+        self.max_memory_bytes = max_memory_bytes
+
+        self._activity: Dict[str, SessionActivity] = {}
+        self._sessions_by_sid: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._stats = {'reaped_idle': 0, 'reaped_abandoned': 0, 'stopped_idle_recording': 0,
+                       'evicted': 0, 'rejected': 0, 'reap_runs': 0}
+        self._last_reap_at: Optional[float] = None
+        self._last_reap_ms: Optional[float] = None
+        self._last_estimated_bytes = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the background reaper (once)"""
+        if self._thread is None and self.reap_interval > 0:
+            self._thread = threading.Thread(target=self._reap_loop, name="session-reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def track(self, session_id: str, sid: Optional[str] = None, orphaned: bool = False) -> None:
+        """Start tracking a new or restarted session
+
+        orphaned marks it as already disconnected, for sessions recovered
+        after a restart that no socket has claimed yet.
+        """
+        now = time.monotonic()
+        with self._lock:
+            activity = self._activity.get(session_id)
+            if activity is None:
+                activity = self._activity[session_id] = SessionActivity(session_id, now)
+            else:
+                activity.last_active = now
+            if sid:
+                self._bind(activity, sid)
+            elif orphaned and not activity.sids:
+                activity.disconnected_at = now
+
+    def touch(self, session_id: str, sid: Optional[str] = None) -> None:
+        """Mark a session as in use, attaching the socket if it is new
+
+        Called for every audio chunk, so the common case takes no lock.
+        """
+        activity = self._activity.get(session_id)
+        if activity is None:
+            return
+        activity.last_active = time.monotonic()
+        if sid and sid not in activity.sids:
+            with self._lock:
+                self._bind(activity, sid)
+
+    def _bind(self, activity: SessionActivity, sid: str) -> None:
+        activity.sids.add(sid)
+        activity.disconnected_at = None
+        self._sessions_by_sid.setdefault(sid, set()).add(activity.session_id)
+
+    def disconnect(self, sid: str) -> List[str]:
+        """Detach a socket; returns the sessions it left with no socket at all"""
+        now = time.monotonic()
+        orphaned = []
+        with self._lock:
+            for session_id in self._sessions_by_sid.pop(sid, ()):
+                activity = self._activity.get(session_id)
+                if activity is None:
+                    continue
+                activity.sids.discard(sid)
+                if not activity.sids:
+                    activity.disconnected_at = now
+                    orphaned.append(session_id)
+        return orphaned
+
+    def forget(self, session_id: str) -> None:
+        """Stop tracking a session that has been cleaned up"""
+        with self._lock:
+            activity = self._activity.pop(session_id, None)
+            if activity:
+                for sid in activity.sids:
+                    session_ids = self._sessions_by_sid.get(sid)
+                    if session_ids:
+                        session_ids.discard(session_id)
+                        if not session_ids:
+                            del self._sessions_by_sid[sid]
+
+    def admit(self, session_id: str) -> bool:
+        """Whether a new session fits under the caps, evicting if needed
+
+        The memory figure is the estimate from the last reap or eviction.
+        """
+        if session_id in self._activity:
+            return True
+        if not self._over_caps(reserve=1):
+            return True
+        evicted = self._enforce_caps(reserve=1)
+        with self._lock:
+            self._stats['evicted'] += evicted
+            if not self._over_caps(reserve=1):
+                return True
+            self._stats['rejected'] += 1
+        logger.warning("Session refused: lifecycle caps reached", extra={
+            'session_id': session_id, 'sessions': len(self._activity)})
+        return False
+
+    def _over_caps(self, reserve: int = 0) -> bool:
+        return (len(self._activity) + reserve > self.max_sessions
+                or self._last_estimated_bytes >= self.max_memory_bytes)
+
+    def reap(self) -> Dict[str, int]:
+        """Run one reaping pass and return what it did
+
+        Stopping streams and cleaning up happen outside the lock, so sockets
+        can keep attaching and detaching while a pass runs.
+        """
+        started = time.perf_counter()
+        now = time.monotonic()
+        counts = {'reaped_idle': 0, 'reaped_abandoned': 0, 'stopped_idle_recording': 0, 'evicted': 0}
+
+        with self._lock:
+            activities = list(self._activity.values())
+        for activity in activities:
+            reason = self._reap_one(activity, now)
+            if reason:
+                counts[reason] += 1
+        counts['evicted'] = self._enforce_caps()
+
+        with self._lock:
+            for reason, count in counts.items():
+                self._stats[reason] += count
+            self._stats['reap_runs'] += 1
+            self._last_reap_at = time.time()
+            self._last_reap_ms = round((time.perf_counter() - started) * 1000, 3)
+        return counts
+
+    def _reap_one(self, activity: SessionActivity, now: float) -> Optional[str]:
+        session_id = activity.session_id
+        session = self.scribe_service.get_session(session_id)
+        if session is None:
+            self.forget(session_id)
+            return None
+
+        if session.is_recording:
+            disconnected_at = activity.disconnected_at
+            if disconnected_at is not None and now - disconnected_at > self.disconnect_grace:
+                self._stop_recording(session_id, 'abandoned')
+                return 'reaped_abandoned'
+            if now - activity.last_active > self.recording_idle_timeout:
+                self._stop_recording(session_id, 'idle_recording')
+                return 'stopped_idle_recording'
+            return None
+
+        if now - activity.last_active > self.idle_timeout and not self._soap_job_pending(session_id):
+            self._cleanup(session_id, 'idle')
+            return 'reaped_idle'
+        return None
+
+    def _enforce_caps(self, reserve: int = 0) -> int:
+        """Evict least recently used finished sessions until under the caps"""
+        with self._lock:
+            activities = sorted(self._activity.values(), key=lambda activity: activity.last_active)
+
+        sessions = {activity.session_id: self.scribe_service.get_session(activity.session_id)
+                    for activity in activities}
+        sizes = {session_id: session.estimated_bytes() if session else 0
+                 for session_id, session in sessions.items()}
+        total_bytes = sum(sizes.values())
+        remaining = len(activities)
+
+        evicted = 0
+        for activity in activities:
+            if remaining + reserve <= self.max_sessions and total_bytes < self.max_memory_bytes:
+                break
+            session = sessions[activity.session_id]
+            if session and (session.is_recording or session.status == SessionStatus.PROCESSING
+                            or self._soap_job_pending(activity.session_id)):
+                continue
+            self._cleanup(activity.session_id, 'evicted')
+            total_bytes -= sizes[activity.session_id]
+            remaining -= 1
+            evicted += 1
+
+        self._last_estimated_bytes = total_bytes
+        return evicted
+
+    def _soap_job_pending(self, session_id: str) -> bool:
+        job = self.scribe_service.get_soap_job(session_id=session_id)
+        return job is not None and not job.is_finished
+
+    def _stop_recording(self, session_id: str, reason: str) -> None:
+        """Close the stream of a recording nobody is feeding, keeping the visit"""
+        logger.info("Stopping unattended recording", extra={'session_id': session_id, 'reason': reason})
+        SESSIONS_REAPED.labels(reason).inc()
+        activity = self._activity.get(session_id)
+        if activity:
+            activity.last_active = time.monotonic()
+        result = self.scribe_service.stop_recording(session_id)
+        if result['success']:
+            submitted = self.scribe_service.submit_soap_job(session_id)
+            if not submitted['success']:
+                logger.warning("Could not queue SOAP note for stopped recording: %s", submitted['error'],
+                               extra={'session_id': session_id})
+
+    def _cleanup(self, session_id: str, reason: str) -> None:
+        logger.info("Reaping session", extra={'session_id': session_id, 'reason': reason})
+        SESSIONS_REAPED.labels(reason).inc()
+        # Stored sessions are only released from memory, not deleted
+        self.scribe_service.cleanup_session(session_id, delete=False)
+        self.forget(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'tracked_sessions': len(self._activity),
+                'connected_sockets': len(self._sessions_by_sid),
+                'disconnected_sessions': sum(1 for activity in self._activity.values()
+                                             if activity.disconnected_at is not None),
+                'estimated_bytes': self._last_estimated_bytes,
+                'max_sessions': self.max_sessions,
+                'max_memory_bytes': self.max_memory_bytes,
+                'last_reap_at': self._last_reap_at,
+                'last_reap_ms': self._last_reap_ms
+            })
+        return stats
+
+    def _reap_loop(self) -> None:
+        while not self._stopped.wait(self.reap_interval):
+            try:
+                self.reap()
+            except Exception:
+                logger.exception("Session reaping failed")
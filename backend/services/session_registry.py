@@ -0,0 +1,523 @@
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Set, Tuple
+from models.session import RecordingSession, SessionStatus
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Statuses a session can be left in when the process stops mid-visit
+INTERRUPTED_STATUSES = ("recording", "processing")
+
+class InMemorySessionBackend:
+    """Sessions kept in this process only, lost on restart"""
+
+    def __init__(self):
+        self._sessions: Dict[str, RecordingSession] = {}
+
+    def get(self, session_id: str) -> Optional[RecordingSession]:
+        return self._sessions.get(session_id)
+
+    def save(self, session: RecordingSession) -> None:
+        self._sessions[session.session_id] = session
+
+    def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def list_sessions(self, status: Optional[str], offset: int, limit: int) -> Tuple[List[RecordingSession], int]:
+        sessions = [
+            session for session in self._sessions.values()
+            if status is None or session.status.value == status
+        ]
+        return sessions[offset:offset + limit], len(sessions)
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def unload(self, session_id: str) -> None:
+        # Nothing else holds the session, so unloading is deleting
+        self.delete(session_id)
+
+    def interrupted_sessions(self) -> List[RecordingSession]:
+        return []
+
+    def ping(self) -> None:
+        pass
+
+class RedisSessionBackend:
+    """Sessions shared between workers through a Redis-compatible store
+
+    `client` is anything with the redis-py API, so tests can pass
+    fakeredis.FakeRedis() instead of a real server. Sessions created by this
+    worker stay live in memory (transcript callbacks mutate them in place)
+    and are written through on save(); sessions owned by other workers are
+    loaded as snapshots. Saving a session object this worker has not saved
+    before rewrites the stored segments rather than appending to them.
+    """
+
+    def __init__(self, client, prefix: str = "scribe"):
+        self.client = client
+        self.prefix = prefix
+        self._local: Dict[str, RecordingSession] = {}
+        self._persisted_segments: Dict[str, int] = {}
+        self._persisted_status: Dict[str, str] = {}
+
+    def _key(self, *parts) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    def get(self, session_id: str) -> Optional[RecordingSession]:
+        session = self._local.get(session_id)
+        if session:
+            return session
+
+        record = self.client.get(self._key("session", session_id))
+        if record is None:
+            return None
+        segments = self.client.lrange(self._key("session", session_id, "segments"), 0, -1)
+        return RecordingSession.from_record(json.loads(record), [json.loads(s) for s in segments])
+
+    def save(self, session: RecordingSession) -> None:
+        session_id = session.session_id
+        pipe = self.client.pipeline()
+        if self._local.get(session_id) is not session:
+            # A new session under a stored id (or a snapshot): rewrite it whole
+            self._persisted_segments.pop(session_id, None)
+            self._persisted_status.pop(session_id, None)
+            pipe.delete(self._key("session", session_id, "segments"))
+            for stale in SessionStatus:
+                pipe.zrem(self._key("status", stale.value), session_id)
+        self._local[session_id] = session
+        status = session.status.value
+
+        pipe.set(self._key("session", session_id), json.dumps(session.to_record()))
+        pipe.zadd(self._key("sessions"), {session_id: session.created_at})
+
+        previous_status = self._persisted_status.get(session_id)
+        if previous_status != status:
+            if previous_status:
+                pipe.zrem(self._key("status", previous_status), session_id)
+            pipe.zadd(self._key("status", status), {session_id: session.created_at})
+
+        # Segments are append-only, so only push the ones not written yet
+        persisted = self._persisted_segments.get(session_id, 0)
+        new_segments = session.segments.to_list(persisted)
+        if new_segments:
+            pipe.rpush(self._key("session", session_id, "segments"), *[json.dumps(s) for s in new_segments])
+
+        pipe.execute()
+        self._persisted_status[session_id] = status
+        self._persisted_segments[session_id] = persisted + len(new_segments)
+
+    def delete(self, session_id: str) -> None:
+        self._local.pop(session_id, None)
+        self._persisted_segments.pop(session_id, None)
+        status = self._persisted_status.pop(session_id, None)
+
+        pipe = self.client.pipeline()
+        pipe.delete(self._key("session", session_id), self._key("session", session_id, "segments"))
+        pipe.zrem(self._key("sessions"), session_id)
+        if status:
+            pipe.zrem(self._key("status", status), session_id)
+        pipe.execute()
+
+    def list_sessions(self, status: Optional[str], offset: int, limit: int) -> Tuple[List[RecordingSession], int]:
+        index = self._key("status", status) if status else self._key("sessions")
+        total = self.client.zcard(index)
+        session_ids = self.client.zrange(index, offset, offset + limit - 1)
+
+        sessions = []
+        for session_id in session_ids:
+            if isinstance(session_id, bytes):
+                session_id = session_id.decode()
+            session = self._local.get(session_id)
+            if session is None:
+                # Listing only needs the summary, so skip loading segments
+                record = self.client.get(self._key("session", session_id))
+                if record is None:
+                    continue
+                session = RecordingSession.from_record(json.loads(record))
+            sessions.append(session)
+        return sessions, total
+
+    def count(self) -> int:
+        return self.client.zcard(self._key("sessions"))
+
+    def unload(self, session_id: str) -> None:
+        """Drop the live copy; the stored session stays in Redis"""
+        self._local.pop(session_id, None)
+        self._persisted_segments.pop(session_id, None)
+        self._persisted_status.pop(session_id, None)
+
+    def interrupted_sessions(self) -> List[RecordingSession]:
+        sessions = []
+        for status in INTERRUPTED_STATUSES:
+            for session_id in self.client.zrange(self._key("status", status), 0, -1):
+                if isinstance(session_id, bytes):
+                    session_id = session_id.decode()
+                session = self.get(session_id)
+                if session:
+                    sessions.append(session)
+        return sessions
+
+    def ping(self) -> None:
+        self.client.ping()
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_status ON sessions (status, created_at);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created_at);
+CREATE TABLE IF NOT EXISTS segments (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    segment TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+class SqliteSessionBackend:
+    """Sessions and transcript segments persisted to SQLite, written behind
+
+    save() only marks the session dirty; a writer thread commits every
+    dirty session in one transaction each flush_interval seconds (sooner
+    once max_batch sessions are waiting), writing just the segments it has
+    not written before. Transcript callbacks and audio handling therefore
+    never wait on disk. Sessions used by this process stay live in memory;
+    others are loaded from the database when asked for. Saving a different
+    session object under an existing id (the id was reopened) replaces the
+    stored segments instead of appending to them.
+    """
+
+    # Every method synchronises itself, so SessionRegistry does not hold its
+    # lock while listing, counting or unloading wait for a flush
+    thread_safe = True
+
+    def __init__(self, path: str, flush_interval: float = 0.2, max_batch: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._local: Dict[str, RecordingSession] = {}
+        self._persisted_segments: Dict[str, int] = {}
+        self._dirty: Dict[str, None] = {}  # insertion-ordered set
+        self._deleted: Dict[str, None] = {}
+        self._replaced: Dict[str, None] = {}  # ids whose stored segments are stale
+        self._changes = 0   # save/delete calls queued so far
+        self._written = 0   # ... and how many of them have been committed
+        self._flush_now = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {'batches': 0, 'sessions_written': 0, 'segments_written': 0,
+                       'deleted': 0, 'errors': 0, 'last_batch_ms': None}
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SQLITE_SCHEMA)
+        self._db_lock = threading.Lock()
+
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def get(self, session_id: str) -> Optional[RecordingSession]:
+        session = self._local.get(session_id)
+        if session:
+            return session
+        with self._condition:
+            if session_id in self._deleted:
+                return None
+        return self._load(session_id)
+
+    def save(self, session: RecordingSession) -> None:
+        session_id = session.session_id
+        with self._condition:
+            if self._local.get(session_id) is not session:
+                self._replaced[session_id] = None
+                self._persisted_segments[session_id] = 0
+            self._local[session_id] = session
+            self._deleted.pop(session_id, None)
+            self._dirty[session_id] = None
+            self._changes += 1
+            # Wake the writer when a batch starts and when one fills up
+            if len(self._dirty) == 1 or len(self._dirty) >= self.max_batch:
+                self._condition.notify_all()
+
+    def delete(self, session_id: str) -> None:
+        with self._condition:
+            self._local.pop(session_id, None)
+            self._dirty.pop(session_id, None)
+            self._replaced.pop(session_id, None)
+            self._deleted[session_id] = None
+            self._changes += 1
+            self._condition.notify_all()
+
+    def unload(self, session_id: str) -> None:
+        """Write the session out and drop it from memory"""
+        self.flush()
+        with self._condition:
+            if session_id not in self._dirty:
+                self._local.pop(session_id, None)
+                self._persisted_segments.pop(session_id, None)
+
+    def list_sessions(self, status: Optional[str], offset: int, limit: int) -> Tuple[List[RecordingSession], int]:
+        self.flush()
+        where, params = ("WHERE status = ?", (status,)) if status else ("", ())
+        with self._db_lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM sessions {where}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT session_id, record FROM sessions {where} ORDER BY created_at LIMIT ? OFFSET ?",
+                params + (limit, offset)).fetchall()
+        # Listing only needs the summary, so segments are not loaded
+        sessions = [self._local.get(session_id) or RecordingSession.from_record(json.loads(record))
+                    for session_id, record in rows]
+        return sessions, total
+
+    def count(self) -> int:
+        self.flush()
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def interrupted_sessions(self) -> List[RecordingSession]:
+        self.flush()
+        placeholders = ",".join("?" * len(INTERRUPTED_STATUSES))
+        with self._db_lock:
+            session_ids = [row[0] for row in self._db.execute(
+                f"SELECT session_id FROM sessions WHERE status IN ({placeholders}) ORDER BY created_at",
+                INTERRUPTED_STATUSES)]
+        return [session for session in map(self.get, session_ids) if session]
+
+    def ping(self) -> None:
+        """Raise if the database cannot be read or the writer has stopped"""
+        if not self._writer.is_alive():
+            raise RuntimeError("session writer thread has stopped")
+        with self._db_lock:
+            self._db.execute("SELECT 1").fetchone()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far is committed"""
+        with self._condition:
+            target = self._changes
+            if self._written >= target:
+                return True
+            self._flush_now = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._written >= target or self._closed, timeout)
+
+    def close(self) -> None:
+        """Flush outstanding writes and stop the writer thread"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join(timeout=10)
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'backend': 'sqlite',
+                'path': self.path,
+                'dirty_sessions': len(self._dirty),
+                'pending_deletes': len(self._deleted),
+                'live_sessions': len(self._local)
+            })
+        return stats
+
+    def _load(self, session_id: str) -> Optional[RecordingSession]:
+        with self._db_lock:
+            row = self._db.execute("SELECT record FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            segments = [json.loads(segment) for (segment,) in self._db.execute(
+                "SELECT segment FROM segments WHERE session_id = ? ORDER BY seq", (session_id,))]
+        session = RecordingSession.from_record(json.loads(row[0]), segments)
+        with self._condition:
+            # Another thread may have loaded or deleted it meanwhile
+            if session_id in self._deleted:
+                return None
+            if session_id in self._local:
+                return self._local[session_id]
+            self._local[session_id] = session
+            self._persisted_segments[session_id] = len(segments)
+        return session
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._dirty or self._deleted or self._closed)
+                # Let changes coalesce unless someone is waiting on them
+                self._condition.wait_for(
+                    lambda: self._flush_now or self._closed or len(self._dirty) >= self.max_batch,
+                    self.flush_interval)
+                self._flush_now = False
+                dirty = [self._local[session_id] for session_id in self._dirty if session_id in self._local]
+                deleted = list(self._deleted)
+                replaced = set(self._replaced)
+                self._dirty.clear()
+                self._deleted.clear()
+                self._replaced.clear()
+                target = self._changes
+                closing = self._closed
+
+            if dirty or deleted:
+                try:
+                    self._write_batch(dirty, deleted, replaced)
+                except Exception:
+                    logger.exception("Session write-behind batch failed, will retry")
+                    with self._condition:
+                        self._stats['errors'] += 1
+                        for session in dirty:
+                            self._dirty.setdefault(session.session_id, None)
+                            if session.session_id in replaced:
+                                self._replaced.setdefault(session.session_id, None)
+                        for session_id in deleted:
+                            if session_id not in self._local:
+                                self._deleted.setdefault(session_id, None)
+                    if not closing:
+                        time.sleep(self.flush_interval)
+                        continue
+
+            with self._condition:
+                self._written = target
+                self._condition.notify_all()
+                if closing and not (self._dirty or self._deleted):
+                    return
+
+    def _write_batch(self, dirty: List[RecordingSession], deleted: List[str], replaced: Set[str]) -> None:
+        started = time.perf_counter()
+        now = time.time()
+        segment_rows = []
+        session_rows = []
+        new_counts = {}
+        for session in dirty:
+            persisted = 0 if session.session_id in replaced else self._persisted_segments.get(session.session_id, 0)
+            new_segments = session.segments.to_list(persisted)
+            segment_rows.extend((session.session_id, segment['seq'], json.dumps(segment))
+                                for segment in new_segments)
+            new_counts[session.session_id] = (session, persisted + len(new_segments))
+            session_rows.append((session.session_id, session.status.value, session.created_at, now,
+                                 json.dumps(session.to_record())))
+
+        with self._db_lock, self._db:
+            if deleted:
+                params = [(session_id,) for session_id in deleted]
+                self._db.executemany("DELETE FROM segments WHERE session_id = ?", params)
+                self._db.executemany("DELETE FROM sessions WHERE session_id = ?", params)
+            if replaced:
+                self._db.executemany("DELETE FROM segments WHERE session_id = ?",
+                                     [(session_id,) for session_id in replaced])
+            self._db.executemany(
+                "INSERT INTO sessions (session_id, status, created_at, updated_at, record) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET status = excluded.status, "
+                "created_at = excluded.created_at, updated_at = excluded.updated_at, record = excluded.record",
+                session_rows)
+            self._db.executemany("INSERT OR REPLACE INTO segments (session_id, seq, segment) VALUES (?, ?, ?)",
+                                 segment_rows)
+
+        with self._condition:
+            for session_id in deleted:
+                self._persisted_segments.pop(session_id, None)
+            for session_id, (session, count) in new_counts.items():
+                # Unless the id has been reopened with a new session since
+                if self._local.get(session_id) is session:
+                    self._persisted_segments[session_id] = count
+            self._stats['batches'] += 1
+            self._stats['sessions_written'] += len(session_rows)
+            self._stats['segments_written'] += len(segment_rows)
+            self._stats['deleted'] += len(deleted)
+            self._stats['last_batch_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+class SessionRegistry:
+    """Thread-safe session registry shared by REST routes and socket handlers"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or InMemorySessionBackend()
+        self._lock = threading.RLock()
+
+    def get(self, session_id: str) -> Optional[RecordingSession]:
+        with self._lock:
+            return self.backend.get(session_id)
+
+    def save(self, session: RecordingSession) -> None:
+        with self._lock:
+            self.backend.save(session)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self.backend.delete(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def _serialized(self):
+        """The registry lock, unless the backend synchronises itself"""
+        return nullcontext() if getattr(self.backend, 'thread_safe', False) else self._lock
+
+    def __len__(self) -> int:
+        with self._serialized():
+            return self.backend.count()
+
+    def list_sessions(self, status: Optional[str] = None, offset: int = 0,
+                      limit: int = 50) -> Tuple[List[RecordingSession], int]:
+        """Return one page of sessions, optionally filtered by status value, and the total"""
+        with self._serialized():
+            return self.backend.list_sessions(status, max(offset, 0), max(limit, 0))
+
+    def unload(self, session_id: str) -> None:
+        """Release the in-memory copy, keeping whatever the backend has stored"""
+        with self._serialized():
+            self.backend.unload(session_id)
+
+    def interrupted_sessions(self) -> List[RecordingSession]:
+        """Stored sessions left recording or processing by a previous run"""
+        with self._serialized():
+            return self.backend.interrupted_sessions()
+
+    def ping(self) -> None:
+        """Round trip to the backend's store; raises if it is unreachable"""
+        # Not under the registry lock: a slow store must not stall sessions
+        self.backend.ping()
+
+    def stats(self) -> Optional[dict]:
+        stats = getattr(self.backend, 'stats', None)
+        return stats() if stats else None
+
+def create_session_backend(backend_name: str, redis_url: Optional[str] = None,
+                           db_path: Optional[str] = None, flush_interval: float = 0.2):
+    """Build the session backend named in configuration"""
+    if backend_name == "memory":
+        return InMemorySessionBackend()
+    if backend_name == "sqlite":
+        return SqliteSessionBackend(db_path, flush_interval)
+    if backend_name == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("SESSION_BACKEND=redis requires the 'redis' package")
+        return RedisSessionBackend(redis.Redis.from_url(redis_url))
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend_name}")
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_session_registry() -> SessionRegistry:
+    """Process-wide session registry, created on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SessionRegistry(create_session_backend(
+                Config.SESSION_BACKEND, Config.REDIS_URL,
+                Config.SESSION_DB_PATH, Config.SESSION_FLUSH_INTERVAL_MS / 1000
+            ))
+        return _registry
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # Only needed for the on-disk tier
+    Fernet = None
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_transcript(transcript: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return _WHITESPACE.sub(" ", transcript).strip()
+
+def soap_cache_key(transcript: str, prompt_version: str, model_name: str,
+                   generation_config: Dict[str, Any]) -> str:
+    """Content address for a SOAP note: everything that shapes the LLM output"""
+    material = json.dumps({
+        'transcript': normalize_transcript(transcript),
+        'prompt_version': prompt_version,
+        'model': model_name,
+        'generation_config': generation_config
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+@dataclass
+class SoapCacheEntry:
+    soap_note: str
+    created_at: float = field(default_factory=time.time)
+    session_ids: Set[str] = field(default_factory=set)
+
+    def to_dict(self):
+        return {
+            'soap_note': self.soap_note,
+            'created_at': self.created_at,
+            'session_ids': sorted(self.session_ids)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SoapCacheEntry':
+        return cls(data['soap_note'], data['created_at'], set(data.get('session_ids', ())))
+
+class MemoryCacheTier:
+    """LRU of cache entries with a TTL, held in this process"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, SoapCacheEntry]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[SoapCacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: SoapCacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+class EncryptedDiskCacheTier:
+    """Cache entries stored as Fernet-encrypted files, one per key
+
+    File names are the content hashes, so nothing about the transcript or
+    the session is readable without the key. Entries past the TTL are
+    removed when they are next read.
+    """
+
+    def __init__(self, directory: str, key: str, ttl_seconds: float = 86400):
+        if Fernet is None:
+            raise ValueError("SOAP_CACHE_DIR requires the 'cryptography' package")
+        if not key:
+            raise ValueError("SOAP_CACHE_DIR requires SOAP_CACHE_KEY (a Fernet key) to encrypt entries")
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(key)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.soap")
+
+    def get(self, key: str) -> Optional[SoapCacheEntry]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                token = f.read()
+            entry = SoapCacheEntry.from_dict(json.loads(self._fernet.decrypt(token)))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError, KeyError):
+            # Written with another key or damaged: unusable either way
+            self.delete(key)
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds:
+            self.delete(key)
+            return None
+        return entry
+
+    def put(self, key: str, entry: SoapCacheEntry) -> None:
+        token = self._fernet.encrypt(json.dumps(entry.to_dict()).encode())
+        temp_path = f"{self._path(key)}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(token)
+        os.replace(temp_path, self._path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """Yield (key, entry) for every live file; decrypts them all, so only used at startup"""
+        for name in os.listdir(self.directory):
+            if not name.endswith(".soap"):
+                continue
+            key = name[:-len(".soap")]
+            entry = self.get(key)
+            if entry is not None:
+                yield key, entry
+
+class SoapResultCache:
+    """Two-tier cache of generated SOAP notes keyed by soap_cache_key()
+
+    Lookups try memory first, then disk (promoting hits into memory). Every
+    entry records the sessions that produced or reused it so purge_session()
+    can drop a patient's notes; an entry goes once no session refers to it.
+    A session -> keys index, seeded from the disk tier at startup, keeps a
+    purge to that session's own entries.
+    """
+
+    def __init__(self, memory: Optional[MemoryCacheTier] = None,
+                 disk: Optional[EncryptedDiskCacheTier] = None):
+        self.memory = memory if memory is not None else MemoryCacheTier()
+        self.disk = disk
+        self._lock = threading.Lock()
+        # Serializes read-modify-write of disk entries; taken after _lock, never before
+        self._disk_lock = threading.Lock()
+        self._session_keys: Dict[str, Set[str]] = {}
+        self._stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                       'stores': 0, 'purged': 0}
+        if disk:
+            for key, entry in disk.entries():
+                self._index(key, entry.session_ids)
+
+    def _index(self, key: str, session_ids) -> None:
+        for session_id in session_ids:
+            self._session_keys.setdefault(session_id, set()).add(key)
+
+    def get(self, key: str, session_id: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self._stats['memory_hits'] += 1
+            elif self.disk:
+                with self._disk_lock:
+                    entry = self.disk.get(key)
+                if entry is not None:
+                    self._stats['disk_hits'] += 1
+                    self.memory.put(key, entry)
+
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._stats['hits'] += 1
+            if session_id and session_id not in entry.session_ids:
+                entry.session_ids.add(session_id)
+                self._index(key, (session_id,))
+                if self.disk:
+                    with self._disk_lock:
+                        self.disk.put(key, entry)
+            return entry.soap_note
+
+    def put(self, key: str, soap_note: str, session_id: Optional[str] = None) -> None:
+        entry = SoapCacheEntry(soap_note, session_ids={session_id} if session_id else set())
+        with self._lock:
+            self.memory.put(key, entry)
+            self._index(key, entry.session_ids)
+            if self.disk:
+                with self._disk_lock:
+                    self.disk.put(key, entry)
+            self._stats['stores'] += 1
+
+    def purge_session(self, session_id: str) -> int:
+        """Forget a session; entries no other session uses are deleted
+
+        Only the session's indexed keys are visited, and the disk files are
+        rewritten after the cache lock is released so lookups on other
+        sessions don't wait on decryption.
+        """
+        purged = set()
+        with self._lock:
+            keys = self._session_keys.pop(session_id, set())
+            for key in keys:
+                entry = self.memory.get(key)
+                if entry is None:
+                    continue
+                entry.session_ids.discard(session_id)
+                if not entry.session_ids:
+                    self.memory.delete(key)
+                    purged.add(key)
+
+        if self.disk:
+            with self._disk_lock:
+                for key in keys:
+                    entry = self.disk.get(key)
+                    if entry is None or session_id not in entry.session_ids:
+                        continue
+                    entry.session_ids.discard(session_id)
+                    if entry.session_ids:
+                        self.disk.put(key, entry)
+                    else:
+                        self.disk.delete(key)
+                        purged.add(key)
+
+        with self._lock:
+            self._stats['purged'] += len(purged)
+        return len(purged)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'memory_evictions': self.memory.evictions,
+                'memory_expirations': self.memory.expirations,
+                'disk_enabled': self.disk is not None
+            })
+        return stats
+
+def create_soap_cache(max_entries: int, ttl_seconds: float, directory: Optional[str] = None,
+                      key: Optional[str] = None, disk_ttl_seconds: Optional[float] = None) -> SoapResultCache:
+    """Build the cache from configuration; the disk tier is only used when a directory is set"""
+    disk = None
+    if directory:
+        disk = EncryptedDiskCacheTier(directory, key, disk_ttl_seconds or ttl_seconds)
+    return SoapResultCache(MemoryCacheTier(max_entries, ttl_seconds), disk)
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+from models.session import RecordingSession
+from models.transcript import TranscriptSegment
+
+logger = logging.getLogger(__name__)
+
+# Gemini does not expose a local tokenizer; ~4 characters per token is close
+# enough for budgeting English clinical conversation
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(segments: Sequence[TranscriptSegment]) -> int:
+    """Rough prompt token count for a run of transcript segments"""
+    return sum(len(segment.formatted_text) + 1 for segment in segments) // CHARS_PER_TOKEN
+
+def take_within_budget(segments: Sequence[TranscriptSegment], max_tokens: int) -> List[TranscriptSegment]:
+    """Leading segments that fit in max_tokens (always at least one)"""
+    taken, chars = [], 0
+    for segment in segments:
+        # Counted in characters, as estimate_tokens does, so rounding per
+        # segment cannot let a long run creep over the budget
+        chars += len(segment.formatted_text) + 1
+        if taken and chars // CHARS_PER_TOKEN > max_tokens:
+            break
+        taken.append(segment)
+    return taken
+
+class RollingSoapDrafter:
+    """Keeps a running SOAP draft for each session while it is recording
+
+    note_segment() is called after every transcript segment. Once the
+    undrafted transcript reaches token_budget, or interval_seconds have
+    passed since the last update, a background worker folds it into
+    session.soap_draft. Each update sends at most max_delta_tokens of new
+    transcript, so prompt size stays bounded however long the visit runs,
+    and at stop only the remaining delta has to be merged. `workers`
+    threads run updates, so concurrent visits do not wait on each other's
+    Gemini calls; a session is never updated by two workers at once.
+    """
+
+    def __init__(self, gemini_service, sessions, on_update: Optional[Callable[[RecordingSession], None]] = None,
+                 token_budget: int = 1500, interval_seconds: float = 120.0, max_delta_tokens: int = 4000,
+                 workers: int = 2):
+        self.gemini_service = gemini_service
+        self.sessions = sessions
+        self._on_update = on_update
+        self.token_budget = token_budget
+        self.interval_seconds = interval_seconds
+        self.max_delta_tokens = max_delta_tokens
+
+        self._pending = deque()
+        self._queued = set()
+        self._last_update: Dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._stats = {'updates': 0, 'failed': 0, 'segments_drafted': 0}
+
+        self._workers = [threading.Thread(target=self._work, name=f"soap-drafter-{index}", daemon=True)
+                         for index in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def note_segment(self, session: RecordingSession) -> None:
+        """Schedule a draft update if the session has gone over budget"""
+        with self._condition:
+            if session.session_id in self._queued or not self._is_due(session):
+                return
+            self._queued.add(session.session_id)
+            self._pending.append(session.session_id)
+            self._condition.notify()
+
+    def stop_session(self, session_id: str) -> None:
+        """Stop drafting a session; an update already running still lands"""
+        with self._condition:
+            self._queued.discard(session_id)
+            self._last_update.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats['queued'] = len(self._queued)
+        return stats
+
+    def _is_due(self, session: RecordingSession) -> bool:
+        """Whether the undrafted transcript is over the token or time budget (lock held)"""
+        undrafted = session.segments.since(session.soap_draft_seq)
+        if not undrafted:
+            return False
+        # The clock starts with the session's first segment
+        last_update = self._last_update.setdefault(session.session_id, time.monotonic())
+        return (estimate_tokens(undrafted) >= self.token_budget or
+                time.monotonic() - last_update >= self.interval_seconds)
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                session_id = self._pending.popleft()
+                if session_id not in self._queued:
+                    continue  # stopped while waiting
+
+            session = self.sessions.get(session_id)
+            try:
+                if session and session.is_recording:
+                    self._update_draft(session)
+            except Exception:
+                logger.exception("Error updating SOAP draft for session %s", session_id)
+            finally:
+                with self._condition:
+                    self._queued.discard(session_id)
+
+            # Catch up if transcript kept arriving faster than one update's worth
+            if session and session.is_recording:
+                self.note_segment(session)
+
+    def _update_draft(self, session: RecordingSession) -> None:
+        draft_seq = session.soap_draft_seq
+        delta = take_within_budget(session.segments.since(draft_seq), self.max_delta_tokens)
+        result = self.gemini_service.update_soap_draft(session.soap_draft, delta)
+
+        with self._condition:
+            # Failures also wait out the interval rather than retrying at once
+            if session.session_id in self._queued:
+                self._last_update[session.session_id] = time.monotonic()
+            if not result.success:
+                self._stats['failed'] += 1
+                logger.warning("SOAP draft update failed for session %s: %s", session.session_id, result.error,
+                               extra={'error_type': result.error_type})
+                return
+            self._stats['updates'] += 1
+            self._stats['segments_drafted'] += len(delta)
+
+        session.soap_draft = result.soap_note
+        session.soap_draft_seq = delta[-1].seq
+        self.sessions.save(session)
+        logger.info("SOAP draft updated", extra={'session_id': session.session_id,
+                                                 'soap_draft_seq': session.soap_draft_seq,
+                                                 'segments': len(delta)})
+
+        if self._on_update:
+            self._on_update(session)
@@ -0,0 +1,191 @@
+import logging
+import heapq
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from models.responses import SOAPNoteResult
+from models.soap_job import SoapJob, SoapJobStatus
+from services.gemini_service import RETRYABLE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+class SoapJobQueue:
+    """Bounded SOAP generation queue served by a fixed pool of worker threads
+
+    run_job(job) performs one attempt and returns a SOAPNoteResult. Failures
+    whose error_type is retryable are re-queued with exponential backoff and
+    jitter; on_update(job, result) is called on every status change (result
+    is only set once the job has finished). Jobs are deduplicated on
+    dedup_key, so resubmitting the same transcript returns the existing job
+    instead of calling the LLM again.
+    """
+
+    def __init__(self, run_job: Callable[[SoapJob], SOAPNoteResult],
+                 on_update: Optional[Callable[[SoapJob, Optional[SOAPNoteResult]], None]] = None,
+                 workers: int = 2, max_queued: int = 100, max_attempts: int = 3,
+                 backoff_base: float = 2.0, backoff_max: float = 30.0,
+                 retained_jobs: int = 1000):
+        self._run_job = run_job
+        self._on_update = on_update
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retained_jobs = retained_jobs
+
+        self._jobs: "OrderedDict[str, SoapJob]" = OrderedDict()
+        self._jobs_by_key: Dict[str, str] = {}
+        self._latest_by_session: Dict[str, str] = {}
+        self._pending = []  # heap of (ready_at, tiebreak, job_id)
+        self._tiebreak = itertools.count()
+        self._running = 0
+        self._condition = threading.Condition()
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0,
+                       'retries': 0, 'completed': 0, 'failed': 0}
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"soap-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, session_id: str, dedup_key: str) -> Optional[SoapJob]:
+        """Queue a job, or return the existing one for the same key
+
+        Returns None when the queue is full.
+        """
+        with self._condition:
+            existing = self._jobs.get(self._jobs_by_key.get(dedup_key))
+            if existing and existing.status != SoapJobStatus.FAILED:
+                self._stats['deduplicated'] += 1
+                return existing
+
+            if len(self._pending) >= self.max_queued:
+                self._stats['rejected'] += 1
+                return None
+
+            job = SoapJob(job_id=str(uuid.uuid4()), session_id=session_id, dedup_key=dedup_key)
+            self._jobs[job.job_id] = job
+            self._jobs_by_key[dedup_key] = job.job_id
+            self._latest_by_session[session_id] = job.job_id
+            self._stats['submitted'] += 1
+            self._schedule(job, time.monotonic())
+            self._prune()
+
+        self._notify(job, None)
+        return job
+
+    def get(self, job_id: str) -> Optional[SoapJob]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def get_for_session(self, session_id: str) -> Optional[SoapJob]:
+        """Most recently submitted job for a session"""
+        with self._condition:
+            return self._jobs.get(self._latest_by_session.get(session_id))
+
+    def forget_session(self, session_id: str) -> None:
+        """Drop finished jobs for a session that has been cleaned up"""
+        with self._condition:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.session_id == session_id and job.is_finished]:
+                self._remove(job_id)
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'queued': len(self._pending),
+                'running': self._running,
+                'workers': len(self._workers),
+                'max_queued': self.max_queued
+            })
+        return stats
+
+    def _schedule(self, job: SoapJob, ready_at: float) -> None:
+        heapq.heappush(self._pending, (ready_at, next(self._tiebreak), job.job_id))
+        self._condition.notify()
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1))))
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the retention limit (lock held)"""
+        excess = len(self._jobs) - self.retained_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.is_finished][:excess]:
+            self._remove(job_id)
+
+    def _remove(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id)
+        if self._jobs_by_key.get(job.dedup_key) == job_id:
+            del self._jobs_by_key[job.dedup_key]
+        if self._latest_by_session.get(job.session_id) == job_id:
+            del self._latest_by_session[job.session_id]
+
+    def _next_job(self) -> SoapJob:
+        """Block until a job is due, then mark it running"""
+        with self._condition:
+            while True:
+                if self._pending:
+                    ready_at, _, job_id = self._pending[0]
+                    delay = ready_at - time.monotonic()
+                    if delay <= 0:
+                        heapq.heappop(self._pending)
+                        job = self._jobs.get(job_id)
+                        if job is None:
+                            continue
+                        job.status = SoapJobStatus.RUNNING
+                        job.attempts += 1
+                        job.started_at = job.started_at or time.time()
+                        job.next_attempt_at = None
+                        self._running += 1
+                        return job
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            self._notify(job, None)
+
+            try:
+                result = self._run_job(job)
+            except Exception as e:
+                result = SOAPNoteResult(success=False, error=f"SOAP generation failed: {str(e)}")
+
+            with self._condition:
+                self._running -= 1
+                job.error = result.error
+                job.error_type = result.error_type
+                if result.success:
+                    job.status = SoapJobStatus.COMPLETED
+                    job.finished_at = time.time()
+                    self._stats['completed'] += 1
+                elif result.error_type in RETRYABLE_ERRORS and job.attempts < self.max_attempts:
+                    delay = self._backoff(job.attempts)
+                    job.status = SoapJobStatus.RETRYING
+                    job.next_attempt_at = time.time() + delay
+                    self._stats['retries'] += 1
+                    self._schedule(job, time.monotonic() + delay)
+                else:
+                    job.status = SoapJobStatus.FAILED
+                    job.finished_at = time.time()
+                    self._stats['failed'] += 1
+
+            self._notify(job, result if job.is_finished else None)
+
+    def _notify(self, job: SoapJob, result: Optional[SOAPNoteResult]) -> None:
+        if self._on_update:
+            try:
+                self._on_update(job, result)
+            except Exception:
+                logger.exception("Error publishing SOAP job update for job %s", job.job_id)
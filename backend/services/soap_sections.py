@@ -0,0 +1,73 @@
+import re
+from typing import List, Optional
+
+SOAP_SECTIONS = ("subjective", "objective", "assessment", "plan")
+
+# Heading names, optionally wrapped in markdown; "Assessment and Plan" counts as assessment
+_PREFIX = r"^[\s#*_>-]*"
+_FULL_NAME = r"(SUBJECTIVE|OBJECTIVE|ASSESSMENT(?:\s*(?:AND|&)\s*PLAN)?|PLAN)[\s*_]*"
+# A capital initial alone is only a heading with a colon or parenthesis
+# after it, so "A-fib" or "P-waves absent" do not switch sections
+_INITIAL = r"((?-i:[SOAP]))[\s*_]*[:)]"
+# Recognisable mid-line as soon as the separator arrives...
+_HEADING_INLINE = re.compile(_PREFIX + r"(?:" + _FULL_NAME + r"[:)\u2013\u2014-]|" + _INITIAL + r")", re.IGNORECASE)
+# ...or as a bare heading once the line is complete
+_HEADING_LINE = re.compile(_PREFIX + _FULL_NAME + r"[:.]?[\s*_]*$", re.IGNORECASE)
+_LONGEST_HEADING = len("**ASSESSMENT AND PLAN**:")
+
+class SoapSectionTracker:
+    """Detects S/O/A/P section boundaries in streamed SOAP note text
+
+    Feed chunks as they arrive; a heading is recognised as soon as enough of
+    its line has been seen, without waiting for the end of the line.
+    """
+
+    def __init__(self):
+        self.current: Optional[str] = None
+        self.started: List[str] = []
+        self._line = ""
+        self._line_decided = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume a chunk and return the sections that started inside it"""
+        new_sections = []
+        for piece in re.split(r"(\n)", chunk):
+            if piece == "\n":
+                if not self._line_decided:
+                    self._check(_HEADING_LINE.match(self._line), new_sections)
+                self._line = ""
+                self._line_decided = False
+                continue
+            if self._line_decided or not piece:
+                continue
+
+            self._line += piece
+            if self._check(_HEADING_INLINE.match(self._line), new_sections):
+                self._line_decided = True
+            elif len(self._line.lstrip(" \t#*_>-")) > _LONGEST_HEADING:
+                # Too long to still turn into a heading
+                self._line_decided = True
+        return new_sections
+
+    def _check(self, match, new_sections: List[str]) -> bool:
+        """Switch to the section a heading match names, if any"""
+        if not match:
+            return False
+        section = self._section_name(match)
+        if section not in self.started:
+            self.started.append(section)
+            new_sections.append(section)
+        self.current = section
+        return True
+
+    @property
+    def completed(self) -> List[str]:
+        """Sections that have been followed by a later section"""
+        return [section for section in self.started if section != self.current]
+
+    @staticmethod
+    def _section_name(match) -> str:
+        if match.group(1):
+            return match.group(1).split()[0].split("&")[0].lower()
+        initial = match.group(2).lower()
+        return next(section for section in SOAP_SECTIONS if section[0] == initial)
@@ -0,0 +1,167 @@
+import re
+import time
+from typing import Dict, Iterable, Optional
+
+# Phrases that suggest who is talking when Deepgram gives no diarization
+DOCTOR_PHRASES = ("let's", "i'm going to", "can you", "how are", "what brings",
+                  "i need to", "we should", "i'd like to", "tell me about")
+PATIENT_PHRASES = ("i have", "it hurts", "i feel", "my", "i can't",
+                   "i've been", "i think", "i'm worried", "i'm having")
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """Regex alternation factored into a prefix trie
+
+    "i have|i feel|i think" becomes "i\\ (?:feel|have|think)", so the regex
+    engine walks each shared prefix once instead of retrying every phrase.
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        return body + '?' if '' in node else body
+
+    return build(trie)
+
+# One pass over " " + the lowercased sentence finds both kinds of phrase. The
+# leading space lets the engine skip straight to word starts, which is much
+# cheaper than a \b or IGNORECASE scan at every character.
+_ROLE_PHRASES = re.compile(
+    rf" (?:(?P<doctor>{_trie_pattern(DOCTOR_PHRASES)})|(?P<patient>{_trie_pattern(PATIENT_PHRASES)}))\b"
+)
+
+DOCTOR = 1
+PATIENT = 2
+
+def match_roles(sentence: str) -> int:
+    """Bitmask of DOCTOR/PATIENT phrases present in the sentence"""
+    roles = 0
+    for match in _ROLE_PHRASES.finditer(" " + sentence.lower()):
+        roles |= DOCTOR if match.lastgroup == "doctor" else PATIENT
+        if roles == DOCTOR | PATIENT:
+            break
+    return roles
+
+def majority_speaker(words) -> Optional[int]:
+    """Most common diarized speaker across the words (0-based), if any
+
+    Ties go to the speaker heard first.
+    """
+    counts: Dict[int, int] = {}
+    for word in words or ():
+        speaker = getattr(word, 'speaker', None)
+        if speaker is not None:
+            counts[speaker] = counts.get(speaker, 0) + 1
+    if not counts:
+        return None
+    return max(counts, key=counts.get)  # dicts keep first-seen order, so max() keeps the earliest on ties
+
+class SpeakerState:
+    """Per-session inference state"""
+    __slots__ = ('last_speaker', 'utterance_count', 'speaker_1_words', 'speaker_2_words', 'last_end', 'last_seen')
+
+    def __init__(self):
+        self.last_speaker = 1
+        self.utterance_count = 0
+        self.speaker_1_words = 0
+        self.speaker_2_words = 0
+        self.last_end: Optional[float] = None   # audio time the previous utterance ended
+        self.last_seen: Optional[float] = None  # monotonic time it arrived
+
+    def to_dict(self):
+        return {
+            'current_speaker': self.last_speaker,
+            'speaker_1_words': self.speaker_1_words,
+            'speaker_2_words': self.speaker_2_words,
+            'total_utterances': self.utterance_count
+        }
+
+class SpeakerAttributor:
+    """Assigns a 1-based speaker number to each final utterance of a session
+
+    Deepgram's word-level diarization wins when present (majority vote over
+    the words). Otherwise a two-speaker heuristic (speaker 1 is the doctor)
+    goes by doctor/patient phrasing first, then switches speaker after a
+    long gap between results, on a short reply, or when one side has
+    dominated the conversation.
+    """
+
+    def __init__(self, pause_seconds: float = 2.0, short_utterance_words: int = 5, balance_words: int = 50):
+        self.pause_seconds = pause_seconds
+        self.short_utterance_words = short_utterance_words
+        self.balance_words = balance_words
+        self._states: Dict[str, SpeakerState] = {}
+
+    def attribute(self, session_id: str, sentence: str, words=None, end: Optional[float] = None) -> int:
+        """Speaker for a final result; `end` is its end time on the audio clock"""
+        diarized = majority_speaker(words)
+        if diarized is not None:
+            return diarized + 1
+        return self._infer(session_id, sentence, end)
+
+    def _infer(self, session_id: str, sentence: str, end: Optional[float]) -> int:
+        state = self._states.get(session_id)
+        if state is None:
+            state = self._states[session_id] = SpeakerState()
+
+        # Time between consecutive results, on the audio clock when Deepgram
+        # gives one so it isn't skewed by network or endpointing delays
+        now = time.monotonic()
+        if end is not None and state.last_end is not None:
+            gap = end - state.last_end
+        elif state.last_seen is not None:
+            gap = now - state.last_seen
+        else:
+            gap = 0.0
+
+        word_count = len(sentence.split())
+        last = state.last_speaker
+        other = 2 if last == 1 else 1
+        roles = match_roles(sentence)
+        if roles == DOCTOR:
+            speaker = 1
+        elif roles == PATIENT:
+            speaker = 2
+        elif gap > self.pause_seconds:
+            speaker = other
+        elif word_count < self.short_utterance_words and state.utterance_count > 0:
+            speaker = other
+        elif last == 1 and state.speaker_1_words > state.speaker_2_words + self.balance_words:
+            speaker = other
+        elif last == 2 and state.speaker_2_words > state.speaker_1_words + self.balance_words:
+            speaker = other
+        else:
+            speaker = last
+
+        state.last_speaker = speaker
+        state.utterance_count += 1
+        if speaker == 1:
+            state.speaker_1_words += word_count
+        else:
+            state.speaker_2_words += word_count
+        state.last_end = end
+        state.last_seen = now
+        return speaker
+
+    def correct(self, session_id: str, speaker_number: int) -> None:
+        """Manual override: the current speaker is speaker_number"""
+        state = self._states.get(session_id)
+        if state is None:
+            state = self._states[session_id] = SpeakerState()
+        state.last_speaker = speaker_number
+
+    def stats(self, session_id: str) -> dict:
+        state = self._states.get(session_id)
+        return (state or SpeakerState()).to_dict()
+
+    def forget(self, session_id: str) -> None:
+        self._states.pop(session_id, None)
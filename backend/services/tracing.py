@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import requests
+from models.trace import SessionTrace, Span, new_trace_id
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "medical-scribe"
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+def _nanos(timestamp: float) -> str:
+    return str(int(timestamp * 1e9))
+
+def to_otlp(trace: SessionTrace) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest for one visit"""
+    spans = []
+    for span in [trace.root] + trace.spans:
+        end_time = span.end_time if span.end_time is not None else time.time()
+        otlp_span = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': _nanos(span.start_time),
+            'endTimeUnixNano': _nanos(end_time),
+            'attributes': _otlp_attributes(span.attributes),
+            'events': [
+                {'timeUnixNano': _nanos(event.timestamp), 'name': event.name,
+                 'attributes': _otlp_attributes(event.attributes)}
+                for event in span.events
+            ],
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+        }
+        if span.parent_span_id:
+            otlp_span['parentSpanId'] = span.parent_span_id
+        spans.append(otlp_span)
+
+    return {'resourceSpans': [{
+        'resource': {'attributes': _otlp_attributes({'service.name': SERVICE_NAME})},
+        'scopeSpans': [{'scope': {'name': SERVICE_NAME}, 'spans': spans}]
+    }]}
+
+class JsonFileExporter:
+    """Writes each finished visit timeline to <directory>/<trace_id>.json"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace: SessionTrace) -> None:
+        path = os.path.join(self.directory, f"{trace.trace_id}.json")
+        with open(path, 'w') as f:
+            json.dump(trace.to_dict(), f)
+
+class OtlpHttpExporter:
+    """Posts finished traces to an OTLP/HTTP collector (JSON encoding)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, trace: SessionTrace) -> None:
+        response = requests.post(self.endpoint, json=to_otlp(trace), timeout=self.timeout)
+        response.raise_for_status()
+
+class SessionTracer:
+    """Collects a trace per session_id and exports it when the visit finishes
+
+    Spans are kept in memory for the most recent `retained_traces` visits so
+    /get_session/<id>/timeline works after the fact. Export runs on a
+    background thread so a slow collector never holds up a request.
+
+    Spans recorded many times per visit (one per transcript segment) are
+    marked bulk; they stop `reserved_spans` short of max_spans_per_trace,
+    so a long visit still has room for its lifecycle and SOAP spans.
+    """
+
+    def __init__(self, exporter=None, max_spans_per_trace: int = 2000, retained_traces: int = 500,
+                 reserved_spans: int = 100):
+        self.exporter = exporter
+        self.max_spans_per_trace = max_spans_per_trace
+        self.reserved_spans = min(reserved_spans, max_spans_per_trace)
+        self.retained_traces = retained_traces
+        self._traces: "OrderedDict[str, SessionTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._export_queue: Optional[queue.Queue] = None
+        if exporter:
+            self._export_queue = queue.Queue(maxsize=1000)
+            threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True).start()
+
+    def start_trace(self, session_id: str, **attributes) -> SessionTrace:
+        """Begin a new visit trace, replacing any earlier one for the session"""
+        trace = SessionTrace(session_id, Span(new_trace_id(), "visit", attributes={'session_id': session_id, **attributes}))
+        with self._lock:
+            self._traces.pop(session_id, None)
+            self._traces[session_id] = trace
+            while len(self._traces) > self.retained_traces:
+                self._traces.popitem(last=False)
+        return trace
+
+    def get_trace(self, session_id: str) -> Optional[SessionTrace]:
+        with self._lock:
+            return self._traces.get(session_id)
+
+    def start_span(self, session_id: str, name: str, start_time: Optional[float] = None,
+                   bulk: bool = False, **attributes) -> Optional[Span]:
+        """Open a child span of the visit; returns None if the session has no trace"""
+        limit = self.max_spans_per_trace - self.reserved_spans if bulk else self.max_spans_per_trace
+        with self._lock:
+            trace = self._traces.get(session_id)
+            if trace is None:
+                return None
+            if len(trace.spans) >= limit:
+                trace.dropped_spans += 1
+                return None
+            span = Span(trace.trace_id, name, parent_span_id=trace.root.span_id, attributes=attributes)
+            if start_time is not None:
+                span.start_time = start_time
+            trace.spans.append(span)
+            return span
+
+    def record_span(self, session_id: str, name: str, start_time: float, end_time: float,
+                    error: Optional[str] = None, bulk: bool = False, **attributes) -> Optional[Span]:
+        """Add a span for something that already happened"""
+        span = self.start_span(session_id, name, start_time, bulk, **attributes)
+        if span:
+            span.end(error)
+            span.end_time = end_time
+        return span
+
+    @contextmanager
+    def span(self, session_id: str, name: str, **attributes):
+        """Time a block as a span; exceptions mark it as failed"""
+        span = self.start_span(session_id, name, **attributes)
+        try:
+            yield span
+        except Exception as e:
+            if span:
+                span.end(error=str(e))
+            raise
+        finally:
+            if span:
+                span.end()
+
+    def finish_trace(self, session_id: str, error: Optional[str] = None, **attributes) -> Optional[SessionTrace]:
+        """Close the visit span and queue the trace for export"""
+        trace = self.get_trace(session_id)
+        if trace is None or trace.finished:
+            return trace
+        trace.root.end(error, **attributes)
+        if self._export_queue is not None:
+            try:
+                self._export_queue.put_nowait(trace)
+            except queue.Full:
+                logger.warning("Trace export queue full, dropping trace", extra={'session_id': session_id})
+        return trace
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._traces.pop(session_id, None)
+
+    def _export_loop(self) -> None:
+        while True:
+            trace = self._export_queue.get()
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                logger.warning("Trace export failed: %s", e, extra={'session_id': trace.session_id})
+
+def create_trace_exporter(name: str, export_dir: str, otlp_endpoint: str):
+    """Build the trace exporter named in configuration"""
+    if name == "none":
+        return None
+    if name == "json":
+        return JsonFileExporter(export_dir)
+    if name == "otlp":
+        return OtlpHttpExporter(otlp_endpoint)
+    raise ValueError(f"Unknown TRACE_EXPORTER: {name}")
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer() -> SessionTracer:
+    """Process-wide session tracer, created on first use"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = SessionTracer(
+                create_trace_exporter(Config.TRACE_EXPORTER, Config.TRACE_EXPORT_DIR, Config.OTLP_ENDPOINT),
+                max_spans_per_trace=Config.TRACE_MAX_SPANS,
+                retained_traces=Config.TRACE_RETAINED,
+                reserved_spans=Config.TRACE_RESERVED_SPANS
+            )
+        return _tracer
@@ -0,0 +1,53 @@
+from typing import Iterable, List
+from models.transcript import TranscriptSegment
+from services.soap_drafter import CHARS_PER_TOKEN, take_within_budget
+
+def split_turns(segments: Iterable[TranscriptSegment]) -> List[List[TranscriptSegment]]:
+    """Group consecutive segments by the same speaker into turns"""
+    turns = []
+    for segment in segments:
+        if turns and turns[-1][0].speaker == segment.speaker:
+            turns[-1].append(segment)
+        else:
+            turns.append([segment])
+    return turns
+
+def chunk_transcript(segments: Iterable[TranscriptSegment], max_tokens: int) -> List[List[TranscriptSegment]]:
+    """Split a transcript into chunks of at most max_tokens, in order
+
+    Chunks break between speaker turns so a question and its answer stay
+    together where possible; only a single turn longer than max_tokens is
+    split, between its segments. A segment longer than max_tokens on its
+    own still becomes a chunk by itself.
+    """
+    chunks: List[List[TranscriptSegment]] = []
+    current: List[TranscriptSegment] = []
+    # Counted in characters, as estimate_tokens does, so per-turn rounding
+    # cannot let a chunk creep over max_tokens
+    budget = (max_tokens + 1) * CHARS_PER_TOKEN - 1
+    used = 0
+    for turn in split_turns(segments):
+        cost = _chars(turn)
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        if cost <= budget:
+            current.extend(turn)
+            used += cost
+            continue
+
+        # A monologue longer than a chunk: fill chunks segment by segment
+        remaining = turn
+        while remaining:
+            piece = take_within_budget(remaining, max_tokens)
+            remaining = remaining[len(piece):]
+            if remaining:
+                chunks.append(piece)
+            else:
+                current, used = piece, _chars(piece)
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _chars(segments: Iterable[TranscriptSegment]) -> int:
+    return sum(len(segment.formatted_text) + 1 for segment in segments)
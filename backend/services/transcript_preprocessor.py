@@ -0,0 +1,180 @@
+import re
+from typing import Iterable, List, Optional
+from models.transcript import TranscriptSegment, TranscriptStore
+from services.soap_drafter import CHARS_PER_TOKEN
+
+# Hesitations that carry no clinical content. Backchannels such as "mhm" and
+# "uh-huh" are kept: they are often the patient's answer
+_FILLER = r"(?:u+h+|u+m+|u+h+m+|e+r+m*|a+h+|h+m+)"
+_FILLER_RE = re.compile(rf",?\s*(?<!-)\b{_FILLER}\b(?!-)([,.?!]*)", re.IGNORECASE)
+_DISCOURSE_RE = re.compile(r",?\s*\b(?:you know|I mean),", re.IGNORECASE)
+# A word or short phrase said again straight away: "the the", "I, I think", "my- my back"
+_REPEAT_RE = re.compile(r"\b([a-z][\w']*(?:\s+[a-z][\w']*){0,2})(?:[,-]?\s+\1\b)+", re.IGNORECASE)
+# Repeats with nothing between them are often meant ("had had", "twenty twenty
+# vision"), so only these words are collapsed without a comma or dash break
+_STUTTER_WORDS = frozenset(
+    "a an the i i'm it it's my and but so or to of in on at is was we he she they you".split())
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([,.?!])")
+_SPACES_RE = re.compile(r"\s{2,}")
+
+_UNITS = {word: value for value, word in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+    "sixteen seventeen eighteen nineteen".split())}
+_TENS = {word: value * 10 for value, word in enumerate(
+    "twenty thirty forty fifty sixty seventy eighty ninety".split(), 2)}
+_SCALES = {'hundred': 100, 'thousand': 1000}
+_NUMBER_WORD = "(?:" + "|".join(sorted([*_UNITS, *_TENS, *_SCALES], key=len, reverse=True)) + ")"
+_DIGIT_WORD = "(?:" + "|".join(word for word, value in _UNITS.items() if value < 10) + ")"
+_SPOKEN_NUMBER = rf"{_NUMBER_WORD}(?:(?:\s+and)?[\s-]+{_NUMBER_WORD})*(?:\s+point(?:\s+{_DIGIT_WORD})+)?"
+# A reading such as "one twenty over eighty" is matched whole, so it is
+# either converted whole or left as it was said
+_NUMBER_RE = re.compile(rf"\b{_SPOKEN_NUMBER}(?:\s+over\s+{_SPOKEN_NUMBER})?\b", re.IGNORECASE)
+_OVER_RE = re.compile(r"\s+over\s+", re.IGNORECASE)
+
+
+def strip_disfluencies(text: str) -> str:
+    """Drop filler words and empty discourse markers"""
+    # Keep sentence punctuation that followed a filler ("the pain, uh. It" -> "the pain. It")
+    text = _FILLER_RE.sub(lambda match: (match.group(1).strip(",") or " ") + " ", text)
+    return _DISCOURSE_RE.sub(" ", text)
+
+
+def _collapse_repeat(match: re.Match) -> str:
+    phrase = match.group(1)
+    words = phrase.lower().split()
+    # Counts and readings are never disfluencies: "two two times", "seven seven seven"
+    if any(word in _UNITS or word in _TENS or word in _SCALES for word in words):
+        return match.group(0)
+    broken = any(char in ",-" for char in match.group(0)[len(phrase):])
+    if broken or (len(words) == 1 and words[0] in _STUTTER_WORDS):
+        return phrase
+    return match.group(0)
+
+
+def collapse_repeats(text: str) -> str:
+    """Collapse stutters and false starts that repeat the same words
+
+    A repeat is collapsed when a comma or dash breaks it ("I, I think",
+    "my- my back") or when it is a stuttered function word ("the the").
+    Number words are never collapsed.
+    """
+    return _REPEAT_RE.sub(_collapse_repeat, text)
+
+
+def _parse_number(words: List[str]) -> Optional[int]:
+    """Value of a well-formed spoken number, or None
+
+    Sequences such as "one twenty" (a blood pressure read digit group by
+    digit group) are not well formed and are left as words.
+    """
+    total = current = 0
+    # Magnitude of the last word, used to reject "five six" or "twenty thirty"
+    last = None
+    for word in words:
+        if word == 'and':
+            if last not in ('hundred', 'thousand'):
+                return None
+            continue
+        if word in _UNITS:
+            value = _UNITS[word]
+            if last == 'unit' or (last == 'tens' and value >= 10):
+                return None
+            current += value
+            last = 'unit'
+        elif word in _TENS:
+            if last in ('unit', 'tens'):
+                return None
+            current += _TENS[word]
+            last = 'tens'
+        elif word == 'hundred':
+            if last != 'unit' or current >= 100:
+                return None
+            current *= 100
+            last = 'hundred'
+        else:
+            if last is None or last == 'thousand' or total:
+                return None
+            total, current = (current or 1) * 1000, 0
+            last = 'thousand'
+    return total + current
+
+
+def _number_value(spoken: str) -> Optional[str]:
+    """Digits for one spoken number, or None if it is not well formed"""
+    whole, _, fraction = " ".join(spoken.lower().split()).partition(" point ")
+    value = _parse_number(whole.replace("-", " ").split())
+    if value is None:
+        return None
+    if fraction:
+        return f"{value}." + "".join(str(_UNITS[word]) for word in fraction.split())
+    return str(value)
+
+
+def _replace_number(match: re.Match) -> str:
+    spoken = match.group(0)
+    # "one" is as often a pronoun as a count
+    if spoken.lower() == 'one':
+        return spoken
+    values = [_number_value(part) for part in _OVER_RE.split(spoken)]
+    if None in values:
+        return spoken
+    return " over ".join(values)
+
+
+def normalize_numerals(text: str) -> str:
+    """Write spelled-out numbers as digits ("one hundred and twenty" -> "120")"""
+    return _NUMBER_RE.sub(_replace_number, text)
+
+
+def clean_text(text: str) -> str:
+    """Apply every text rule to one utterance"""
+    text = normalize_numerals(collapse_repeats(strip_disfluencies(text)))
+    text = _SPACES_RE.sub(" ", _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)).strip(" ,")
+    # Only punctuation left: the utterance was all filler
+    if not any(char.isalnum() for char in text):
+        return ""
+    return text[0].upper() + text[1:]
+
+
+def preprocess_transcript(segments: Iterable[TranscriptSegment],
+                          max_turn_tokens: Optional[int] = None) -> TranscriptStore:
+    """Shrink a transcript before it is put into a prompt
+
+    Utterances are cleaned with clean_text, dropped if nothing is left, and
+    consecutive utterances by the same speaker are merged into one turn so
+    the speaker label is written once. A merged turn is kept within
+    max_turn_tokens (use the SOAP chunk size) so chunk_transcript can still
+    split a long monologue; an utterance over the limit on its own is not
+    merged with anything. The rules are deterministic, so the same
+    transcript always gives the same prompt (and SOAP cache key).
+    """
+    cleaned = TranscriptStore()
+    turn: List[TranscriptSegment] = []
+    texts: List[str] = []
+    # Largest formatted turn, in characters, that estimate_tokens puts within max_turn_tokens
+    max_chars = (max_turn_tokens + 1) * CHARS_PER_TOKEN - 2 if max_turn_tokens else None
+
+    def flush():
+        if turn:
+            confidences = [segment.confidence for segment in turn if segment.confidence is not None]
+            cleaned.append(" ".join(texts), turn[0].speaker, turn[0].start, turn[-1].end,
+                           min(confidences) if confidences else None)
+            turn.clear()
+            texts.clear()
+
+    chars = 0  # formatted length of the turn so far
+    for segment in segments:
+        text = clean_text(segment.text)
+        if not text:
+            continue
+        if turn and (turn[0].speaker != segment.speaker or
+                     (max_chars is not None and chars + 1 + len(text) > max_chars)):
+            flush()
+        if not turn:
+            # Length of the speaker label, less the space the first text adds below
+            chars = len(segment.formatted_text) - len(segment.text) - 1
+        turn.append(segment)
+        texts.append(text)
+        chars += 1 + len(text)
+    flush()
+    return cleaned
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# Tests never talk to the real APIs, but Config still expects keys
+os.environ.setdefault('DEEPGRAM_API_KEY', 'test')
+os.environ.setdefault('GOOGLE_API_KEY', 'test')
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def service():
+    """MedicalScribeService on an in-memory store, with Deepgram streaming stubbed out"""
+    from services.medical_scribe_service import MedicalScribeService
+    from services.session_registry import InMemorySessionBackend, SessionRegistry
+
+    service = MedicalScribeService(sessions=SessionRegistry(InMemorySessionBackend()))
+    service.deepgram_service.start_streaming_session = lambda *args, **kwargs: True
+    service.deepgram_service.stop_streaming_session = lambda session_id: None
+    yield service
+    service.lifecycle.stop()
+    service.health.stop()
@@ -0,0 +1,28 @@
+import pytest
+
+from services.audio_pipeline import negotiate_audio_format
+
+
+def negotiate(sample_rate, encoding="linear16"):
+    return negotiate_audio_format(encoding, sample_rate, default_encoding="linear16",
+                                  target_sample_rate=16000, default_input_sample_rate=48000)
+
+
+@pytest.mark.parametrize("sample_rate, input_rate, output_rate", [
+    (None, 48000, 16000),
+    (44100, 44100, 16000),
+    ("22050", 22050, 16000),
+    (8000, 8000, 8000),
+    (192000, 192000, 16000),
+])
+def test_client_sample_rate_is_used(sample_rate, input_rate, output_rate):
+    audio_format = negotiate(sample_rate)
+    assert (audio_format.input_sample_rate, audio_format.sample_rate) == (input_rate, output_rate)
+
+
+@pytest.mark.parametrize("sample_rate", ["fast", "44.1k", ["44100"], float("nan"), float("inf"),
+                                         -16000, 4000, 192001, 10 ** 12])
+def test_invalid_sample_rate_falls_back_to_default(sample_rate, caplog):
+    audio_format = negotiate(sample_rate)
+    assert (audio_format.input_sample_rate, audio_format.sample_rate) == (48000, 16000)
+    assert "Invalid input sample rate" in caplog.text
@@ -0,0 +1,160 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from benchmarks.fake_deepgram import FakeDeepgramServer
+from config.settings import Config
+from services import deepgram_reconnect
+from services.audio_pipeline import AudioFormat
+from services.deepgram_reconnect import AudioReplayBuffer, TranscriptSeam, backoff_delay
+from services.deepgram_service import DeepgramService
+from services.service_container import create_deepgram_client
+
+SAMPLE_RATE = 16000
+BLOCK_MS = 100
+SPEED = 8  # send audio at 8x real time
+
+
+def tagged_block(index: int) -> bytes:
+    """100 ms of PCM the fake server transcribes as the word "w<index>" """
+    return np.full(SAMPLE_RATE * BLOCK_MS // 1000, index, dtype="<i2").tobytes()
+
+
+def word(text: str, start: float, end: float):
+    return SimpleNamespace(word=text, punctuated_word=text, start=start, end=end)
+
+
+def test_backoff_delay_doubles_up_to_cap(monkeypatch):
+    monkeypatch.setattr(deepgram_reconnect.random, 'uniform', lambda low, high: high)
+    assert [backoff_delay(attempt, 0.25, 2.0) for attempt in range(6)] == [0.25, 0.5, 1.0, 2.0, 2.0, 2.0]
+
+
+def test_backoff_delay_is_jittered():
+    delays = [backoff_delay(3, 0.25, 8.0) for _ in range(200)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_replay_buffer_keeps_last_seconds():
+    buffer = AudioReplayBuffer(bytes_per_second=1000, max_seconds=0.5)
+    for index in range(10):
+        buffer.append(bytes([index]) * 100)
+
+    assert [packet[0] for packet in buffer.packets()] == [5, 6, 7, 8, 9]
+    assert buffer.total_bytes == 1000
+    assert buffer.start_seconds == 0.5
+
+
+def test_replay_buffer_disabled_still_tracks_position():
+    buffer = AudioReplayBuffer(bytes_per_second=1000, max_seconds=0)
+    buffer.append(b"\0" * 300)
+    assert buffer.packets() == []
+    assert buffer.start_seconds == 0.3
+
+
+def test_seam_shifts_reconnected_timestamps():
+    seam = TranscriptSeam()
+    assert seam.place("w0 w1", 0.0, 0.2) == ("w0 w1", 0.0, 0.2, None)
+
+    seam.offset = 0.2
+    sentence, start, end, _ = seam.place("w2", 0.0, 0.1)
+    assert (sentence, start, end) == ("w2", 0.2, pytest.approx(0.3))
+
+
+def test_seam_drops_replayed_segment():
+    seam = TranscriptSeam()
+    seam.place("w0 w1 w2", 0.0, 0.3)
+
+    # Reconnected with 0.2 s of replay from 0.1 s
+    seam.offset = 0.1
+    assert seam.place("w1 w2", 0.0, 0.2, [word("w1", 0.0, 0.1), word("w2", 0.1, 0.2)]) is None
+    assert seam.dropped_segments == 1
+
+
+def test_seam_trims_repeated_words():
+    seam = TranscriptSeam()
+    seam.place("w0 w1 w2", 0.0, 0.3)
+
+    seam.offset = 0.1
+    words = [word("w1", 0.0, 0.1), word("w2", 0.1, 0.2), word("w3", 0.2, 0.3)]
+    sentence, start, end, kept = seam.place("w1 w2 w3", 0.0, 0.3, words)
+    assert sentence == "w3"
+    assert start == pytest.approx(0.3)
+    assert end == pytest.approx(0.4)
+    assert [w.word for w in kept] == ["w3"]
+    assert seam.trimmed_words == 2
+
+
+def stream_visit(server, seconds: float, attempts: int):
+    """Stream a tagged visit through DeepgramService; returns (heard, states, connection stats)"""
+    Config.DEEPGRAM_URL = server.url
+    Config.DEEPGRAM_RECONNECT_ATTEMPTS = attempts
+    deepgram = DeepgramService(create_deepgram_client())
+
+    heard = []
+    states = []
+    lock = threading.Lock()
+
+    def on_transcript(data):
+        with lock:
+            heard.extend(int(text[1:]) for text in data['text'].split())
+
+    audio_format = AudioFormat(encoding="linear16", sample_rate=SAMPLE_RATE, input_sample_rate=SAMPLE_RATE)
+    assert deepgram.start_streaming_session("visit", on_transcript, audio_format, on_connection_state=states.append)
+
+    blocks = int(seconds * 1000 // BLOCK_MS)
+    started = time.monotonic()
+    for index in range(blocks):
+        due = started + index * BLOCK_MS / 1000 / SPEED
+        time.sleep(max(0.0, due - time.monotonic()))
+        deepgram.send_audio_chunk_to_stream("visit", tagged_block(index))
+    stats = deepgram.get_send_queue_stats("visit")['connection']
+    deepgram.stop_streaming_session("visit")
+    return heard, states, stats
+
+
+@pytest.fixture
+def reconnect_config(monkeypatch):
+    for name in ('DEEPGRAM_URL', 'DEEPGRAM_RECONNECT_ATTEMPTS'):
+        monkeypatch.setattr(Config, name, getattr(Config, name))
+    monkeypatch.setattr(Config, 'DEEPGRAM_RECONNECT_BASE_MS', 50)
+    monkeypatch.setattr(Config, 'DEEPGRAM_RECONNECT_MAX_MS', 500)
+
+
+def test_forced_disconnects_lose_and_repeat_nothing(reconnect_config):
+    # The first reconnect after each drop is refused, so recovery needs backoff
+    with FakeDeepgramServer(drops=2, drop_after_seconds=3.0, refuse_after_drop=1) as server:
+        heard, states, stats = stream_visit(server, seconds=10, attempts=6)
+
+    assert server.stats['dropped'] == 2
+    assert server.stats['refused'] == 2
+    assert stats['reconnects'] == 2
+    assert states == ["reconnecting", "connected"] * 2
+    # Replay resent audio each new connection had transcribed already...
+    assert stats['replayed_bytes'] > 0
+    assert stats['duplicate_segments_dropped'] + stats['duplicate_words_trimmed'] > 0
+    # ...and the seam kept exactly one copy of every block, in order
+    assert heard == list(range(100))
+
+
+def test_without_reconnect_audio_after_drop_is_lost(reconnect_config):
+    with FakeDeepgramServer(drops=1, drop_after_seconds=3.0) as server:
+        heard, states, stats = stream_visit(server, seconds=6, attempts=0)
+
+    assert states == ["reconnecting", "failed"]
+    assert stats['failed']
+    assert heard == list(range(len(heard)))
+    assert len(heard) <= 30
+
+
+def test_gives_up_after_reconnect_attempts(reconnect_config):
+    with FakeDeepgramServer(drops=1, drop_after_seconds=1.0, refuse_after_drop=10) as server:
+        heard, states, stats = stream_visit(server, seconds=4, attempts=3)
+
+    assert server.stats['refused'] == 3
+    assert states == ["reconnecting", "failed"]
+    assert stats['reconnects'] == 0
+    assert stats['failed']
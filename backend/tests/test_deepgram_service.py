@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from benchmarks.fake_deepgram import FakeDeepgramServer
+from config.settings import Config
+from services.audio_pipeline import AudioFormat
+from services.deepgram_service import DeepgramService
+from services.service_container import create_deepgram_client
+from tests.test_deepgram_reconnect import SAMPLE_RATE, tagged_block
+
+
+class Words:
+    def __init__(self):
+        self.heard = []
+        self._lock = threading.Lock()
+
+    def __call__(self, data):
+        with self._lock:
+            self.heard.extend(int(text[1:]) for text in data['text'].split())
+
+
+@pytest.fixture
+def deepgram(monkeypatch):
+    with FakeDeepgramServer() as server:
+        monkeypatch.setattr(Config, 'DEEPGRAM_URL', server.url)
+        service = DeepgramService(create_deepgram_client())
+        service.server = server
+        yield service
+        for session_id in list(service.streams):
+            service.stop_streaming_session(session_id)
+
+
+def test_repeated_start_replaces_running_stream(deepgram):
+    audio_format = AudioFormat(encoding="linear16", sample_rate=SAMPLE_RATE, input_sample_rate=SAMPLE_RATE)
+    first, second = Words(), Words()
+
+    assert deepgram.start_streaming_session("visit", first, audio_format)
+    old_stream, old_queue = deepgram.streams["visit"], deepgram.send_queues["visit"]
+    for index in range(10):
+        deepgram.send_audio_chunk_to_stream("visit", tagged_block(index))
+
+    assert deepgram.start_streaming_session("visit", second, audio_format)
+    # The first stream was stopped: its sender has exited and its last results were delivered
+    assert old_stream.closed.is_set()
+    old_queue._thread.join(1)
+    assert not old_queue._thread.is_alive()
+    assert first.heard == list(range(10))
+
+    for index in range(10, 20):
+        deepgram.send_audio_chunk_to_stream("visit", tagged_block(index))
+    deepgram.stop_streaming_session("visit")
+
+    assert first.heard == list(range(10))
+    assert second.heard == list(range(10, 20))
+    assert deepgram.server.stats['connections'] == 2
+    assert "visit" not in deepgram.streams and "visit" not in deepgram.send_queues
@@ -0,0 +1,47 @@
+import pytest
+
+from models.responses import SOAPNoteResult
+from models.soap_job import SoapJob, SoapJobStatus
+from services.metrics import REGISTRY, STOP_TO_SOAP_TIMER
+
+
+def active_sessions():
+    return REGISTRY.get_sample_value('scribe_active_sessions')
+
+
+def test_active_sessions_gauge_does_not_query_the_store(service, monkeypatch):
+    service.create_session('one')
+    service.create_session('two')
+    service.start_recording('one')
+    service.start_recording('two')
+
+    def list_sessions(*args):
+        raise AssertionError("gauge queried the session store")
+    monkeypatch.setattr(service.sessions, 'list_sessions', list_sessions)
+    assert active_sessions() == 2
+
+    service.stop_recording('one')
+    assert active_sessions() == 1
+    service.cleanup_session('two')
+    assert active_sessions() == 0
+
+
+def stop_to_soap_count():
+    return REGISTRY.get_sample_value('scribe_stop_to_soap_note_seconds_count') or 0
+
+
+@pytest.mark.parametrize("result", [
+    SOAPNoteResult(success=True, soap_note="S: ..."),
+    SOAPNoteResult(success=False, error="quota exceeded"),
+])
+def test_stop_to_soap_timer_closed_without_socketio(service, result):
+    assert service.socketio is None
+    STOP_TO_SOAP_TIMER.start('visit')
+    observed = stop_to_soap_count()
+    job = SoapJob(job_id='job', session_id='visit', dedup_key='visit',
+                  status=SoapJobStatus.COMPLETED if result.success else SoapJobStatus.FAILED)
+
+    service._on_soap_job_update(job, result)
+
+    assert 'visit' not in STOP_TO_SOAP_TIMER._started
+    assert stop_to_soap_count() == observed + result.success
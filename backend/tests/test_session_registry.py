@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from models.session import RecordingSession, SessionStatus
+from services.session_registry import RedisSessionBackend, SessionRegistry, SqliteSessionBackend
+
+
+def recording(session_id, *texts):
+    session = RecordingSession(session_id=session_id, status=SessionStatus.RECORDING)
+    for index, text in enumerate(texts):
+        session.segments.append(text, 1, index * 4.0, index * 4.0 + 4.0, 0.98)
+    return session
+
+
+@pytest.fixture
+def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisSessionBackend(fakeredis.FakeRedis())
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    backend = SqliteSessionBackend(str(tmp_path / "sessions.db"))
+    yield backend
+    backend.close()
+
+
+def test_sqlite_reopened_id_replaces_segments(sqlite_backend):
+    sqlite_backend.save(recording("visit", "one", "two", "three"))
+    sqlite_backend.flush()
+
+    sqlite_backend.save(recording("visit", "again"))
+    sqlite_backend.unload("visit")
+
+    session = sqlite_backend.get("visit")
+    assert [segment['raw_text'] for segment in session.segments.to_list()] == ["again"]
+
+
+def test_sqlite_reopened_id_before_flush(sqlite_backend):
+    sqlite_backend.save(recording("visit", "one", "two", "three"))
+    reopened = recording("visit", "again")
+    sqlite_backend.save(reopened)
+    reopened.segments.append("and more", 2, 4.0, 8.0, 0.98)
+    sqlite_backend.save(reopened)
+    sqlite_backend.unload("visit")
+
+    session = sqlite_backend.get("visit")
+    assert [segment['raw_text'] for segment in session.segments.to_list()] == ["again", "and more"]
+
+
+def test_sqlite_appends_to_same_session(sqlite_backend):
+    session = recording("visit", "one")
+    sqlite_backend.save(session)
+    sqlite_backend.flush()
+    session.segments.append("two", 2, 4.0, 8.0, 0.98)
+    sqlite_backend.save(session)
+    sqlite_backend.unload("visit")
+
+    loaded = sqlite_backend.get("visit")
+    assert [segment['raw_text'] for segment in loaded.segments.to_list()] == ["one", "two"]
+    assert sqlite_backend.stats()['segments_written'] == 2
+
+
+def test_redis_reopened_id_replaces_segments(redis_backend):
+    finished = recording("visit", "one", "two", "three")
+    finished.status = SessionStatus.COMPLETED
+    redis_backend.save(finished)
+
+    redis_backend.save(recording("visit", "again"))
+    redis_backend.unload("visit")
+
+    session = redis_backend.get("visit")
+    assert [segment['raw_text'] for segment in session.segments.to_list()] == ["again"]
+    assert redis_backend.list_sessions("completed", 0, 10)[1] == 0
+    assert redis_backend.list_sessions("recording", 0, 10)[1] == 1
+
+
+def test_redis_snapshot_from_another_worker_is_not_duplicated(redis_backend):
+    redis_backend.save(recording("visit", "one", "two"))
+    other_worker = RedisSessionBackend(redis_backend.client)
+
+    snapshot = other_worker.get("visit")
+    snapshot.status = SessionStatus.PROCESSING
+    other_worker.save(snapshot)
+
+    session = other_worker.get("visit")
+    assert [segment['raw_text'] for segment in session.segments.to_list()] == ["one", "two"]
+    assert other_worker.list_sessions("recording", 0, 10)[1] == 0
+
+
+def test_redis_appends_to_same_session(redis_backend):
+    session = recording("visit", "one")
+    redis_backend.save(session)
+    session.segments.append("two", 2, 4.0, 8.0, 0.98)
+    redis_backend.save(session)
+    redis_backend.unload("visit")
+
+    loaded = redis_backend.get("visit")
+    assert [segment['raw_text'] for segment in loaded.segments.to_list()] == ["one", "two"]
+
+
+def test_listing_waits_for_disk_without_blocking_live_sessions(sqlite_backend, monkeypatch):
+    registry = SessionRegistry(sqlite_backend)
+    live = recording("live", "one")
+    registry.save(live)
+    sqlite_backend.flush()
+
+    write_batch = sqlite_backend._write_batch
+
+    def slow_write_batch(*args):
+        time.sleep(0.5)
+        write_batch(*args)
+    monkeypatch.setattr(sqlite_backend, '_write_batch', slow_write_batch)
+
+    registry.save(recording("other", "two"))
+    listed = {}
+    for call in (lambda: listed.update(page=registry.list_sessions()), lambda: listed.update(count=len(registry)),
+                 lambda: registry.unload("other")):
+        threading.Thread(target=call, daemon=True).start()
+    time.sleep(0.05)
+
+    # The listing threads are waiting on the slow flush; the audio path is not
+    started = time.monotonic()
+    live.segments.append("two", 2, 4.0, 8.0, 0.98)
+    registry.save(live)
+    assert registry.get("live") is live
+    assert time.monotonic() - started < 0.2
+
+    sqlite_backend.flush()
+    deadline = time.monotonic() + 5
+    while len(listed) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert listed['page'][1] == 2 and listed['count'] == 2
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+from cryptography.fernet import Fernet
+
+from services.soap_cache import EncryptedDiskCacheTier, MemoryCacheTier, SoapResultCache
+
+
+@pytest.fixture
+def fernet_key():
+    return Fernet.generate_key()
+
+
+def disk_cache(directory, key):
+    return SoapResultCache(MemoryCacheTier(), EncryptedDiskCacheTier(str(directory), key))
+
+
+def count_disk_reads(monkeypatch, disk):
+    reads = []
+    original = disk.get
+
+    def get(key):
+        reads.append(key)
+        return original(key)
+
+    monkeypatch.setattr(disk, 'get', get)
+    return reads
+
+
+def test_purge_keeps_entries_other_sessions_use():
+    cache = SoapResultCache()
+    cache.put("shared", "note", session_id="a")
+    cache.get("shared", session_id="b")
+    cache.put("only-a", "note", session_id="a")
+
+    assert cache.purge_session("a") == 1
+    assert cache.get("only-a") is None
+    assert cache.get("shared") == "note"
+    assert cache.purge_session("b") == 1
+    assert cache.get("shared") is None
+    assert cache.stats()['purged'] == 2
+
+
+def test_disk_purge_only_reads_the_sessions_entries(tmp_path, fernet_key, monkeypatch):
+    cache = disk_cache(tmp_path, fernet_key)
+    for index in range(20):
+        cache.put(f"other-{index}", "note", session_id=f"other-{index}")
+    cache.put("mine", "note", session_id="mine")
+
+    reads = count_disk_reads(monkeypatch, cache.disk)
+    assert cache.purge_session("mine") == 1
+    assert reads == ["mine"]
+    assert not (tmp_path / "mine.soap").exists()
+    assert (tmp_path / "other-0.soap").exists()
+
+
+def test_disk_index_survives_restart(tmp_path, fernet_key):
+    cache = disk_cache(tmp_path, fernet_key)
+    cache.put("shared", "note", session_id="a")
+    cache.get("shared", session_id="b")
+
+    restarted = disk_cache(tmp_path, fernet_key)
+    assert restarted.purge_session("a") == 0
+    assert restarted.disk.get("shared").session_ids == {"b"}
+    assert restarted.purge_session("b") == 1
+    assert not (tmp_path / "shared.soap").exists()
+
+
+def test_disk_purge_does_not_block_lookups(tmp_path, fernet_key, monkeypatch):
+    cache = disk_cache(tmp_path, fernet_key)
+    cache.put("slow", "note", session_id="slow")
+    cache.put("other", "note", session_id="other")
+
+    reading = threading.Event()
+    release = threading.Event()
+    original = cache.disk.get
+
+    def slow_get(key):
+        if key == "slow":
+            reading.set()
+            release.wait(5)
+        return original(key)
+
+    monkeypatch.setattr(cache.disk, 'get', slow_get)
+    purge = threading.Thread(target=cache.purge_session, args=("slow",))
+    purge.start()
+    try:
+        assert reading.wait(5)
+        # The purge is mid-decrypt; memory hits for other sessions still answer
+        assert cache.get("other", session_id="other") == "note"
+        assert cache.stats()['memory_entries'] == 1
+    finally:
+        release.set()
+        purge.join(5)
+    assert cache.get("slow") is None
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from models.responses import SOAPNoteResult
+from models.session import RecordingSession
+from models.soap_job import SoapJob
+from services.session_registry import InMemorySessionBackend, SessionRegistry
+from services.soap_drafter import RollingSoapDrafter, estimate_tokens
+
+
+class FakeGemini:
+    """Records update_soap_draft calls; each takes `delay` seconds"""
+
+    chunk_tokens = 100000
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def update_soap_draft(self, draft, segments, final=False, on_chunk=None):
+        started = time.monotonic()
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append({'segments': list(segments), 'final': final,
+                               'started': started, 'finished': time.monotonic()})
+        return SOAPNoteResult(success=True, soap_note=f"{draft}+{len(segments)}")
+
+
+def recording_session(session_id, segments, words_each=20):
+    session = RecordingSession(session_id=session_id, is_recording=True)
+    for index in range(segments):
+        session.segments.append(" ".join(["word"] * words_each), 1 + index % 2)
+    return session
+
+
+def test_drafts_for_concurrent_visits_run_in_parallel():
+    gemini = FakeGemini(delay=0.3)
+    sessions = SessionRegistry(InMemorySessionBackend())
+    drafter = RollingSoapDrafter(gemini, sessions, token_budget=10, workers=2)
+    visits = [recording_session(f"visit-{index}", 5) for index in range(2)]
+    for visit in visits:
+        sessions.save(visit)
+
+    started = time.monotonic()
+    for visit in visits:
+        drafter.note_segment(visit)
+    while any(visit.soap_draft_seq == 0 for visit in visits) and time.monotonic() - started < 5:
+        time.sleep(0.01)
+
+    assert all(visit.soap_draft_seq == 5 for visit in visits)
+    first, second = sorted(gemini.calls, key=lambda call: call['started'])[:2]
+    assert second['started'] < first['finished']
+    for visit in visits:
+        drafter.stop_session(visit.session_id)
+
+
+def test_final_merge_of_a_long_delta_is_sent_in_bounded_pieces(service):
+    gemini = FakeGemini()
+    service.gemini_service = gemini
+    service.soap_drafter = RollingSoapDrafter(gemini, service.sessions, max_delta_tokens=100, workers=1)
+
+    session = recording_session("visit", 40)
+    session.is_recording = False
+    session.soap_draft, session.soap_draft_seq = "draft", 2
+    service.sessions.save(session)
+
+    result = service._generate_for_job(SoapJob(job_id="job", session_id="visit", dedup_key="visit"), session, None)
+
+    assert result.success
+    assert len(gemini.calls) > 1
+    assert all(estimate_tokens(call['segments']) <= 100 for call in gemini.calls)
+    assert [call['final'] for call in gemini.calls] == [False] * (len(gemini.calls) - 1) + [True]
+    # Every undrafted segment is sent once (renumbered by preprocessing)
+    assert sum(len(call['segments']) for call in gemini.calls) == 38
+    # Progress is kept, so a retry would only merge the last piece
+    assert session.soap_draft_seq == 40 - len(gemini.calls[-1]['segments'])
+
+
+def test_short_final_delta_is_one_merge(service):
+    gemini = FakeGemini()
+    service.gemini_service = gemini
+    service.soap_drafter = RollingSoapDrafter(gemini, service.sessions, max_delta_tokens=4000, workers=1)
+
+    session = recording_session("visit", 10)
+    session.soap_draft, session.soap_draft_seq = "draft", 4
+    service._generate_for_job(SoapJob(job_id="job", session_id="visit", dedup_key="visit"), session, None)
+
+    assert [(len(call['segments']), call['final']) for call in gemini.calls] == [(6, True)]
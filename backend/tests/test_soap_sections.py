@@ -0,0 +1,46 @@
+import pytest
+
+from services.soap_sections import SoapSectionTracker
+
+
+def sections(text, chunk_size=3):
+    tracker = SoapSectionTracker()
+    started = []
+    for start in range(0, len(text), chunk_size):
+        started.extend(tracker.feed(text[start:start + chunk_size]))
+    tracker.feed("\n")
+    return started
+
+
+@pytest.mark.parametrize("heading, section", [
+    ("Subjective:", "subjective"),
+    ("**OBJECTIVE**", "objective"),
+    ("## Assessment and Plan", "assessment"),
+    ("Plan - follow up in two weeks", "plan"),
+    ("S: chest pain", "subjective"),
+    ("**O:** BP 120/80", "objective"),
+    ("A) Atrial fibrillation", "assessment"),
+    ("P:", "plan"),
+])
+def test_headings(heading, section):
+    assert sections(heading + "\n") == [section]
+
+
+@pytest.mark.parametrize("line", [
+    "- A-fib on ECG",
+    "P-waves absent",
+    "A–fib noted",
+    "S. aureus cultured",
+    "a) first item",
+    "Patient has a plan to return.",
+])
+def test_body_lines_are_not_headings(line):
+    assert sections(line + "\n") == []
+
+
+def test_body_lines_do_not_switch_sections():
+    tracker = SoapSectionTracker()
+    note = "Objective:\n- A-fib on ECG\nP-waves absent\nAssessment: paroxysmal AF\n"
+    assert tracker.feed(note) == ["objective", "assessment"]
+    assert tracker.current == "assessment"
+    assert tracker.completed == ["objective"]
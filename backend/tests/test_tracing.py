@@ -0,0 +1,44 @@
+import time
+
+from services.tracing import SessionTracer
+
+
+def test_bulk_spans_leave_room_for_lifecycle_and_soap_spans():
+    tracer = SessionTracer(max_spans_per_trace=50, reserved_spans=5)
+    tracer.start_trace("visit")
+    with tracer.span("visit", "start_recording"):
+        pass
+
+    now = time.time()
+    for seq in range(200):
+        tracer.record_span("visit", "transcript.segment", now, now, bulk=True, seq=seq)
+
+    with tracer.span("visit", "stop_recording"):
+        pass
+    with tracer.span("visit", "soap.attempt", attempt=1):
+        pass
+    tracer.record_span("visit", "soap.generation", now, time.time())
+
+    trace = tracer.get_trace("visit")
+    names = [span.name for span in trace.spans]
+    assert names.count("transcript.segment") == 44
+    assert names[-3:] == ["stop_recording", "soap.attempt", "soap.generation"]
+    assert trace.dropped_spans == 200 - 44
+
+
+def test_span_cap_still_applies_to_reserved_spans():
+    tracer = SessionTracer(max_spans_per_trace=10, reserved_spans=3)
+    tracer.start_trace("visit")
+    for attempt in range(15):
+        with tracer.span("visit", "soap.attempt", attempt=attempt):
+            pass
+
+    trace = tracer.get_trace("visit")
+    assert len(trace.spans) == 10
+    assert trace.dropped_spans == 5
+
+
+def test_spans_without_a_trace_are_ignored():
+    tracer = SessionTracer()
+    assert tracer.start_span("unknown", "stop_recording") is None
+    assert tracer.record_span("unknown", "transcript.segment", 0.0, 1.0, bulk=True) is None
@@ -0,0 +1,50 @@
+import random
+
+from models.transcript import TranscriptStore
+from services.soap_drafter import estimate_tokens, take_within_budget
+from services.transcript_chunker import chunk_transcript, split_turns
+
+
+def transcript(*utterances):
+    store = TranscriptStore()
+    for speaker, text in utterances:
+        store.append(text, speaker)
+    return list(store)
+
+
+def test_split_turns_groups_consecutive_speakers():
+    segments = transcript((1, "a"), (1, "b"), (2, "c"), (1, "d"))
+    assert [[segment.text for segment in turn] for turn in split_turns(segments)] == [["a", "b"], ["c"], ["d"]]
+
+
+def test_chunks_break_between_turns():
+    segments = transcript((1, "Where does it hurt? " * 3), (2, "My lower back. " * 3),
+                          (1, "Since when? " * 3), (2, "Two weeks. " * 3))
+    chunks = chunk_transcript(segments, max_tokens=40)
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    assert [segment for chunk in chunks for segment in chunk] == segments
+
+
+def test_long_monologue_is_split_between_segments():
+    segments = transcript(*[(1, "The patient reports intermittent chest pain.")] * 30)
+    chunks = chunk_transcript(segments, max_tokens=50)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+    assert [segment for chunk in chunks for segment in chunk] == segments
+
+
+def test_take_within_budget_counts_like_estimate_tokens():
+    # 13 + 1 characters each: 3 tokens by segment, 3.5 in total
+    segments = transcript(*[(None, "x" * 13)] * 40)
+    taken = take_within_budget(segments, 30)
+    assert estimate_tokens(taken) <= 30
+    assert estimate_tokens(segments[:len(taken) + 1]) > 30
+
+
+def test_chunks_stay_within_budget():
+    rng = random.Random(7)
+    segments = transcript(*[(rng.choice([1, 1, 2]), "word " * rng.randint(1, 40)) for _ in range(300)])
+    for max_tokens in (60, 200, 1000):
+        chunks = chunk_transcript(segments, max_tokens)
+        assert all(estimate_tokens(chunk) <= max_tokens for chunk in chunks)
+        assert [segment for chunk in chunks for segment in chunk] == segments
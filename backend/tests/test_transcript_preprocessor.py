@@ -0,0 +1,85 @@
+import pytest
+
+from models.transcript import TranscriptStore
+from services.transcript_preprocessor import (clean_text, collapse_repeats, normalize_numerals,
+                                              preprocess_transcript, strip_disfluencies)
+from services.soap_drafter import estimate_tokens
+from services.transcript_chunker import chunk_transcript
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("the the pain", "the pain"),
+    ("I, I think so", "I think so"),
+    ("my- my back", "my back"),
+    ("it it it hurts", "it hurts"),
+    # Repeats that are meant, or that carry values, are kept
+    ("I had had a fever", "I had had a fever"),
+    ("You have twenty twenty vision", "You have twenty twenty vision"),
+    ("seven seven seven is the code", "seven seven seven is the code"),
+    ("Take two two times a day", "Take two two times a day"),
+    ("take 5 5 mg", "take 5 5 mg"),
+    ("I think I think so", "I think I think so"),
+])
+def test_collapse_repeats(text, expected):
+    assert collapse_repeats(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("one hundred and twenty", "120"),
+    ("fifty-five years old", "55 years old"),
+    ("one point five milligrams", "1.5 milligrams"),
+    ("blood pressure one hundred twenty over eighty", "blood pressure 120 over 80"),
+    ("twenty twenty vision", "twenty twenty vision"),
+    ("seven seven seven", "seven seven seven"),
+    # Read digit group by digit group: converted whole or not at all
+    ("one twenty over eighty", "one twenty over eighty"),
+    ("eighty over one twenty", "eighty over one twenty"),
+    ("no one came", "no one came"),
+])
+def test_normalize_numerals(text, expected):
+    assert normalize_numerals(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Um, the pain, uh. It started, you know, two days ago", "The pain. It started 2 days ago"),
+    ("Uh-huh", "Uh-huh"),
+    ("um, uh", ""),
+    ("You have twenty twenty vision", "You have twenty twenty vision"),
+    ("Take two two times a day", "Take two two times a day"),
+    ("BP, uh, one twenty over eighty", "BP one twenty over eighty"),
+])
+def test_clean_text(text, expected):
+    assert clean_text(text) == expected
+
+
+def test_strip_disfluencies_keeps_backchannels():
+    assert strip_disfluencies("mhm, uh, yes").split() == ["mhm", "yes"]
+
+
+def test_preprocess_merges_turns_and_drops_empty_utterances():
+    transcript = TranscriptStore()
+    transcript.append("Um, where does it hurt?", 1, 0.0, 1.0, 0.9)
+    transcript.append("My- my lower back.", 2, 1.0, 2.0, 0.8)
+    transcript.append("Uh.", 2, 2.0, 2.5, 0.7)
+    transcript.append("For two weeks.", 2, 2.5, 3.5, 0.95)
+
+    cleaned = list(preprocess_transcript(transcript))
+    assert [(segment.speaker, segment.text) for segment in cleaned] == [
+        (1, "Where does it hurt?"), (2, "My lower back. For 2 weeks.")]
+    assert (cleaned[1].start, cleaned[1].end, cleaned[1].confidence) == (1.0, 3.5, 0.8)
+
+
+def test_preprocessed_turns_stay_within_chunk_budget():
+    transcript = TranscriptStore()
+    # A dictated exam: one speaker for the whole stretch
+    for index in range(400):
+        transcript.append(f"Um, finding number {index}: the the lungs are clear to auscultation bilaterally.", 1)
+    transcript.append("Okay.", 2)
+
+    assert len(list(preprocess_transcript(transcript))) == 2
+    for max_tokens in (50, 300, 1200):
+        cleaned = list(preprocess_transcript(transcript, max_turn_tokens=max_tokens))
+        assert all(estimate_tokens([segment]) <= max_tokens for segment in cleaned)
+        chunks = chunk_transcript(cleaned, max_tokens)
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= max_tokens for chunk in chunks)
@@ -0,0 +1,26 @@
+"""Production entry point: the app under gunicorn's gevent worker
+
+    pip install gevent gunicorn
+    gunicorn --worker-class gevent --workers 1 --bind 0.0.0.0:5001 wsgi:app
+
+Each audio stream, Deepgram connection and SOAP job runs as a greenlet, and
+the Deepgram (websockets) and Gemini (REST over requests) SDK calls yield
+while they wait on the network, so SOAP_WORKERS can be raised well past
+the threaded default without the cost of OS threads.
+
+CPU-bound work still holds up the whole process while it runs, so run one
+process per core. Socket.IO needs sticky sessions: scale out with several
+single-worker gunicorn processes behind a load balancer that pins each
+client to one of them, all sharing SOCKETIO_MESSAGE_QUEUE and
+SESSION_BACKEND=redis.
+"""
+from gevent import monkey
+
+# Before anything else imports socket, ssl or threading
+monkey.patch_all()
+
+from app_factory import create_app  # noqa: E402
+from config.settings import Config  # noqa: E402
+
+Config.ASYNC_MODE = 'gevent'
+app, socketio = create_app(Config)
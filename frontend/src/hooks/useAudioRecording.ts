@@ -1,5 +1,8 @@
 import { useRef, useCallback } from "react";
 
+// PCM sample rate the worklet produces; the server resamples it for Deepgram
+export const CAPTURE_SAMPLE_RATE = 48000;
+
 interface UseAudioRecordingReturn {
   startRecording: (
     onAudioChunk: (data: string | ArrayBuffer) => void
@@ -12,13 +15,6 @@ export const useAudioRecording = (): UseAudioRecordingReturn => {
   const streamRef = useRef<MediaStream | null>(null);
   const workletNodeRef = useRef<AudioWorkletNode | null>(null);
 
-  const encodeArrayBufferToBase64 = (arrayBuffer: ArrayBuffer): string => {
-    const bytes = new Uint8Array(arrayBuffer);
-    let binary = "";
-    bytes.forEach((b) => (binary += String.fromCharCode(b)));
-    return btoa(binary);
-  };
-
   const startRecording = useCallback(
     async (onAudioChunk: (data: string | ArrayBuffer) => void) => {
       try {
@@ -33,8 +29,10 @@ export const useAudioRecording = (): UseAudioRecordingReturn => {
 
         streamRef.current = stream;
 
-        // Create AudioContext (defaults to 48 kHz on most browsers)
-        const audioContext = new AudioContext();
+        // Pin the capture rate so it matches what we announce to the server
+        const audioContext = new AudioContext({
+          sampleRate: CAPTURE_SAMPLE_RATE,
+        });
         audioContextRef.current = audioContext;
 
         // Load the PCM worklet
@@ -44,13 +42,10 @@ export const useAudioRecording = (): UseAudioRecordingReturn => {
         const workletNode = new AudioWorkletNode(audioContext, "pcm-processor");
         workletNodeRef.current = workletNode;
 
-        // Handle ArrayBuffer chunks from the worklet
+        // Forward ArrayBuffer chunks from the worklet as binary attachments
         workletNode.port.onmessage = (event) => {
           if (event.data) {
-            const base64Data = encodeArrayBufferToBase64(
-              event.data as ArrayBuffer
-            );
-            onAudioChunk(base64Data);
+            onAudioChunk(event.data as ArrayBuffer);
           }
         };
 
@@ -1,6 +1,12 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import io, { Socket } from "socket.io-client";
-import { RecordingSession, LiveTranscriptionData } from "../types";
+import {
+  RecordingSession,
+  LiveTranscriptionData,
+  SoapNotePartialData,
+  TranscriptResyncData,
+} from "../types";
+import { CAPTURE_SAMPLE_RATE } from "./useAudioRecording";
 
 interface UseSocketReturn {
   socket: Socket | null;
@@ -19,13 +25,52 @@ export const useSocket = (
   const [socket, setSocket] = useState<Socket | null>(null);
   const [isConnected, setIsConnected] = useState(false);
 
+  // Transcript segments received so far, indexed by seq - 1
+  const sessionIdRef = useRef<string | null>(null);
+  const segmentsRef = useRef<string[]>([]);
+
+  // Audio held back while the server asks us to pause (audio_backpressure)
+  const audioPausedRef = useRef(false);
+  const pendingAudioRef = useRef<(string | ArrayBuffer)[]>([]);
+
+  // SOAP note text streamed so far for the current job attempt
+  const soapStreamKeyRef = useRef<string | null>(null);
+  const soapDraftRef = useRef("");
+
   useEffect(() => {
     const newSocket = io(API_BASE_URL);
     setSocket(newSocket);
 
+    const requestResync = () => {
+      if (!sessionIdRef.current) return;
+      newSocket.emit("resync_transcript", {
+        session_id: sessionIdRef.current,
+        since_seq: segmentsRef.current.length,
+      });
+    };
+
+    const applySegment = (seq: number, text: string): boolean => {
+      if (seq <= segmentsRef.current.length) return false; // duplicate
+      if (seq !== segmentsRef.current.length + 1) {
+        requestResync(); // gap - fetch what we missed
+        return false;
+      }
+      segmentsRef.current.push(text);
+      return true;
+    };
+
+    const publishTranscript = () => {
+      onSessionUpdate({ transcript: segmentsRef.current.join(" ") });
+      newSocket.emit("transcript_ack", {
+        session_id: sessionIdRef.current,
+        seq: segmentsRef.current.length,
+      });
+    };
+
     newSocket.on("connect", () => {
       setIsConnected(true);
       console.log("Connected to server");
+      requestResync();
     });
 
     newSocket.on("disconnect", () => {
@@ -62,22 +107,108 @@ export const useSocket = (
       onProcessingUpdate("");
     });
 
+    // Running draft kept up to date during the visit (SOAP_ROLLING_DRAFT)
+    newSocket.on("soap_draft_updated", (data) => {
+      if (data.session_id !== sessionIdRef.current) return;
+
+      onSessionUpdate({ soapNote: data.soap_draft });
+    });
+
+    newSocket.on("soap_note_partial", (data: SoapNotePartialData) => {
+      if (data.session_id !== sessionIdRef.current) return;
+
+      // A retry streams the note again from the start
+      const streamKey = `${data.job_id}:${data.attempt}`;
+      if (soapStreamKeyRef.current !== streamKey) {
+        soapStreamKeyRef.current = streamKey;
+        soapDraftRef.current = "";
+      }
+      soapDraftRef.current += data.chunk;
+
+      onSessionUpdate({ soapNote: soapDraftRef.current });
+      if (data.section) {
+        onProcessingUpdate(`Writing ${data.section} section...`);
+      }
+    });
+
+    newSocket.on("soap_job_status", (data) => {
+      if (data.session_id !== sessionIdRef.current) return;
+
+      if (data.status === "queued") {
+        onProcessingUpdate("Waiting for a SOAP note worker...");
+      } else if (data.status === "running") {
+        onProcessingUpdate("Generating SOAP note...");
+      } else if (data.status === "retrying") {
+        onProcessingUpdate(
+          `SOAP generation hit a temporary error, retrying (attempt ${data.attempts})...`
+        );
+      }
+    });
+
+    newSocket.on("soap_generation_error", (data) => {
+      if (data.session_id !== sessionIdRef.current) return;
+
+      onSessionUpdate({ status: `Error: ${data.error}` });
+      onProcessingUpdate("");
+    });
+
     newSocket.on("processing_error", (data) => {
       onSessionUpdate({ status: `Error: ${data.error}` });
       onProcessingUpdate("");
     });
 
-    // Enhanced live transcription with speaker information
+    // Live transcription arrives as numbered deltas with speaker information
     newSocket.on("live_transcription", (data: LiveTranscriptionData) => {
-      console.log("Live transcription received:", {
-        speaker: data.speaker,
-        text: data.raw_text?.substring(0, 50) + "...",
-        hasFullTranscript: !!data.full_transcript,
-      });
+      if (data.session_id !== sessionIdRef.current) return;
 
-      onSessionUpdate({
-        transcript: data.full_transcript || data.transcript_chunk,
+      if (applySegment(data.seq, data.transcript_chunk)) {
+        publishTranscript();
+      }
+    });
+
+    newSocket.on("audio_backpressure", (data) => {
+      if (data.session_id !== sessionIdRef.current) return;
+
+      audioPausedRef.current = data.paused;
+      if (!data.paused) {
+        pendingAudioRef.current.forEach((audioData) =>
+          newSocket.emit("audio_chunk", {
+            session_id: data.session_id,
+            audio_data: audioData,
+          })
+        );
+        pendingAudioRef.current = [];
+      }
+    });
+
+    // The server reconnects to the transcription service on its own;
+    // audio keeps flowing and is replayed once it is back
+    newSocket.on("transcription_connection", (data) => {
+      if (data.session_id !== sessionIdRef.current) return;
+
+      if (data.state === "reconnecting") {
+        onProcessingUpdate("Transcription connection lost, reconnecting...");
+      } else if (data.state === "connected") {
+        onProcessingUpdate("");
+      } else if (data.state === "failed") {
+        onProcessingUpdate("Live transcription unavailable; audio is still being received");
+      }
+    });
+
+    newSocket.on("transcript_resync", (data: TranscriptResyncData) => {
+      if (data.session_id !== sessionIdRef.current) return;
+
+      let changed = false;
+      data.segments.forEach((segment) => {
+        if (segment.seq === segmentsRef.current.length + 1) {
+          segmentsRef.current.push(segment.text);
+          changed = true;
+        }
       });
+
+      if (changed) {
+        publishTranscript();
+      }
     });
 
     return () => {
@@ -86,7 +217,14 @@ export const useSocket = (
   }, [onSessionUpdate, onProcessingUpdate]);
 
   const startRecording = (sessionId: string) => {
-    socket?.emit("start_recording", { session_id: sessionId });
+    sessionIdRef.current = sessionId;
+    segmentsRef.current = [];
+    audioPausedRef.current = false;
+    pendingAudioRef.current = [];
+    socket?.emit("start_recording", {
+      session_id: sessionId,
+      audio_format: { sample_rate: CAPTURE_SAMPLE_RATE },
+    });
   };
 
   const stopRecording = (sessionId: string) => {
@@ -97,6 +235,10 @@ export const useSocket = (
     sessionId: string,
     audioData: string | ArrayBuffer
   ) => {
+    if (audioPausedRef.current) {
+      pendingAudioRef.current.push(audioData);
+      return;
+    }
     socket?.emit("audio_chunk", {
       session_id: sessionId,
       audio_data: audioData,
@@ -19,10 +19,36 @@ export interface AudioChunk {
 
 export interface LiveTranscriptionData {
   session_id: string;
+  seq: number;
   transcript_chunk: string;
   raw_text: string;
   speaker: number | null;
-  full_transcript: string;
+}
+
+export interface SoapNotePartialData {
+  session_id: string;
+  job_id: string;
+  attempt: number;
+  chunk: string;
+  section: string | null;
+  new_sections: string[];
+  sections_completed: string[];
+}
+
+export interface TranscriptDeltaSegment {
+  seq: number;
+  text: string;
+  raw_text: string;
+  speaker: number | null;
+  start: number | null;
+  end: number | null;
+  confidence: number | null;
+}
+
+export interface TranscriptResyncData {
+  session_id: string;
+  segments: TranscriptDeltaSegment[];
+  last_seq: number;
 }
 
 export interface TranscriptSegment {